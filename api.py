@@ -1,30 +1,88 @@
+import asyncio
+import gzip
+import io
+import json
 import logging
 import os
 import re
+import shutil
+import tempfile
+import threading
 import uuid
-import xml.etree.ElementTree as ET
-from defusedxml import ElementTree as DefusedET
+import weakref
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import List, Optional
 from urllib.parse import unquote
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Query
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.datastructures import Headers
 from pydantic import BaseModel
 
+import course_planner
+import courses
+import pcs
+import settings
+import rating_matrix
+from cert_index import CertificateIndex, DEFAULT_DB_PATH
+from cert_store import from_certificates, refresh_store, SavedStore, DEFAULT_STORE_PATH
+from orcdb_cache import OrcDbCache, DEFAULT_CACHE_DIR
+from orcsc.compressed_cache import CompressedFileCache, accepted_encoding, accepts_encoding
+from orcsc.file_diff import diff_files
+from orcsc.file_events import FileEvents
+from orcsc.file_catalog import FileCatalog, SORT_KEYS as CATALOG_SORT_KEYS
 from orcsc.file_history import FileHistory
+from orcsc.file_versions import FileLocks, file_version
+from orcsc.file_upload import stage_upload, InvalidUpload, UploadTooLarge
+from orcsc.file_reader import read_orcsc_file, fleet_page, InvalidOrcscFile, FLEET_FIELD_TYPES
+from orcsc.file_reader import iter_orcsc_rows, project_fleet_row, event_row, class_row, race_row, DEFAULT_FLEET_FIELDS
 from orcsc.model.fleet_row import FleetRow
 from orcsc.model.race_row import RaceRow
+from orcsc.results_cache import ResultsCache
+from orcsc.finish_import import FinishResolver, InvalidFinishes, read_finish_records
+from orcsc.class_split import split_fleet, split_class_rows
+from orcsc.time_limits import file_time_limits, InvalidFormula
 from orcsc.orcsc_file_editor import add_races as orcsc_add_races, add_fleets as orcsc_add_fleets
 from orcsc.orcsc_file_editor import update_fleet as orcsc_update_fleet
+from orcsc.orcsc_file_editor import set_finishes as orcsc_set_finishes
+from orcsc.orcsc_file_editor import assign_classes as orcsc_assign_classes
 from orcsc.orcsc_file_editor import delete_class as orcsc_delete_class, delete_race as orcsc_delete_race, delete_boat as orcsc_delete_boat
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Use orjson for JSON responses when available
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as DefaultJSONResponse
+
+    def json_line(data) -> bytes:
+        return orjson.dumps(data) + b"\n"
+except ImportError:
+    from fastapi.responses import JSONResponse as DefaultJSONResponse
+
+    def json_line(data) -> bytes:
+        return (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load the file catalog and the certificate index off the event loop, and watch the output directory while serving."""
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    await asyncio.gather(run_in_threadpool(file_catalog.refresh), run_in_threadpool(update_certificate_index))
+    if CATALOG_POLL_INTERVAL > 0:
+        file_catalog.start_watcher(CATALOG_POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        file_catalog.stop_watcher()
+        shutil.rmtree(STAGING_DIR, ignore_errors=True)
+
+app = FastAPI(default_response_class=DefaultJSONResponse, lifespan=lifespan)
 
 # Security: Path validation helper to prevent directory traversal
 def validate_file_path(file_path: str, base_dir: str = "orcsc/output") -> str:
@@ -75,8 +133,35 @@ app.add_middleware(
     allow_origins=allow_origins,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization"],
+    allow_headers=["Content-Type", "Authorization", "If-Match"],
+    expose_headers=["ETag"],
 )
+# Streaming responses (SSE and NDJSON) must reach the client as they are produced: older Starlette
+# versions buffer every response through GZip, so these routes bypass it. Downloads negotiate their own
+# precompressed encoding
+UNCOMPRESSED_ROUTES = re.compile(r"^/api/(events|files/stream/.*|files/.+/finishes/stream|files/download/.*)$")
+
+class StreamingAwareGZipMiddleware:
+    """
+    GZipMiddleware for every response except the uncompressed routes and NDJSON file listings.
+    GZipMiddleware only looks for "gzip" in Accept-Encoding, so a client refusing it with q=0 also bypasses it.
+    """
+
+    def __init__(self, app, **options):
+        self.app = app
+        self.gzip = GZipMiddleware(app, **options)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and (
+            UNCOMPRESSED_ROUTES.match(scope["path"]) or b"format=ndjson" in scope.get("query_string", b"")
+            or not accepts_encoding(Headers(scope=scope).get("accept-encoding"), "gzip")
+        ):
+            await self.app(scope, receive, send)
+        else:
+            await self.gzip(scope, receive, send)
+
+# Compress JSON and XML responses; responses that already set Content-Encoding are left as is
+app.add_middleware(StreamingAwareGZipMiddleware, minimum_size=1024)
 
 # Ensure output directory exists
 OUTPUT_DIR = os.path.join("orcsc", "output")
@@ -87,10 +172,174 @@ logger.info(f"Output directory: {os.path.abspath(OUTPUT_DIR)}")
 # Security: File size limits
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 MAX_UPLOAD_FILE_SIZE = 10 * 1024 * 1024  # 10MB for uploads
+MAX_BULK_UPLOAD_FILES = 50
+
+# Uploads are copied and validated here, outside the output directory (so the catalog never sees them),
+# and only moved to it once they are known to be valid XML. Same filesystem, so the move is atomic.
+STAGING_DIR = tempfile.mkdtemp(prefix=".staging-", dir=os.path.dirname(os.path.abspath(OUTPUT_DIR)))
 
 # Initialize file history
 file_history = FileHistory("orcsc/output")
 
+# Precompressed variants of the .orcsc files served by the download endpoint
+compressed_files = CompressedFileCache(os.path.join(OUTPUT_DIR, "compressed"))
+
+# Change notifications pushed to the clients (see GET /api/events)
+file_events = FileEvents()
+SSE_KEEPALIVE_SECONDS = 15
+
+def publish_file_change(abs_path: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+    """
+    Notify subscribers of the file's new content. With loop, the row diff of the event is computed
+    in the loop's executor so the file is not parsed on the event loop.
+    """
+    compressed_files.invalidate(abs_path)
+    if loop is None:
+        file_events.publish(abs_path)
+    else:
+        loop.run_in_executor(None, file_events.publish, abs_path)
+
+# (mtime, size) last published per file name and whether the watcher published it, and the files being
+# written under locked_file: each write is published once, by the API or else by the watcher
+published_stats = {}
+writing_files = set()
+published_lock = threading.Lock()
+
+def file_stat(abs_path: str):
+    try:
+        st = os.stat(abs_path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def publish_external_change(abs_path: str):
+    """Catalog watcher callback: publish changes made outside the API, skipping the API's own writes."""
+    name = os.path.basename(abs_path)
+    stat = file_stat(abs_path)
+    with published_lock:
+        if name in writing_files or (name in published_stats and published_stats[name][0] == stat):
+            return
+        published_stats[name] = (stat, True)
+    publish_file_change(abs_path)
+
+# In-memory catalog of the output directory, kept current by the write endpoints and a polling watcher
+# (loaded and watched from the lifespan hook)
+file_catalog = FileCatalog(OUTPUT_DIR, on_change=publish_external_change)
+CATALOG_POLL_INTERVAL = float(os.getenv("CATALOG_POLL_INTERVAL", "5"))
+
+# Scored races and series standings, re-scored only when their inputs change
+results_cache = ResultsCache()
+
+# Live finishes are written in batches of up to FINISH_BATCH_SIZE finishes, or after FINISH_BATCH_SECONDS
+FINISH_BATCH_SIZE = 20
+FINISH_BATCH_SECONDS = 2.0
+
+# Per-file write locks, so the If-Match check and the write happen atomically: an asyncio lock queues the
+# requests of this worker, the OS lock serializes the workers
+file_locks = weakref.WeakValueDictionary()
+os_file_locks = FileLocks(os.path.join(OUTPUT_DIR, "locks"))
+
+def file_etag(abs_path: str) -> str:
+    """ETag of a file: its version, a hash of its content (see orcsc/file_versions.py)."""
+    return f'"{file_version(abs_path)}"'
+
+class FileWrite:
+    """Yielded by locked_file; version is set to the file's version once the write is done."""
+    version: Optional[str] = None
+
+@asynccontextmanager
+async def locked_file(abs_path: str, if_match: Optional[str] = None):
+    """
+    Serialize writes to a file, across the API workers too. If the client sent If-Match with the
+    version (ETag) it read, reject the write with 412 when the file has changed since.
+    The lock is held until the version of the write is read, so a write returns its own version.
+    """
+    lock = file_locks.get(abs_path)
+    if lock is None:
+        lock = file_locks[abs_path] = asyncio.Lock()
+    async with lock:
+        handle = await run_in_threadpool(os_file_locks.acquire, abs_path)
+        try:
+            if if_match is not None:
+                tags = [tag.strip().removeprefix("W/") for tag in if_match.split(",")]
+                current = await run_in_threadpool(file_etag, abs_path)
+                if "*" not in tags and current not in tags:
+                    logger.warning(f"Stale write rejected: If-Match {if_match}, current {current}")
+                    raise HTTPException(status_code=412, detail="File was modified by another user, reload and try again")
+            name = os.path.basename(abs_path)
+            with published_lock:
+                writing_files.add(name)
+            write = FileWrite()
+            try:
+                yield write
+                write.version = await run_in_threadpool(file_version, abs_path)
+            finally:
+                with published_lock:
+                    writing_files.discard(name)
+        finally:
+            os_file_locks.release(handle)
+
+def file_changed(abs_path: str):
+    """Called after a file in the output directory was written or deleted."""
+    try:
+        file_catalog.update(abs_path)
+        if not os.path.exists(abs_path):
+            results_cache.invalidate(abs_path)
+        name = os.path.basename(abs_path)
+        stat = file_stat(abs_path)
+        with published_lock:
+            # Files written outside locked_file (uploads, new files) may be seen by the watcher first
+            already_published = published_stats.get(name) == (stat, True)
+            published_stats[name] = (stat, False)
+        if not already_published:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            publish_file_change(abs_path, loop)
+    except Exception as e:
+        logger.error(f"Error publishing file change: {str(e)}", exc_info=True)
+
+# Local certificate index built from the downloaded ORC country files (see cert_index.py)
+CERTS_DIR = os.getenv("CERTS_DIR", "jsons")
+certificate_index = CertificateIndex(os.getenv("CERTS_INDEX_PATH", DEFAULT_DB_PATH))
+
+# Columnar copy of the index certificates (see cert_store), memory-mapped by the rating analytics endpoints
+CERTS_STORE_PATH = os.getenv("CERTS_STORE_PATH", DEFAULT_STORE_PATH)
+saved_store = SavedStore(CERTS_STORE_PATH)
+
+def update_certificate_index():
+    """Index the new and changed certificate files and rebuild the columnar store, called at startup from the lifespan hook."""
+    try:
+        changed, removed = certificate_index.update(CERTS_DIR)
+        logger.info(f"Certificate index: {len(changed)} files indexed, {len(removed)} files removed")
+        if refresh_store(certificate_index, CERTS_STORE_PATH):
+            logger.info(f"Certificate store rebuilt: {CERTS_STORE_PATH}")
+    except Exception as e:
+        logger.error(f"Error updating certificate index: {str(e)}", exc_info=True)
+
+def index_store(ref_nos: list):
+    """
+    Columnar store of index certificates in the order of ref_nos: rows of the saved store, or built from the
+    index JSONs when it does not have them all (yet). Raises a 404 listing the RefNos not in the index.
+    """
+    store = saved_store.select(ref_nos)
+    if store is not None:
+        return store
+    certificates = certificate_index.get_many(ref_nos)
+    missing = [ref_no for ref_no in ref_nos if ref_no not in certificates]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Certificates not found: {', '.join(missing)}")
+    return from_certificates(certificates[ref_no] for ref_no in ref_nos)
+
+# Course definitions used by the course planner, compiled when loaded and reloaded when the file changes
+COURSES_PATH = os.getenv("COURSES_PATH", courses.DEFAULT_COURSES_PATH)
+saved_courses = courses.SavedCourses(COURSES_PATH)
+
+# Shared cache of ORC DB responses used by the "add boats from ORC DB" dialog
+orcdb_cache = OrcDbCache(os.getenv("ORCDB_CACHE_DIR", DEFAULT_CACHE_DIR))
+ORCDB_FAMILIES = {"ORC", "NS", "DH"}
+
 class EventData(BaseModel):
     EventTitle: str
     StartDate: str
@@ -134,6 +383,36 @@ class AddBoatsRequest(BaseModel):
 class RestoreBackupRequest(BaseModel):
     backup_path: str
 
+class AddOrcBoatsRequest(BaseModel):
+    ref_nos: List[str]
+    class_id: Optional[str] = None
+
+class PcsBoat(BaseModel):
+    RefNo: str
+    elapsed_seconds: Optional[float] = None
+
+class PcsScoreRequest(BaseModel):
+    distance: float
+    course: dict
+    boats: List[PcsBoat]
+    scratch_ref_no: Optional[str] = None
+    method: str = "pcs"
+    wind_speed: Optional[float] = None
+
+class RatingMatrixRequest(BaseModel):
+    ref_nos: List[str]
+    options: Optional[List[str]] = None
+    unit: str = "both"
+    format: str = "json"
+
+class ClassSplitRequest(BaseModel):
+    rating: str = "CDL"
+    class_ids: List[str] = ["O1", "O2"]
+    class_names: Optional[List[str]] = None
+    min_size: int = 1
+    from_classes: Optional[List[str]] = None
+    apply: bool = False
+
 class UpdateBoatRequest(BaseModel):
     YID: int
     YachtName: Optional[str] = None
@@ -142,38 +421,30 @@ class UpdateBoatRequest(BaseModel):
     Rating: Optional[str] = None
 
 @app.get("/api/files")
-async def list_orcsc_files():
-    """List all .orcsc files in the output directory"""
+async def list_orcsc_files(
+    sort: str = Query("name"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    q: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """
+    List all .orcsc files in the output directory with their event title, dates and class/race/boat counts.
+    Served from the file catalog; sort by any listed field, filter by a name/event title substring
+    and use format=ndjson to stream one file per line.
+    """
+    if sort not in CATALOG_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort key. Use one of: {', '.join(CATALOG_SORT_KEYS)}")
     try:
-        files = []
-        try:
-            file_list = os.listdir(OUTPUT_DIR)
-        except OSError as e:
-            logger.error(f"Error reading directory: {str(e)}")
-            raise HTTPException(status_code=500, detail="Failed to list files")
-        
-        for file in file_list:
-            if file.endswith('.orcsc'):
-                file_path = os.path.join(OUTPUT_DIR, file)
-                try:
-                    files.append({
-                        "name": file,
-                        "path": file_path,
-                        "size": os.path.getsize(file_path),
-                        "modified": os.path.getmtime(file_path)
-                    })
-                except OSError:
-                    logger.warning(f"Could not stat file: {file}")
-                    continue
+        files = file_catalog.list(sort=sort, descending=order == "desc", q=q)
+        if format == "ndjson":
+            return StreamingResponse((json_line(info) for info in files), media_type="application/x-ndjson")
         return {"files": files}
-    except HTTPException:
-        raise
     except Exception as e:
         logger.error(f"Error listing files: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to list files")
 
 @app.delete("/api/files/{file_path:path}")
-async def delete_orcsc_file(file_path: str):
+async def delete_orcsc_file(file_path: str, if_match: Optional[str] = Header(None)):
     """Delete an ORCSC file"""
     try:
         logger.info("Deleting file")
@@ -188,10 +459,12 @@ async def delete_orcsc_file(file_path: str):
             logger.warning("File not found")
             raise HTTPException(status_code=404, detail="File not found")
 
-        # Backup before delete
-        file_history.create_backup(abs_path, "Deleted file")
+        async with locked_file(abs_path, if_match):
+            # Backup before delete
+            file_history.create_backup(abs_path, "Deleted file")
 
-        os.remove(abs_path)
+            os.remove(abs_path)
+            file_changed(abs_path)
         logger.info("File deleted successfully")
         return {"message": "File deleted"}
     except HTTPException:
@@ -216,30 +489,20 @@ async def upload_file(file: UploadFile = File(...)):
         new_filename = f"{file_uuid}.orcsc"
         file_path = os.path.join(OUTPUT_DIR, new_filename)
         
-        # Save the uploaded file with size limit check during write
-        bytes_written = 0
-        with open(file_path, "wb") as buffer:
-            while True:
-                chunk = await file.read(8192)  # Read in 8KB chunks
-                if not chunk:
-                    break
-                bytes_written += len(chunk)
-                if bytes_written > MAX_UPLOAD_FILE_SIZE:
-                    os.remove(file_path)  # Clean up partial file
-                    raise HTTPException(status_code=413, detail=f"File size exceeds maximum limit of {MAX_UPLOAD_FILE_SIZE / (1024*1024):.0f}MB")
-                buffer.write(chunk)
-        
-        # Verify the uploaded file is valid XML
+        # Copy the uploaded file to staging, validating size and XML while it is copied
         try:
-            DefusedET.parse(file_path)
-        except ET.ParseError as e:
-            os.remove(file_path)  # Clean up invalid file
+            staged_path = await run_in_threadpool(stage_upload, file.file, STAGING_DIR, MAX_UPLOAD_FILE_SIZE)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except InvalidUpload as e:
             logger.warning(f"Invalid XML uploaded: {str(e)}")
             raise HTTPException(status_code=400, detail="Uploaded file is not valid XML")
+        os.replace(staged_path, file_path)
         
         # Create initial backup with summary
         change_summary = f"Initial file upload: {file.filename} (renamed to {new_filename})"
         file_history.create_backup(file_path, change_summary)
+        file_changed(file_path)
         logger.info(f"File uploaded successfully: {new_filename}")
         return {"filename": new_filename, "path": file_path}
     except HTTPException:
@@ -248,8 +511,64 @@ async def upload_file(file: UploadFile = File(...)):
         logger.error(f"Error uploading file: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to upload file")
 
+@app.post("/api/files/upload/bulk")
+async def upload_files(files: List[UploadFile] = File(...)):
+    """
+    Upload several ORCSC files at once. Files are validated in parallel while they are copied to staging;
+    valid files are added with one batch of history entries, invalid ones are reported and discarded.
+    """
+    try:
+        if len(files) > MAX_BULK_UPLOAD_FILES:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_UPLOAD_FILES} files can be uploaded at once")
+
+        rejected = []
+        accepted = []
+        for file in files:
+            if not file.filename or not file.filename.endswith('.orcsc'):
+                rejected.append({"filename": file.filename, "error": "Only .orcsc files are allowed"})
+            elif file.size and file.size > MAX_UPLOAD_FILE_SIZE:
+                rejected.append({"filename": file.filename, "error": "File size exceeds maximum limit"})
+            else:
+                accepted.append(file)
+
+        results = await asyncio.gather(
+            *(run_in_threadpool(stage_upload, file.file, STAGING_DIR, MAX_UPLOAD_FILE_SIZE) for file in accepted),
+            return_exceptions=True
+        )
+
+        uploaded = []
+        backups = []
+        for file, result in zip(accepted, results):
+            if isinstance(result, (InvalidUpload, UploadTooLarge)):
+                logger.warning(f"Rejected upload {file.filename}: {str(result)}")
+                rejected.append({"filename": file.filename, "error": str(result)})
+                continue
+            if isinstance(result, BaseException):
+                logger.error(f"Error staging upload {file.filename}: {str(result)}")
+                rejected.append({"filename": file.filename, "error": "Failed to upload file"})
+                continue
+            new_filename = f"{uuid.uuid4()}.orcsc"
+            file_path = os.path.join(OUTPUT_DIR, new_filename)
+            os.replace(result, file_path)
+            uploaded.append({"original_filename": file.filename, "filename": new_filename, "path": file_path})
+            backups.append((file_path, f"Initial file upload: {file.filename} (renamed to {new_filename})"))
+
+        file_history.create_backups(backups)
+        for file_path, _ in backups:
+            file_changed(file_path)
+
+        logger.info(f"Bulk upload: {len(uploaded)} files uploaded, {len(rejected)} rejected")
+        if not uploaded:
+            raise HTTPException(status_code=400, detail={"message": "No valid files uploaded", "rejected": rejected})
+        return {"uploaded": uploaded, "rejected": rejected}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error uploading files: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to upload files")
+
 @app.post("/api/files/update")
-async def update_file(file_path: str = Query(...), file: UploadFile = File(...)):
+async def update_file(file_path: str = Query(...), file: UploadFile = File(...), if_match: Optional[str] = Header(None)):
     """Update an existing ORCSC file and save the previous version to history"""
     try:
         if not file.filename or not file.filename.endswith('.orcsc'):
@@ -272,31 +591,28 @@ async def update_file(file_path: str = Query(...), file: UploadFile = File(...))
             logger.warning(f"File not found: {abs_path}")
             raise HTTPException(status_code=404, detail="File not found")
         
-        # Create backup of the existing file before updating
-        change_summary = f"File updated with new version of {file.filename}"
-        file_history.create_backup(abs_path, change_summary)
-        
-        # Read the new file and write it to replace the existing one
-        bytes_written = 0
-        with open(abs_path, "wb") as buffer:
-            while True:
-                chunk = await file.read(8192)  # Read in 8KB chunks
-                if not chunk:
-                    break
-                bytes_written += len(chunk)
-                if bytes_written > MAX_UPLOAD_FILE_SIZE:
-                    raise HTTPException(status_code=413, detail=f"File size exceeds maximum limit of {MAX_UPLOAD_FILE_SIZE / (1024*1024):.0f}MB")
-                buffer.write(chunk)
-        
-        # Verify the updated file is valid XML
+        # Stage the new version, validating size and XML before the existing file is touched
         try:
-            DefusedET.parse(abs_path)
-        except ET.ParseError as e:
+            staged_path = await run_in_threadpool(stage_upload, file.file, STAGING_DIR, MAX_UPLOAD_FILE_SIZE)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except InvalidUpload as e:
             logger.warning(f"Invalid XML uploaded for update: {str(e)}")
             raise HTTPException(status_code=400, detail="Uploaded file is not valid XML")
         
+        try:
+            async with locked_file(abs_path, if_match) as write:
+                # Create backup of the existing file before updating
+                change_summary = f"File updated with new version of {file.filename}"
+                file_history.create_backup(abs_path, change_summary)
+                os.replace(staged_path, abs_path)
+                file_changed(abs_path)
+        finally:
+            if os.path.exists(staged_path):
+                os.remove(staged_path)
+        
         logger.info(f"File updated successfully: {abs_path}")
-        return {"filename": os.path.basename(abs_path), "path": abs_path}
+        return {"filename": os.path.basename(abs_path), "path": abs_path, "version": write.version}
     except HTTPException:
         raise
     except Exception as e:
@@ -304,7 +620,19 @@ async def update_file(file_path: str = Query(...), file: UploadFile = File(...))
         raise HTTPException(status_code=500, detail="Failed to update file")
 
 @app.get("/api/files/get/{file_path:path}")
-async def get_orcsc_file(file_path: str):
+async def get_orcsc_file(
+    response: Response,
+    file_path: str,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = None,
+    class_id: Optional[str] = None
+):
+    """
+    Get the event, classes, races and fleet of an ORCSC file.
+    The fleet can be filtered by class_id, paginated with offset/limit and projected
+    to a comma separated list of Fleet fields.
+    """
     try:
         logger.info(f"Processing file request")
         
@@ -324,108 +652,35 @@ async def get_orcsc_file(file_path: str):
         if os.path.getsize(abs_path) > MAX_FILE_SIZE:
             logger.warning(f"File too large: {file_path}")
             raise HTTPException(status_code=413, detail="File size exceeds maximum limit")
+
+        fleet_fields = None
+        if fields:
+            fleet_fields = [field.strip() for field in fields.split(",") if field.strip()]
+            unknown = [field for field in fleet_fields if field not in FLEET_FIELD_TYPES]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown fleet fields: {', '.join(unknown)}")
         
-        # Parse the XML file with XXE protection
+        # Parse the XML file with XXE protection (cached until the file changes)
+        version = file_version(abs_path)
         try:
-            tree = DefusedET.parse(abs_path)
-            root = tree.getroot()
-        except ET.ParseError as e:
-            logger.error(f"Failed to parse XML file: {e}")
-            raise HTTPException(status_code=400, detail="Invalid file format")
-        
-        # Extract event data
-        event = root.find('./Event/ROW')
-        if event is None:
+            data = read_orcsc_file(abs_path)
+        except InvalidOrcscFile as e:
+            logger.error(f"Failed to parse ORCSC file: {e}")
             raise HTTPException(status_code=400, detail="Invalid file format")
-        
-        # Safely extract text with null checks
-        def get_text(element, tag: str, default: str = ""):
-            child = element.find(tag)
-            return child.text if child is not None and child.text else default
-            
-        event_data = {
-            "EventTitle": get_text(event, 'EventTitle'),
-            "StartDate": get_text(event, 'StartDate'),
-            "EndDate": get_text(event, 'EndDate'),
-            "Venue": get_text(event, 'Venue'),
-            "Organizer": get_text(event, 'Organizer')
-        }
-        
-        # Extract classes
-        classes = []
-        for cls in root.findall('./Cls/ROW'):
-            classes.append({
-                "ClassId": get_text(cls, 'ClassId'),
-                "ClassName": get_text(cls, 'ClassName'),
-                "YachtClass": get_text(cls, 'YachtClass', "Unknown")
-            })
-            
-        # Extract races
-        races = []
-        for race in root.findall('./Race/ROW'):
-            race_id_text = get_text(race, 'RaceId', '0')
-            try:
-                race_id = int(race_id_text) if race_id_text else 0
-            except ValueError:
-                race_id = 0
-            races.append({
-                "RaceId": race_id,
-                "RaceName": get_text(race, 'RaceName'),
-                "StartTime": get_text(race, 'StartTime'),
-                "ClassId": get_text(race, 'ClassId'),
-                "ScoringType": get_text(race, 'ScoringType')
-            })
-            
-        # Extract fleet
-        fleet = []
-        for boat in root.findall('./Fleet/ROW'):
-            yid_text = get_text(boat, 'YID', '0')
-            try:
-                yid = int(yid_text) if yid_text else 0
-            except ValueError:
-                yid = 0
-
-            def parse_float(tag: str):
-                text = get_text(boat, tag)
-                try:
-                    return float(text) if text else None
-                except ValueError:
-                    return None
 
-            cdl_text = get_text(boat, 'CDL')
-            try:
-                cdl = float(cdl_text) if cdl_text else None
-            except ValueError:
-                cdl = None
-
-            fleet.append({
-                "YID": yid,
-                "YachtName": get_text(boat, 'YachtName'),
-                "SailNo": get_text(boat, 'SailNo'),
-                "ClassId": get_text(boat, 'ClassId'),
-                "CDL": cdl,
-                "Rating": get_text(boat, 'Rating'),
-                "GPH": parse_float('GPH'),
-                "TN_Inshore_Low": parse_float('TN_Inshore_Low'),
-                "TN_Inshore_Medium": parse_float('TN_Inshore_Medium'),
-                "TN_Inshore_High": parse_float('TN_Inshore_High'),
-                "TN_Offshore_Low": parse_float('TN_Offshore_Low'),
-                "TN_Offshore_Medium": parse_float('TN_Offshore_Medium'),
-                "TN_Offshore_High": parse_float('TN_Offshore_High'),
-                "TND_Inshore_Low": parse_float('TND_Inshore_Low'),
-                "TND_Inshore_Medium": parse_float('TND_Inshore_Medium'),
-                "TND_Inshore_High": parse_float('TND_Inshore_High'),
-                "TND_Offshore_Low": parse_float('TND_Offshore_Low'),
-                "TND_Offshore_Medium": parse_float('TND_Offshore_Medium'),
-                "TND_Offshore_High": parse_float('TND_Offshore_High')
-            })
-            
+        fleet_total, fleet = fleet_page(data["fleet"], offset=offset, limit=limit, fields=fleet_fields,
+                                        class_id=class_id)
         response_data = {
-            "event": event_data,
-            "classes": classes,
-            "races": races,
-            "fleet": fleet
+            "event": data["event"],
+            "classes": data["classes"],
+            "races": data["races"],
+            "fleet": fleet,
+            "fleet_total": fleet_total,
+            "offset": offset,
+            "limit": limit,
+            "version": version
         }
+        response.headers["ETag"] = f'"{version}"'
         
         logger.info("Successfully processed ORCSC file")
         return response_data
@@ -436,8 +691,103 @@ async def get_orcsc_file(file_path: str):
         logger.error(f"Unexpected error processing file: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to process file")
 
+@app.get("/api/files/stream/{file_path:path}")
+async def stream_orcsc_file(file_path: str, fields: Optional[str] = None, class_id: Optional[str] = None):
+    """
+    Stream an ORCSC file as NDJSON while it is parsed: one {"type", "data"} line per
+    event, class, race and boat row. Boats can be filtered by class_id and projected with fields.
+    """
+    try:
+        try:
+            abs_path = validate_file_path(file_path)
+        except ValueError as e:
+            logger.warning(f"Invalid file path request: {str(e)}")
+            raise HTTPException(status_code=400, detail="Invalid file path")
+
+        if not os.path.exists(abs_path):
+            logger.warning(f"File not found: {file_path}")
+            raise HTTPException(status_code=404, detail="File not found")
+
+        fleet_fields = DEFAULT_FLEET_FIELDS
+        if fields:
+            fleet_fields = [field.strip() for field in fields.split(",") if field.strip()]
+            unknown = [field for field in fleet_fields if field not in FLEET_FIELD_TYPES]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown fleet fields: {', '.join(unknown)}")
+
+        def rows():
+            row_types = {"Event": "event", "Cls": "class", "Race": "race", "Fleet": "boat"}
+            try:
+                for section, row in iter_orcsc_rows(abs_path):
+                    if section == "Fleet":
+                        if class_id is not None and row.get("ClassId") != class_id:
+                            continue
+                        row = project_fleet_row(row, fleet_fields)
+                    elif section == "Race":
+                        row = race_row(row)
+                    elif section == "Cls":
+                        row = class_row(row)
+                    else:
+                        row = event_row(row)
+                    yield json_line({"type": row_types[section], "data": row})
+            except InvalidOrcscFile as e:
+                # Headers are already sent, report the error in the stream
+                logger.error(f"Failed to parse ORCSC file: {e}")
+                yield json_line({"type": "error", "data": "Invalid file format"})
+
+        return StreamingResponse(rows(), media_type="application/x-ndjson", headers={"ETag": file_etag(abs_path)})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error streaming file: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to process file")
+
+def sse_message(event: str, data) -> bytes:
+    return f"event: {event}\ndata: ".encode("utf-8") + json_line(data) + b"\n"
+
+@app.get("/api/events")
+async def stream_file_events(request: Request, file: Optional[str] = None):
+    """
+    Server-sent events for file changes. With file, only that file's changes are sent and each
+    "change" event carries the new version and the added/removed/updated classes, races and fleet rows;
+    without it, a "change" event (version only) is sent for every file of the output directory.
+    """
+    abs_path = None
+    if file:
+        try:
+            abs_path = validate_file_path(unquote(file))
+        except ValueError as e:
+            logger.warning(f"Invalid file path: {str(e)}")
+            raise HTTPException(status_code=400, detail="Invalid file path")
+        if not os.path.exists(abs_path):
+            raise HTTPException(status_code=404, detail="File not found")
+
+    try:
+        queue = await run_in_threadpool(file_events.subscribe, abs_path, asyncio.get_running_loop())
+    except InvalidOrcscFile as e:
+        logger.error(f"Failed to parse ORCSC file: {e}")
+        raise HTTPException(status_code=400, detail="Invalid file format")
+
+    async def events():
+        try:
+            hello = {"file": os.path.basename(abs_path) if abs_path else None,
+                     "version": file_events.version(abs_path) if abs_path else None}
+            yield sse_message("hello", hello)
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield sse_message("change", event)
+        finally:
+            file_events.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.post("/api/files/{file_path:path}/races")
-async def add_races_to_file(file_path: str, request: AddRacesRequest):
+async def add_races_to_file(file_path: str, request: AddRacesRequest, if_match: Optional[str] = Header(None)):
     """Add races to an existing ORCSC file"""
     try:
         logger.info(f"Adding races to file")
@@ -463,22 +813,24 @@ async def add_races_to_file(file_path: str, request: AddRacesRequest):
         for race in request.races:
             if not race.RaceName or not race.ClassId:
                 raise HTTPException(status_code=400, detail="Race name and class ID are required")
-            race_row = RaceRow("ROW")
-            race_row.RaceName = race.RaceName
-            race_row.ClassId = race.ClassId
-            race_row.StartTime = race.StartTime
-            race_row.ScoringType = race.ScoringType
-            races.append(race_row)
-        
-        # Add races to the file
-        orcsc_add_races(abs_path, abs_path, races)
-        # Create backup after modifying
-        race_names = [race.RaceName for race in request.races]
-        change_summary = f"Added races: {', '.join(race_names)}"
-        file_history.create_backup(abs_path, change_summary)
+            new_race = RaceRow("ROW")
+            new_race.RaceName = race.RaceName
+            new_race.ClassId = race.ClassId
+            new_race.StartTime = race.StartTime
+            new_race.ScoringType = race.ScoringType
+            races.append(new_race)
+        
+        async with locked_file(abs_path, if_match) as write:
+            # Add races to the file
+            orcsc_add_races(abs_path, abs_path, races)
+            # Create backup after modifying
+            race_names = [race.RaceName for race in request.races]
+            change_summary = f"Added races: {', '.join(race_names)}"
+            file_history.create_backup(abs_path, change_summary)
+            file_changed(abs_path)
 
         logger.info(f"Successfully added {len(races)} races")
-        return {"message": f"Successfully added {len(races)} races"}
+        return {"message": f"Successfully added {len(races)} races", "version": write.version}
         
     except HTTPException:
         raise
@@ -486,9 +838,346 @@ async def add_races_to_file(file_path: str, request: AddRacesRequest):
         logger.error(f"Error adding races: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to add races")
 
+@app.get("/api/files/{file_path:path}/races/{race_id}/results")
+async def get_race_results(file_path: str, race_id: int, wind_speed: Optional[float] = Query(None, ge=0)):
+    """
+    Provisional results of a race computed from the finish times in the file: elapsed and corrected
+    times, positions and points for the race's class, scored on the rating of the race's ScoringType
+    (TN_Inshore/TN_Offshore pick the triple number band from wind_speed).
+    """
+    try:
+        try:
+            abs_path = validate_file_path(file_path)
+        except ValueError as e:
+            logger.warning(f"Invalid file path: {str(e)}")
+            raise HTTPException(status_code=400, detail="Invalid file path")
+
+        if not os.path.exists(abs_path):
+            logger.warning(f"File not found")
+            raise HTTPException(status_code=404, detail="File not found")
+
+        try:
+            results = await run_in_threadpool(results_cache.race, abs_path, race_id, wind_speed)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Race not found")
+        except InvalidOrcscFile as e:
+            logger.error(f"Failed to parse ORCSC file: {e}")
+            raise HTTPException(status_code=400, detail="Invalid file format")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return results
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error scoring race: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to score race")
+
+@app.post("/api/files/{file_path:path}/classes/split")
+async def split_classes(file_path: str, request: ClassSplitRequest, if_match: Optional[str] = Header(None)):
+    """
+    Split the rated boats of a file (or of from_classes) into len(class_ids) classes on CDL or GPH, minimizing
+    the rating spread inside the classes with at least min_size boats each, fastest boats in the first class.
+    Returns the proposed classes; with apply the classes are created and the boats moved in one write.
+    """
+    try:
+        try:
+            abs_path = validate_file_path(file_path)
+        except ValueError as e:
+            logger.warning(f"Invalid file path: {str(e)}")
+            raise HTTPException(status_code=400, detail="Invalid file path")
+
+        if not os.path.exists(abs_path):
+            logger.warning(f"File not found")
+            raise HTTPException(status_code=404, detail="File not found")
+
+        if not request.class_ids or len(set(request.class_ids)) != len(request.class_ids):
+            raise HTTPException(status_code=400, detail="Class ids must be given and unique")
+        if request.class_names is not None and len(request.class_names) != len(request.class_ids):
+            raise HTTPException(status_code=400, detail="One class name is required per class id")
+
+        def propose():
+            try:
+                fleet = [row for _, row in iter_orcsc_rows(abs_path, ('Fleet',))
+                         if request.from_classes is None or row.get('ClassId') in request.from_classes]
+            except InvalidOrcscFile as e:
+                logger.error(f"Failed to parse ORCSC file: {e}")
+                raise HTTPException(status_code=400, detail="Invalid file format")
+            try:
+                return split_fleet(fleet, request.rating, request.class_ids, request.min_size)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        if not request.apply:
+            # A preview writes nothing: no lock and no If-Match check
+            version = await run_in_threadpool(file_version, abs_path)
+            assignments, classes, unrated = await run_in_threadpool(propose)
+        else:
+            async with locked_file(abs_path, if_match) as write:
+                assignments, classes, unrated = await run_in_threadpool(propose)
+                class_rows = split_class_rows(request.class_ids, request.class_names)
+                await run_in_threadpool(orcsc_assign_classes, abs_path, abs_path, class_rows, assignments)
+                change_summary = f"Split {len(assignments)} boats on {request.rating} into {', '.join(request.class_ids)}"
+                file_history.create_backup(abs_path, change_summary)
+                file_changed(abs_path)
+            version = write.version
+
+        logger.info(f"Class split on {request.rating}: {[len(c['boats']) for c in classes]} boats (applied: {request.apply})")
+        return {"rating": request.rating, "classes": classes, "unrated": unrated,
+                "total_spread": sum(c["spread"] for c in classes), "applied": request.apply,
+                "version": version}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error splitting classes: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to split classes")
+
+async def write_finishes(abs_path: str, race_id: int, finishes: list, change_summary: str,
+                         if_match: Optional[str] = None, wind_speed: Optional[float] = None) -> dict:
+    """
+    Write a batch of finishes with one parse and write, then re-score the race.
+    The finishes are saved even if the race cannot be scored (e.g. a triple number race without
+    wind_speed): results is then None and scoring_error tells why.
+    """
+    async with locked_file(abs_path, if_match) as write:
+        await run_in_threadpool(orcsc_set_finishes, abs_path, abs_path, finishes)
+        file_history.create_backup(abs_path, change_summary)
+        file_changed(abs_path)
+    version = write.version
+    try:
+        results = await run_in_threadpool(results_cache.race, abs_path, race_id, wind_speed)
+    except ValueError as e:
+        logger.warning(f"Finishes saved but race {race_id} not scored: {str(e)}")
+        return {"version": version, "results": None, "scoring_error": str(e)}
+    except Exception as e:
+        logger.error(f"Error scoring race after writing finishes: {str(e)}", exc_info=True)
+        return {"version": version, "results": None, "scoring_error": "Failed to score race"}
+    return {"version": version, "results": results, "scoring_error": None}
+
+@app.post("/api/files/{file_path:path}/races/{race_id}/finishes")
+async def import_finishes(file_path: str, race_id: int, file: UploadFile = File(...),
+                          wind_speed: Optional[float] = Query(None, ge=0), if_match: Optional[str] = Header(None)):
+    """
+    Import the finishes of a race from a CSV or JSON file. Each record identifies the boat by YID or
+    SailNo and gives FinishTime, Finish (DNF, DSQ...) and/or Penalty_ET, and can list fields to empty in
+    Clear. Nothing is written unless every record is valid. Returns the race re-scored at wind_speed
+    (needed for triple number races), or a scoring_error if it cannot be scored.
+    """
+    try:
+        try:
+            abs_path = validate_file_path(file_path)
+        except ValueError as e:
+            logger.warning(f"Invalid file path: {str(e)}")
+            raise HTTPException(status_code=400, detail="Invalid file path")
+
+        if not os.path.exists(abs_path):
+            logger.warning(f"File not found")
+            raise HTTPException(status_code=404, detail="File not found")
+
+        fmt = os.path.splitext(file.filename or "")[1].lower().lstrip(".")
+        if fmt not in ("csv", "json"):
+            raise HTTPException(status_code=400, detail="Only .csv and .json finish files are allowed")
+        content = await file.read(MAX_UPLOAD_FILE_SIZE + 1)
+        if len(content) > MAX_UPLOAD_FILE_SIZE:
+            raise HTTPException(status_code=413, detail=f"File size exceeds maximum limit of {MAX_UPLOAD_FILE_SIZE / (1024*1024):.0f}MB")
+
+        try:
+            resolver = await run_in_threadpool(FinishResolver, abs_path, race_id)
+            finishes = resolver.resolve_all(read_finish_records(content, fmt))
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Race not found")
+        except InvalidFinishes as e:
+            logger.warning(f"Invalid finishes: {str(e)}")
+            raise HTTPException(status_code=400, detail={
+                "message": "Invalid finishes",
+                "errors": [{"record": number, "error": message} for number, message in e.errors]
+            })
+        except InvalidOrcscFile as e:
+            logger.error(f"Failed to parse ORCSC file: {e}")
+            raise HTTPException(status_code=400, detail="Invalid file format")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid finish file: {str(e)}")
+        if not finishes:
+            raise HTTPException(status_code=400, detail="No finishes in file")
+
+        change_summary = f"Imported {len(finishes)} finishes for race {race_id} from {file.filename}"
+        written = await write_finishes(abs_path, race_id, finishes, change_summary, if_match, wind_speed)
+        logger.info(f"Imported {len(finishes)} finishes for race {race_id}")
+        return {"written": len(finishes), **written}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing finishes: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to import finishes")
+
+def ndjson_record(line: bytes):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+async def ndjson_records(stream):
+    """Parse an NDJSON request body as it arrives, yielding (line number, object or None if invalid)."""
+    buffer = b""
+    number = 0
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in filter(bytes.strip, lines):
+            number += 1
+            yield number, ndjson_record(line)
+    if buffer.strip():
+        yield number + 1, ndjson_record(buffer)
+
+@app.post("/api/files/{file_path:path}/races/{race_id}/finishes/stream")
+async def stream_finishes(file_path: str, race_id: int, request: Request,
+                          wind_speed: Optional[float] = Query(None, ge=0), if_match: Optional[str] = Header(None)):
+    """
+    Live finishes from the committee boat, sent as an NDJSON request body (one finish record per line,
+    as for the import) kept open for as long as the race runs. Finishes are written in batches of up to
+    FINISH_BATCH_SIZE, or FINISH_BATCH_SECONDS after the first pending one, and each batch re-scores the
+    race and notifies the clients (GET /api/events). Invalid records are skipped and reported at the end.
+    With If-Match, every batch is rejected (412) if someone else changed the file since the previous one.
+    """
+    try:
+        abs_path = validate_file_path(file_path)
+    except ValueError as e:
+        logger.warning(f"Invalid file path: {str(e)}")
+        raise HTTPException(status_code=400, detail="Invalid file path")
+    if not os.path.exists(abs_path):
+        logger.warning(f"File not found")
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        resolver = await run_in_threadpool(FinishResolver, abs_path, race_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Race not found")
+    except InvalidOrcscFile as e:
+        logger.error(f"Failed to parse ORCSC file: {e}")
+        raise HTTPException(status_code=400, detail="Invalid file format")
+    if if_match is not None:
+        # Fail before reading the stream if the client's version is already stale
+        async with locked_file(abs_path, if_match):
+            pass
+
+    pending = {}
+    rejected = []
+    written = batches = 0
+    scoring_error = version = None
+
+    async def flush():
+        nonlocal written, batches, if_match, scoring_error, version
+        finishes = list(pending.values())
+        pending.clear()
+        result = await write_finishes(abs_path, race_id, finishes,
+                                      f"Live finishes for race {race_id}: {len(finishes)} boats", if_match, wind_speed)
+        if if_match is not None:
+            # The next batch expects the version this one wrote
+            if_match = f'"{result["version"]}"'
+        scoring_error = result["scoring_error"]
+        version = result["version"]
+        written += len(finishes)
+        batches += 1
+
+    records = ndjson_records(request.stream())
+    next_record = None
+    deadline = None
+    try:
+        while True:
+            if next_record is None:
+                next_record = asyncio.ensure_future(anext(records))
+            timeout = None if deadline is None else max(0.0, deadline - asyncio.get_running_loop().time())
+            done, _ = await asyncio.wait({next_record}, timeout=timeout)
+            if not done:
+                # No finish within the batch window: write what is pending
+                await flush()
+                deadline = None
+                continue
+            task, next_record = next_record, None
+            try:
+                number, record = task.result()
+            except StopAsyncIteration:
+                break
+            try:
+                if record is None:
+                    raise ValueError("Not a JSON object")
+                finish = resolver.resolve(record)
+            except ValueError as e:
+                rejected.append({"record": number, "error": str(e)})
+                continue
+            # A later finish of the same boat replaces the pending one
+            pending[finish.YID] = finish
+            if deadline is None:
+                deadline = asyncio.get_running_loop().time() + FINISH_BATCH_SECONDS
+            if len(pending) >= FINISH_BATCH_SIZE:
+                await flush()
+                deadline = None
+        if pending:
+            await flush()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error writing live finishes: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to write finishes")
+    finally:
+        if next_record is not None:
+            next_record.cancel()
+
+    logger.info(f"Live finishes for race {race_id}: {written} written in {batches} batches, {len(rejected)} rejected")
+    if version is None:
+        version = await run_in_threadpool(file_version, abs_path)
+    return {"written": written, "batches": batches, "rejected": rejected,
+            "version": version, "scoring_error": scoring_error}
+
+@app.get("/api/files/{file_path:path}/classes/{class_id}/series")
+async def get_series_standings(file_path: str, class_id: str, wind_speeds: Optional[str] = None):
+    """
+    Series standings of a class over every race with results: points per race (with coefficients),
+    discarded scores, total and net points and positions after tie-breaks.
+    wind_speeds gives the wind speed of the triple number races as "RaceId:knots,RaceId:knots".
+    """
+    try:
+        try:
+            abs_path = validate_file_path(file_path)
+        except ValueError as e:
+            logger.warning(f"Invalid file path: {str(e)}")
+            raise HTTPException(status_code=400, detail="Invalid file path")
+
+        if not os.path.exists(abs_path):
+            logger.warning(f"File not found")
+            raise HTTPException(status_code=404, detail="File not found")
+
+        race_wind_speeds = {}
+        for item in (wind_speeds or "").split(","):
+            if not item.strip():
+                continue
+            race_id, _, knots = item.partition(":")
+            try:
+                race_id, knots = int(race_id), float(knots)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid wind speed: {item.strip()}")
+            # Also rejects nan
+            if not knots >= 0:
+                raise HTTPException(status_code=400, detail=f"Invalid wind speed: {item.strip()}")
+            race_wind_speeds[race_id] = knots
+
+        try:
+            return await run_in_threadpool(results_cache.series, abs_path, class_id, race_wind_speeds)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Class not found")
+        except InvalidOrcscFile as e:
+            logger.error(f"Failed to parse ORCSC file: {e}")
+            raise HTTPException(status_code=400, detail="Invalid file format")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing series standings: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to compute series standings")
+
 @app.get("/api/files/download/{filename}")
-async def download_orcsc_file(filename: str):
-    """Download an ORCSC file"""
+async def download_orcsc_file(filename: str, request: Request):
+    """Download an ORCSC file, precompressed with brotli or gzip when the client accepts it"""
     try:
         logger.info(f"Download requested")
         
@@ -512,11 +1201,22 @@ async def download_orcsc_file(filename: str):
             logger.warning(f"File not found: {filename}")
             raise HTTPException(status_code=404, detail="File not found")
         
+        encoding = accepted_encoding(request.headers.get("accept-encoding"))
+        if encoding:
+            variant = await run_in_threadpool(compressed_files.get, validated_path, encoding)
+            return FileResponse(
+                variant,
+                media_type="application/xml",
+                filename=filename,
+                headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding", "ETag": file_etag(validated_path)}
+            )
+
         # Return the file
         return FileResponse(
             validated_path,
             media_type="application/xml",
-            filename=filename
+            filename=filename,
+            headers={"Vary": "Accept-Encoding", "ETag": file_etag(validated_path)}
         )
         
     except HTTPException:
@@ -632,6 +1332,7 @@ async def create_file_from_template(request: CreateFileRequest):
         if request.event_data:
             change_summary += " with custom event data"
         file_history.create_backup(output_file, change_summary)
+        file_changed(output_file)
         logger.info(f"File created successfully")
         
         return {"file_path": output_file}
@@ -642,7 +1343,7 @@ async def create_file_from_template(request: CreateFileRequest):
         raise HTTPException(status_code=500, detail="Failed to create file")
 
 @app.post("/api/files/{file_path:path}/classes")
-async def add_class_to_file(file_path: str, request: AddClassRequest):
+async def add_class_to_file(file_path: str, request: AddClassRequest, if_match: Optional[str] = Header(None)):
     """Add a class to an existing ORCSC file"""
     try:
         logger.info(f"Adding class to file")
@@ -672,14 +1373,16 @@ async def add_class_to_file(file_path: str, request: AddClassRequest):
         cls_row.ClassName = request.class_data.ClassName
         cls_row._class_enum = request.class_data.YachtClass
         
-        # Add class to the file
-        add_classes(abs_path, abs_path, [cls_row])
-        # Create backup after modifying
-        change_summary = f"Added class: {request.class_data.ClassName} ({request.class_data.ClassId})"
-        file_history.create_backup(abs_path, change_summary)
+        async with locked_file(abs_path, if_match) as write:
+            # Add class to the file
+            add_classes(abs_path, abs_path, [cls_row])
+            # Create backup after modifying
+            change_summary = f"Added class: {request.class_data.ClassName} ({request.class_data.ClassId})"
+            file_history.create_backup(abs_path, change_summary)
+            file_changed(abs_path)
 
         logger.info(f"Successfully added class {request.class_data.ClassId}")
-        return {"message": f"Successfully added class {request.class_data.ClassId}"}
+        return {"message": f"Successfully added class {request.class_data.ClassId}", "version": write.version}
         
     except HTTPException:
         raise
@@ -688,7 +1391,7 @@ async def add_class_to_file(file_path: str, request: AddClassRequest):
         raise HTTPException(status_code=500, detail="Failed to add class")
 
 @app.post("/api/files/{file_path:path}/boats")
-async def add_boats_to_file(file_path: str, request: AddBoatsRequest):
+async def add_boats_to_file(file_path: str, request: AddBoatsRequest, if_match: Optional[str] = Header(None)):
     """Add boats to an existing ORCSC file"""
     try:
         logger.info(f"Adding boats to file")
@@ -721,15 +1424,17 @@ async def add_boats_to_file(file_path: str, request: AddBoatsRequest):
             fleet_row.CTOT = 1  # Set custom TOT to 1 for manually added boats
             fleet_rows.append(fleet_row)
         
-        # Add boats to the file
-        orcsc_add_fleets(abs_path, abs_path, fleet_rows)
-        # Create backup after modifying
-        boat_names = [boat.YachtName for boat in request.boats]
-        change_summary = f"Added boats: {', '.join(boat_names)}"
-        file_history.create_backup(abs_path, change_summary)
+        async with locked_file(abs_path, if_match) as write:
+            # Add boats to the file
+            orcsc_add_fleets(abs_path, abs_path, fleet_rows)
+            # Create backup after modifying
+            boat_names = [boat.YachtName for boat in request.boats]
+            change_summary = f"Added boats: {', '.join(boat_names)}"
+            file_history.create_backup(abs_path, change_summary)
+            file_changed(abs_path)
         
         logger.info(f"Successfully added {len(fleet_rows)} boats")
-        return {"message": f"Successfully added {len(fleet_rows)} boats"}
+        return {"message": f"Successfully added {len(fleet_rows)} boats", "version": write.version}
         
     except HTTPException:
         raise
@@ -738,7 +1443,7 @@ async def add_boats_to_file(file_path: str, request: AddBoatsRequest):
         raise HTTPException(status_code=500, detail="Failed to add boats")
 
 @app.post("/api/files/{file_path:path}/boats/update")
-async def update_boat_in_file(file_path: str, request: UpdateBoatRequest):
+async def update_boat_in_file(file_path: str, request: UpdateBoatRequest, if_match: Optional[str] = Header(None)):
     """Update a boat (fleet entry) in an existing ORCSC file by YID"""
     try:
         logger.info(f"Updating boat in file")
@@ -770,13 +1475,15 @@ async def update_boat_in_file(file_path: str, request: UpdateBoatRequest):
             if request.Rating is not None:
                 fleet_row.Rating = request.Rating if request.Rating.strip() else None
 
-        # Update the fleet entry
-        orcsc_update_fleet(abs_path, abs_path, fleet_row)
-        change_summary = f"Updated boat: {request.YachtName or 'unknown'} (YID={request.YID})"
-        file_history.create_backup(abs_path, change_summary)
+        async with locked_file(abs_path, if_match) as write:
+            # Update the fleet entry
+            orcsc_update_fleet(abs_path, abs_path, fleet_row)
+            change_summary = f"Updated boat: {request.YachtName or 'unknown'} (YID={request.YID})"
+            file_history.create_backup(abs_path, change_summary)
+            file_changed(abs_path)
 
         logger.info(f"Successfully updated boat YID={request.YID}")
-        return {"message": f"Successfully updated boat YID={request.YID}"}
+        return {"message": f"Successfully updated boat YID={request.YID}", "version": write.version}
 
     except HTTPException:
         raise
@@ -818,8 +1525,53 @@ async def get_file_history(file_path: str):
         logger.error(f"Error getting file history: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to get file history")
 
+@app.get("/api/files/{file_path:path}/history/diff")
+async def diff_file_versions(
+    file_path: str,
+    from_version: str = Query(..., alias="from"),
+    to_version: str = Query("current", alias="to")
+):
+    """
+    Row-level diff of classes, races and fleet (keyed by ClassId, RaceId and YID) between two
+    versions of a file. from/to are backup filenames as listed by the history endpoint, or "current".
+    """
+    try:
+        try:
+            if not file_path.startswith("orcsc/output/"):
+                file_path = os.path.join("orcsc", "output", file_path)
+            abs_path = validate_file_path(file_path)
+        except ValueError as e:
+            logger.warning(f"Invalid file path: {str(e)}")
+            raise HTTPException(status_code=400, detail="Invalid file path")
+
+        if not os.path.exists(abs_path):
+            logger.warning(f"File not found")
+            raise HTTPException(status_code=404, detail="File not found")
+
+        backups = {backup["filename"]: backup["path"] for backup in file_history.list_backups(abs_path)}
+
+        def version_path(version: str) -> str:
+            if version == "current":
+                return abs_path
+            if version not in backups:
+                raise HTTPException(status_code=404, detail=f"Version not found: {version}")
+            return backups[version]
+
+        try:
+            changes = diff_files(version_path(from_version), version_path(to_version))
+        except InvalidOrcscFile as e:
+            logger.error(f"Failed to parse ORCSC file: {e}")
+            raise HTTPException(status_code=400, detail="Invalid file format")
+
+        return {"from": from_version, "to": to_version, "changes": changes}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error diffing file versions: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to diff file versions")
+
 @app.post("/api/files/{file_path:path}/history/restore")
-async def restore_from_backup(file_path: str, request: RestoreBackupRequest):
+async def restore_from_backup(file_path: str, request: RestoreBackupRequest, if_match: Optional[str] = Header(None)):
     """Restore a file from a backup."""
     try:
         logger.info(f"Restoring file from backup")
@@ -842,14 +1594,16 @@ async def restore_from_backup(file_path: str, request: RestoreBackupRequest):
             logger.warning(f"File not found")
             raise HTTPException(status_code=404, detail="File not found")
         
-        # Restore from backup
-        restored_path = file_history.restore_backup(request.backup_path)
+        async with locked_file(abs_path, if_match) as write:
+            # Restore from backup
+            restored_path = file_history.restore_backup(request.backup_path)
         
-        if not restored_path:
-            logger.warning(f"Failed to restore from backup")
-            raise HTTPException(status_code=404, detail="Failed to restore from backup")
+            if not restored_path:
+                logger.warning(f"Failed to restore from backup")
+                raise HTTPException(status_code=404, detail="Failed to restore from backup")
+            file_changed(restored_path)
             
-        return {"message": f"File restored successfully"}
+        return {"message": f"File restored successfully", "version": write.version}
     except HTTPException:
         raise
     except FileNotFoundError as e:
@@ -859,14 +1613,15 @@ async def restore_from_backup(file_path: str, request: RestoreBackupRequest):
         logger.error(f"Error restoring from backup: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to restore from backup")
 
-from orcsc.orcsc_file_editor import add_fleet_from_orc_json
+from orcsc.orcsc_file_editor import add_fleet_from_orc_json, add_fleets_from_orc_json
 from fastapi import Body
 
 @app.post("/api/files/{file_path:path}/boats/orcjson")
 async def add_boat_from_orc_json(
     file_path: str,
     orc_json: dict = Body(...),
-    class_id: Optional[str] = None
+    class_id: Optional[str] = None,
+    if_match: Optional[str] = Header(None)
 ):
     """
     Add a boat (fleet) from a JSON object as retrieved from the ORC API.
@@ -890,24 +1645,387 @@ async def add_boat_from_orc_json(
         if not orc_json.get("YachtName"):
             raise HTTPException(status_code=400, detail="Yacht name is required")
         
-        logger.info(f"Processing ORC JSON boat")
-        add_fleet_from_orc_json(abs_path, abs_path, orc_json, class_id=class_id)
-        yacht_name = orc_json.get("YachtName", "")
-        sail_no = orc_json.get("SailNo", "")
-        change_summary = f"Added ORC boat: {yacht_name} ({sail_no})"
-        file_history.create_backup(abs_path, change_summary)
+        async with locked_file(abs_path, if_match) as write:
+            logger.info(f"Processing ORC JSON boat")
+            add_fleet_from_orc_json(abs_path, abs_path, orc_json, class_id=class_id)
+            yacht_name = orc_json.get("YachtName", "")
+            sail_no = orc_json.get("SailNo", "")
+            change_summary = f"Added ORC boat: {yacht_name} ({sail_no})"
+            file_history.create_backup(abs_path, change_summary)
+            file_changed(abs_path)
 
         logger.info(f"Successfully added ORC boat")
-        return {"message": f"Successfully added ORC boat {yacht_name} ({sail_no})"}
+        return {"message": f"Successfully added ORC boat {yacht_name} ({sail_no})", "version": write.version}
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error adding ORC boat: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to add ORC boat")
 
+@app.post("/api/files/{file_path:path}/boats/orcjson/batch")
+async def add_boats_from_certificate_index(file_path: str, request: AddOrcBoatsRequest, if_match: Optional[str] = Header(None)):
+    """Add boats by certificate RefNo from the local certificate index in a single write."""
+    try:
+        logger.info(f"Adding ORC boats from certificate index to file")
+
+        # Validate and resolve the file path
+        try:
+            abs_path = validate_file_path(file_path)
+        except ValueError as e:
+            logger.warning(f"Invalid file path: {str(e)}")
+            raise HTTPException(status_code=400, detail="Invalid file path")
+
+        if not os.path.exists(abs_path):
+            logger.warning(f"File not found")
+            raise HTTPException(status_code=404, detail="File not found")
+
+        if not request.ref_nos:
+            raise HTTPException(status_code=400, detail="No certificates provided")
+
+        certificates = certificate_index.get_many(request.ref_nos)
+        missing = [ref_no for ref_no in request.ref_nos if ref_no not in certificates]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Certificates not found: {', '.join(missing)}")
+
+        async with locked_file(abs_path, if_match) as write:
+            orc_jsons = [certificates[ref_no] for ref_no in dict.fromkeys(request.ref_nos)]
+            add_fleets_from_orc_json(abs_path, abs_path, orc_jsons, class_id=request.class_id)
+            boat_names = [f"{cert.get('YachtName', '')} ({cert.get('SailNo', '')})" for cert in orc_jsons]
+            change_summary = f"Added ORC boats: {', '.join(boat_names)}"
+            file_history.create_backup(abs_path, change_summary)
+            file_changed(abs_path)
+
+        logger.info(f"Successfully added {len(orc_jsons)} ORC boats")
+        return {"message": f"Successfully added {len(orc_jsons)} ORC boats", "version": write.version}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error adding ORC boats: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to add ORC boats")
+
+@app.get("/api/certificates")
+async def search_certificates(
+    q: str = "",
+    country: Optional[str] = None,
+    family: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Search the local certificate index by yacht name or sail number."""
+    try:
+        total, boats = await run_in_threadpool(certificate_index.search, q, country=country, family=family,
+                                               limit=limit, offset=offset)
+        return {"total": total, "offset": offset, "limit": limit, "boats": boats}
+    except Exception as e:
+        logger.error(f"Error searching certificates: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to search certificates")
+
+def rating_matrix_response(boats: list, ratings: dict, options: Optional[List[str]], unit: str, fmt: str,
+                           filename: str):
+    """Pairwise time allowance matrices as JSON, or as a CSV or XLSX download."""
+    units = rating_matrix.UNITS if unit == "both" else (unit,)
+    if any(u not in rating_matrix.UNITS for u in units):
+        raise HTTPException(status_code=400, detail="Unit must be hour, mile or both")
+    try:
+        matrices = rating_matrix.allowance_matrices(ratings, options, units)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if fmt == "json":
+        return rating_matrix.matrices_json(boats, matrices)
+    if fmt == "csv":
+        return Response(content=rating_matrix.matrices_csv(boats, matrices), media_type="text/csv",
+                        headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'})
+    if fmt == "xlsx":
+        output = io.BytesIO()
+        rating_matrix.write_matrices_xlsx(boats, matrices, output)
+        return Response(content=output.getvalue(),
+                        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        headers={"Content-Disposition": f'attachment; filename="{filename}.xlsx"'})
+    raise HTTPException(status_code=400, detail="Format must be json, csv or xlsx")
+
+@app.get("/api/files/{file_path:path}/rating-matrix")
+async def get_fleet_rating_matrix(
+    file_path: str,
+    class_id: Optional[str] = None,
+    options: Optional[str] = None,
+    unit: str = Query("both"),
+    format: str = Query("json")
+):
+    """
+    What-if comparison of the fleet of a file (or of one class): for each scoring option (comma separated
+    rating fields, default all) the time allowance every boat gives every other boat, in seconds per hour
+    (time on time) and/or seconds per mile (time on distance).
+    """
+    try:
+        try:
+            abs_path = validate_file_path(file_path)
+        except ValueError as e:
+            logger.warning(f"Invalid file path: {str(e)}")
+            raise HTTPException(status_code=400, detail="Invalid file path")
+
+        if not os.path.exists(abs_path):
+            logger.warning(f"File not found")
+            raise HTTPException(status_code=404, detail="File not found")
+
+        try:
+            fleet = [row for _, row in iter_orcsc_rows(abs_path, ('Fleet',))
+                     if class_id is None or row.get('ClassId') == class_id]
+        except InvalidOrcscFile as e:
+            logger.error(f"Failed to parse ORCSC file: {e}")
+            raise HTTPException(status_code=400, detail="Invalid file format")
+        boats, ratings = rating_matrix.ratings_from_fleet(fleet)
+        name = os.path.splitext(os.path.basename(abs_path))[0]
+        return rating_matrix_response(boats, ratings, options.split(",") if options else None, unit, format,
+                                      f"{name}_rating_matrix")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing rating matrix: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to compute rating matrix")
+
+@app.post("/api/certificates/rating-matrix")
+async def get_certificate_rating_matrix(request: RatingMatrixRequest):
+    """What-if comparison of a set of certificates from the local certificate index (see the file variant)."""
+    if not request.ref_nos:
+        raise HTTPException(status_code=400, detail="No certificates provided")
+    try:
+        ref_nos = list(dict.fromkeys(request.ref_nos))
+        store = index_store(ref_nos)
+        boats, ratings = rating_matrix.ratings_from_store(store)
+        return rating_matrix_response(boats, ratings, request.options, request.unit, request.format,
+                                      "rating_matrix")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing rating matrix: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to compute rating matrix")
+
+@app.get("/api/courses")
+async def get_courses():
+    """Course definitions: {course: {leg: length in multiples of L1}}."""
+    course_set = await run_in_threadpool(saved_courses.get)
+    return {"courses": course_set.definitions, "legs": [leg for leg in course_set.legs if leg not in courses.ANGLE_LEGS]}
+
+@app.put("/api/courses")
+async def replace_courses(definitions: dict = Body(...)):
+    """
+    Replace the course definitions. Legs are Allowances keys (Beat, Run, R110, WL...) or TWA<angle> for a
+    reach at any angle between 52 and 150 degrees, with lengths in multiples of L1.
+    """
+    try:
+        course_set = courses.CourseSet(definitions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        await run_in_threadpool(saved_courses.save, course_set)
+    except Exception as e:
+        logger.error(f"Error saving courses: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to save courses")
+    logger.info(f"Course definitions replaced: {', '.join(course_set.names)}")
+    return {"courses": course_set.definitions}
+
+@app.get("/api/files/{file_path:path}/course-plan")
+async def plan_courses(
+    file_path: str,
+    wind_speed: float = Query(..., gt=0),
+    target_min: float = Query(settings.target_time - settings.target_time_margin, gt=0),
+    target_max: float = Query(settings.target_time + settings.target_time_margin, gt=0),
+    class_id: Optional[str] = None
+):
+    """
+    For each course type, the L1 (start line to first mark, miles) range in which every boat of the file
+    (or of one class) finishes within the target time window (minutes) at the wind speed (knots).
+    Allowances come from the certificates in the local certificate index, matched by RefNo.
+    """
+    if target_min >= target_max:
+        raise HTTPException(status_code=400, detail="target_min must be lower than target_max")
+    try:
+        try:
+            abs_path = validate_file_path(file_path)
+        except ValueError as e:
+            logger.warning(f"Invalid file path: {str(e)}")
+            raise HTTPException(status_code=400, detail="Invalid file path")
+
+        if not os.path.exists(abs_path):
+            logger.warning(f"File not found")
+            raise HTTPException(status_code=404, detail="File not found")
+
+        def plan():
+            # File parsing, certificate lookup and store building, off the event loop
+            try:
+                fleet = [row for _, row in iter_orcsc_rows(abs_path, ('Fleet',))
+                         if class_id is None or row.get('ClassId') == class_id]
+            except InvalidOrcscFile as e:
+                logger.error(f"Failed to parse ORCSC file: {e}")
+                raise HTTPException(status_code=400, detail="Invalid file format")
+            certificates = certificate_index.get_many(row.get('RefNo') for row in fleet if row.get('RefNo'))
+            boats = [row for row in fleet if row.get('RefNo') in certificates]
+            missing = [{"YID": row.get('YID'), "YachtName": row.get('YachtName') or "",
+                        "SailNo": row.get('SailNo') or ""}
+                       for row in fleet if row.get('RefNo') not in certificates]
+            if not boats:
+                raise HTTPException(status_code=404, detail="No boat of the fleet has a certificate in the index")
+
+            store = index_store([row['RefNo'] for row in boats])
+            try:
+                ranges = course_planner.l1_ranges(store, wind_speed, target_min, target_max, saved_courses.get())
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            return boats, missing, ranges
+
+        boats, missing, ranges = await run_in_threadpool(plan)
+
+        def boat(i, seconds_per_l1):
+            yid = boats[i].get('YID')
+            return {"YID": int(yid) if (yid or '').isdigit() else yid, "YachtName": boats[i].get('YachtName') or "",
+                    "SailNo": boats[i].get('SailNo') or "", "seconds_per_l1": round(float(seconds_per_l1[i]), 1)}
+
+        planned = []
+        for name, (min_l1, max_l1, fastest, slowest, per_l1) in ranges.items():
+            feasible = bool(min_l1 <= max_l1)
+            planned.append({
+                "course": name,
+                "min_l1": None if min_l1 != min_l1 else round(float(min_l1), 2),
+                "max_l1": None if max_l1 != max_l1 else round(float(max_l1), 2),
+                "feasible": feasible,
+                "fastest": boat(fastest, per_l1),
+                "slowest": boat(slowest, per_l1),
+            })
+        return {"wind_speed": wind_speed, "target_min": target_min, "target_max": target_max,
+                "time_allowance": settings.target_time_allowance, "courses": planned, "missing": missing}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error planning courses: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to plan courses")
+
+@app.get("/api/files/{file_path:path}/time-limits")
+async def get_time_limits(file_path: str, class_id: Optional[str] = None, formula: Optional[str] = None):
+    """
+    Time limit of every race of the file (or of one class) from the class TimeLimitFormulae, or from
+    formula to try another one: per boat its limit in seconds after the start and its deadline, and per
+    race the class deadline (the latest boat deadline). Deadlines use the StartTime clock and format.
+    """
+    try:
+        try:
+            abs_path = validate_file_path(file_path)
+        except ValueError as e:
+            logger.warning(f"Invalid file path: {str(e)}")
+            raise HTTPException(status_code=400, detail="Invalid file path")
+
+        if not os.path.exists(abs_path):
+            logger.warning(f"File not found")
+            raise HTTPException(status_code=404, detail="File not found")
+
+        try:
+            races = await run_in_threadpool(file_time_limits, abs_path, class_id, formula)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Class not found")
+        except InvalidFormula as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except InvalidOrcscFile as e:
+            logger.error(f"Failed to parse ORCSC file: {e}")
+            raise HTTPException(status_code=400, detail="Invalid file format")
+        return {"races": races}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing time limits: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to compute time limits")
+
+@app.post("/api/pcs/score")
+async def score_performance_curve(request: PcsScoreRequest):
+    """
+    Performance curve scoring: implied wind and corrected time of each boat from its elapsed time,
+    the course length (miles) and the course composition as leg weights (e.g. {"Beat": 0.5, "Run": 0.5}
+    or {"WL": 1}), using the certificate Allowances from the local certificate index.
+    With method "tod", time on distance scoring on the course allowances at wind_speed instead.
+    """
+    if request.distance <= 0:
+        raise HTTPException(status_code=400, detail="Distance must be positive")
+    if request.method not in ("pcs", "tod"):
+        raise HTTPException(status_code=400, detail="Method must be pcs or tod")
+    if request.method == "tod" and request.wind_speed is None:
+        raise HTTPException(status_code=400, detail="Time on distance scoring needs a wind speed")
+    if not request.boats:
+        raise HTTPException(status_code=400, detail="No boats provided")
+    try:
+        ref_nos = [boat.RefNo for boat in request.boats]
+        store = index_store(ref_nos)
+        scratch = None
+        if request.scratch_ref_no:
+            if request.scratch_ref_no not in ref_nos:
+                raise HTTPException(status_code=400, detail="Scratch boat must be one of the boats")
+            scratch = ref_nos.index(request.scratch_ref_no)
+        elapsed = [boat.elapsed_seconds if boat.elapsed_seconds else float("nan") for boat in request.boats]
+        try:
+            if request.method == "tod":
+                scored = pcs.score_tod(store, elapsed, request.distance, request.course, request.wind_speed, scratch)
+            else:
+                scored = pcs.score_pcs(store, elapsed, request.distance, request.course, scratch)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        def number(value):
+            return None if value != value else float(value)
+
+        results = []
+        for i, boat in enumerate(request.boats):
+            results.append({
+                "RefNo": boat.RefNo,
+                "YachtName": str(store["YachtName"][i]),
+                "SailNo": str(store["SailNo"][i]),
+                "ElapsedSeconds": boat.elapsed_seconds,
+                "ImpliedWind": number(scored["implied_wind"][i]) if "implied_wind" in scored else None,
+                "Allowance": number(scored["allowance"][i]) if "allowance" in scored else None,
+                "CorrectedSeconds": number(scored["corrected"][i]),
+                "Position": int(scored["position"][i]) or None,
+                "Points": float(scored["points"][i])
+            })
+        results.sort(key=lambda row: (row["Position"] is None, row["Position"] or 0))
+        return {"method": request.method, "scratch": ref_nos[scored["scratch"]],
+                "wind_speeds": store.wind_speeds.tolist(), "results": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error scoring performance curve: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to score performance curve")
+
+def gzip_json_response(data: bytes, request: Request, max_age: int = 300) -> Response:
+    """Return gzipped JSON as is, or decompressed for clients not accepting gzip."""
+    headers = {"Vary": "Accept-Encoding", "Cache-Control": f"public, max-age={max_age}"}
+    if accepts_encoding(request.headers.get("accept-encoding"), "gzip"):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=data, media_type="application/json", headers=headers)
+    return Response(content=gzip.decompress(data), media_type="application/json", headers=headers)
+
+@app.get("/api/orcdb/countries")
+async def get_orcdb_countries(request: Request):
+    """List the ORC DB countries, served from the shared ORC DB cache."""
+    try:
+        data = await orcdb_cache.countries()
+        return gzip_json_response(data, request)
+    except Exception as e:
+        logger.error(f"Error fetching ORC DB countries: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=502, detail="Failed to fetch country list")
+
+@app.get("/api/orcdb/certificates")
+async def get_orcdb_certificates(request: Request, country: str = Query(...), family: str = Query(...)):
+    """Get the ORC DB certificates of a country and family (ORC, NS, DH) from the shared ORC DB cache."""
+    if not re.match(r'^[A-Za-z]{3}$', country):
+        raise HTTPException(status_code=400, detail="Invalid country")
+    if family not in ORCDB_FAMILIES:
+        raise HTTPException(status_code=400, detail="Invalid certificate family")
+    try:
+        data = await orcdb_cache.certificates(country.upper(), family)
+        return gzip_json_response(data, request)
+    except Exception as e:
+        logger.error(f"Error fetching ORC DB certificates: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=502, detail="Failed to fetch certificates")
+
 
 @app.delete("/api/classes")
-async def delete_class(file_path: str = Query(...), class_id: str = Query(...)):
+async def delete_class(file_path: str = Query(...), class_id: str = Query(...), if_match: Optional[str] = Header(None)):
     """Delete a class from the file."""
     try:
         # Decode URL-encoded path
@@ -925,15 +2043,17 @@ async def delete_class(file_path: str = Query(...), class_id: str = Query(...)):
             logger.warning(f"File not found at path: {abs_path}")
             raise HTTPException(status_code=404, detail="File not found")
 
-        # Create a backup before deleting
-        change_summary = f"Deleted class: {class_id}"
-        file_history.create_backup(abs_path, change_summary)
+        async with locked_file(abs_path, if_match) as write:
+            # Create a backup before deleting
+            change_summary = f"Deleted class: {class_id}"
+            file_history.create_backup(abs_path, change_summary)
 
-        # Delete the class
-        orcsc_delete_class(abs_path, abs_path, class_id)
+            # Delete the class
+            orcsc_delete_class(abs_path, abs_path, class_id)
+            file_changed(abs_path)
 
         logger.info(f"Successfully deleted class {class_id}")
-        return {"message": f"Successfully deleted class {class_id}"}
+        return {"message": f"Successfully deleted class {class_id}", "version": write.version}
     except HTTPException:
         raise
     except ValueError as e:
@@ -945,7 +2065,7 @@ async def delete_class(file_path: str = Query(...), class_id: str = Query(...)):
 
 
 @app.delete("/api/races")
-async def delete_race(file_path: str = Query(...), race_id: str = Query(...)):
+async def delete_race(file_path: str = Query(...), race_id: str = Query(...), if_match: Optional[str] = Header(None)):
     """Delete a race from the file."""
     try:
         # Decode URL-encoded path
@@ -963,15 +2083,17 @@ async def delete_race(file_path: str = Query(...), race_id: str = Query(...)):
             logger.warning(f"File not found at path: {abs_path}")
             raise HTTPException(status_code=404, detail="File not found")
 
-        # Create a backup before deleting
-        change_summary = f"Deleted race: {race_id}"
-        file_history.create_backup(abs_path, change_summary)
+        async with locked_file(abs_path, if_match) as write:
+            # Create a backup before deleting
+            change_summary = f"Deleted race: {race_id}"
+            file_history.create_backup(abs_path, change_summary)
 
-        # Delete the race
-        orcsc_delete_race(abs_path, abs_path, race_id)
+            # Delete the race
+            orcsc_delete_race(abs_path, abs_path, race_id)
+            file_changed(abs_path)
 
         logger.info(f"Successfully deleted race {race_id}")
-        return {"message": f"Successfully deleted race {race_id}"}
+        return {"message": f"Successfully deleted race {race_id}", "version": write.version}
     except HTTPException:
         raise
     except ValueError as e:
@@ -983,7 +2105,7 @@ async def delete_race(file_path: str = Query(...), race_id: str = Query(...)):
 
 
 @app.delete("/api/boats")
-async def delete_boat(file_path: str = Query(...), boat_id: str = Query(...)):
+async def delete_boat(file_path: str = Query(...), boat_id: str = Query(...), if_match: Optional[str] = Header(None)):
     """Delete a boat from the fleet."""
     try:
         # Decode URL-encoded path
@@ -1001,15 +2123,17 @@ async def delete_boat(file_path: str = Query(...), boat_id: str = Query(...)):
             logger.warning(f"File not found at path: {abs_path}")
             raise HTTPException(status_code=404, detail="File not found")
 
-        # Create a backup before deleting
-        change_summary = f"Deleted boat: {boat_id}"
-        file_history.create_backup(abs_path, change_summary)
+        async with locked_file(abs_path, if_match) as write:
+            # Create a backup before deleting
+            change_summary = f"Deleted boat: {boat_id}"
+            file_history.create_backup(abs_path, change_summary)
 
-        # Delete the boat
-        orcsc_delete_boat(abs_path, abs_path, boat_id)
+            # Delete the boat
+            orcsc_delete_boat(abs_path, abs_path, boat_id)
+            file_changed(abs_path)
 
         logger.info(f"Successfully deleted boat {boat_id}")
-        return {"message": f"Successfully deleted boat {boat_id}"}
+        return {"message": f"Successfully deleted boat {boat_id}", "version": write.version}
     except HTTPException:
         raise
     except ValueError as e:
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import orc
+from utils import create_folder
+
+DEFAULT_SNAPSHOT_PATH = 'certs_snapshot.json'
+DEFAULT_CHANGES_PATH = 'certs_changes/'
+# Fields identifying a certificate in the change feed
+SUMMARY_FIELDS = ['RefNo', 'BIN', 'SailNo', 'YachtName', 'Family', 'C_Type', 'NatAuth', 'IssueDate']
+
+
+def _hash(value):
+    data = json.dumps(value, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def cert_key(cert):
+    """Certificate key: its RefNo (BIN and Family are shared by e.g. the CLUB and INTL certificates of a boat)."""
+    return str(cert.get('RefNo') or f"hash:{_hash(cert)}")
+
+
+def _boat_key(summary):
+    # Boat and certificate kind, only used to recognize a certificate re-issued under a new RefNo
+    if not summary.get('BIN'):
+        return None
+    return summary['BIN'], summary.get('Family') or '', summary.get('C_Type') or ''
+
+
+def snapshot_certs(path='jsons/'):
+    """Hash every certificate (and each of its fields) of the json files in path."""
+    snapshot = {}
+    files = sorted(entry.path for entry in os.scandir(path) if entry.is_file() and entry.name.endswith('.json'))
+    for file in files:
+        for cert in orc.iter_json_files([file]):
+            snapshot[cert_key(cert)] = {
+                'summary': {field: cert.get(field) for field in SUMMARY_FIELDS},
+                'hash': _hash(cert),
+                'fields': {field: _hash(value) for field, value in cert.items()},
+            }
+    return snapshot
+
+
+def _changed_fields(previous, entry):
+    fields = set(previous['fields']) | set(entry['fields'])
+    return sorted(f for f in fields if previous['fields'].get(f) != entry['fields'].get(f))
+
+
+def diff_snapshots(old, new):
+    """
+    New, removed and re-rated certificates between two snapshots (keyed by RefNo), with the changed fields.
+    A removed and a new certificate of the same boat (BIN), family and certificate type are reported
+    as re-rated with previous_RefNo, when that pairing is unambiguous.
+    """
+    changes = {'new': [], 'removed': [], 'rerated': []}
+    added = [key for key in new if key not in old]
+    removed = [key for key in old if key not in new]
+    for key, entry in new.items():
+        previous = old.get(key)
+        if previous is not None and previous['hash'] != entry['hash']:
+            changes['rerated'].append({'key': key, **entry['summary'], 'previous_RefNo': key,
+                                       'changed_fields': _changed_fields(previous, entry)})
+
+    added_by_boat, removed_by_boat = {}, {}
+    for key in added:
+        added_by_boat.setdefault(_boat_key(new[key]['summary']), []).append(key)
+    for key in removed:
+        removed_by_boat.setdefault(_boat_key(old[key]['summary']), []).append(key)
+    reissued = set()
+    for boat, keys in added_by_boat.items():
+        previous_keys = removed_by_boat.get(boat, [])
+        if boat is None or len(keys) != 1 or len(previous_keys) != 1:
+            continue
+        key, previous_key = keys[0], previous_keys[0]
+        changes['rerated'].append({'key': key, **new[key]['summary'], 'previous_RefNo': previous_key,
+                                   'changed_fields': _changed_fields(old[previous_key], new[key])})
+        reissued.update((key, previous_key))
+
+    changes['new'] = [{'key': key, **new[key]['summary']} for key in added if key not in reissued]
+    changes['removed'] = [{'key': key, **old[key]['summary']} for key in removed if key not in reissued]
+    return changes
+
+
+def load_snapshot(snapshot_path=DEFAULT_SNAPSHOT_PATH):
+    if not os.path.exists(snapshot_path):
+        return {}
+    with open(snapshot_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_snapshot(snapshot, snapshot_path=DEFAULT_SNAPSHOT_PATH):
+    with open(snapshot_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+
+
+def detect_changes(path='jsons/', snapshot_path=DEFAULT_SNAPSHOT_PATH, changes_path=DEFAULT_CHANGES_PATH):
+    """
+    Compare the certificates in path against the previous snapshot, write the change feed to
+    changes_path and replace the snapshot. Returns the feed.
+    """
+    old = load_snapshot(snapshot_path)
+    new = snapshot_certs(path)
+    feed = {
+        'generated': datetime.now().isoformat(),
+        'initial': not old,
+        **diff_snapshots(old, new),
+    }
+    feed['affected'] = sorted({c['key'] for c in feed['new'] + feed['removed'] + feed['rerated']}
+                              | {c['previous_RefNo'] for c in feed['rerated']})
+    feed_file = os.path.join(changes_path, f"changes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    create_folder(feed_file)
+    with open(feed_file, 'w', encoding='utf-8') as f:
+        json.dump(feed, f, ensure_ascii=False, indent=2)
+    save_snapshot(new, snapshot_path)
+    print(f"Certificate changes: {len(feed['new'])} new, {len(feed['removed'])} removed, "
+          f"{len(feed['rerated'])} re-rated ({feed_file})")
+    return feed
@@ -0,0 +1,375 @@
+import difflib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+import orc
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = 'certs_index.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS certs (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL,
+    ref_no TEXT,
+    bin TEXT,
+    boat_key TEXT NOT NULL,
+    sail_no TEXT,
+    sail_key TEXT,
+    yacht_name TEXT,
+    name_key TEXT,
+    country TEXT,
+    family TEXT,
+    cert_type TEXT,
+    issue_date TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS certs_file ON certs (file);
+CREATE INDEX IF NOT EXISTS certs_ref_no ON certs (ref_no);
+CREATE INDEX IF NOT EXISTS certs_bin ON certs (bin);
+CREATE INDEX IF NOT EXISTS certs_boat_key ON certs (boat_key);
+CREATE INDEX IF NOT EXISTS certs_sail_key ON certs (sail_key);
+CREATE INDEX IF NOT EXISTS certs_name_key ON certs (name_key);
+CREATE INDEX IF NOT EXISTS certs_country_family ON certs (country, family);
+CREATE INDEX IF NOT EXISTS certs_boat_issue ON certs (boat_key, issue_date);
+
+-- Search tables derived from certs, rebuilt by update when certificates change
+CREATE TABLE IF NOT EXISTS boats (
+    boat_key TEXT PRIMARY KEY,
+    name_key TEXT
+);
+CREATE INDEX IF NOT EXISTS boats_name_key ON boats (name_key, boat_key);
+CREATE TABLE IF NOT EXISTS boat_names (
+    id INTEGER PRIMARY KEY,
+    boat_key TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    sail_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS boat_names_sail_key ON boat_names (sail_key);
+CREATE INDEX IF NOT EXISTS boat_names_name_key ON boat_names (name_key);
+CREATE TABLE IF NOT EXISTS boat_words (
+    word TEXT NOT NULL,
+    name_id INTEGER NOT NULL,
+    PRIMARY KEY (word, name_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS boat_scopes (
+    country TEXT NOT NULL,
+    family TEXT NOT NULL,
+    boat_key TEXT NOT NULL,
+    PRIMARY KEY (country, family, boat_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS boat_scopes_family ON boat_scopes (family, boat_key);
+CREATE TABLE IF NOT EXISTS name_trigrams (
+    trigram TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    PRIMARY KEY (trigram, name_key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS name_scopes (
+    name_key TEXT NOT NULL,
+    country TEXT NOT NULL,
+    family TEXT NOT NULL,
+    PRIMARY KEY (name_key, country, family)
+) WITHOUT ROWID;
+"""
+DERIVED_TABLES = ('boats', 'boat_names', 'boat_words', 'boat_scopes', 'name_trigrams', 'name_scopes')
+# Names most similar by trigrams to a query that nothing matched, compared with difflib
+FUZZY_CANDIDATES = 200
+
+SUMMARY_COLUMNS = 'ref_no, bin, boat_key, sail_no, yacht_name, country, family, cert_type, issue_date'
+
+
+def name_key(name):
+    """Normalized yacht name used for case-insensitive matching."""
+    return ' '.join((name or '').casefold().split())
+
+
+def sail_key(sail_no):
+    """Normalized sail number ("ISR 376", "isr-376" -> "isr376")."""
+    return re.sub(r'[^0-9a-z]', '', (sail_no or '').casefold())
+
+
+def boat_key(cert):
+    """Key grouping all certificates (ORC, NS, DH...) of the same boat."""
+    if cert.get('BIN'):
+        return cert['BIN'].strip().upper()
+    return f"{sail_key(cert.get('SailNo'))}|{name_key(cert.get('YachtName'))}"
+
+
+def _prefix_range(prefix):
+    # Index-friendly replacement for "LIKE 'prefix%'"
+    return prefix, prefix + '\uffff'
+
+
+def _trigrams(name):
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CertificateIndex:
+    """
+    SQLite index over downloaded ORC certificate files (see certs_downloader).
+    Each thread gets its own connection (the API calls it from the threadpool); in WAL mode readers keep
+    answering from the last committed state while update writes, also from another process.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+
+    @property
+    def conn(self):
+        """Connection of the calling thread, opened on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def update(self, path='jsons/'):
+        """
+        Bring the index in sync with the json files in path.
+        Only new, modified or removed files are (re)indexed.
+        Returns a tuple of (indexed files, removed files).
+        """
+        current = {}
+        if os.path.isdir(path):
+            for entry in os.scandir(path):
+                if entry.is_file() and entry.name.endswith('.json'):
+                    st = entry.stat()
+                    current[os.path.abspath(entry.path)] = (st.st_mtime_ns, st.st_size)
+        known = {row['path']: (row['mtime_ns'], row['size'])
+                 for row in self.conn.execute('SELECT path, mtime_ns, size FROM files')}
+        removed = [p for p in known if p not in current and os.path.dirname(p) == os.path.abspath(path)]
+        changed = [p for p, stat in current.items() if known.get(p) != stat]
+        stale = bool(removed or changed) or self._search_tables_missing()
+        with self.conn:
+            for file in removed + changed:
+                self.conn.execute('DELETE FROM certs WHERE file = ?', (file,))
+                self.conn.execute('DELETE FROM files WHERE path = ?', (file,))
+            for file in changed:
+                try:
+                    self._index_file(file, current[file])
+                except ValueError as e:
+                    # Not a certificate file: left out of the index and tried again on the next update
+                    logger.warning(f"Skipped {file}: {e}")
+            if stale:
+                self._rebuild_search_tables()
+        return changed, removed
+
+    def _search_tables_missing(self):
+        # Index built before the search tables existed
+        return (self.conn.execute('SELECT 1 FROM boats LIMIT 1').fetchone() is None
+                and self.conn.execute('SELECT 1 FROM certs LIMIT 1').fetchone() is not None)
+
+    def _rebuild_search_tables(self):
+        """Distinct boats, their names and sail numbers, name words, country/family scopes and name trigrams."""
+        for table in DERIVED_TABLES:
+            self.conn.execute(f'DELETE FROM {table}')
+        self.conn.execute('INSERT INTO boats (boat_key, name_key) '
+                          "SELECT boat_key, MIN(COALESCE(name_key, '')) FROM certs GROUP BY boat_key")
+        self.conn.execute('INSERT INTO boat_names (boat_key, name_key, sail_key) '
+                          "SELECT DISTINCT boat_key, COALESCE(name_key, ''), COALESCE(sail_key, '') FROM certs")
+        self.conn.execute('INSERT INTO boat_scopes (country, family, boat_key) '
+                          "SELECT DISTINCT COALESCE(country, ''), COALESCE(family, ''), boat_key FROM certs")
+        self.conn.execute('INSERT INTO name_scopes (name_key, country, family) '
+                          "SELECT DISTINCT COALESCE(name_key, ''), COALESCE(country, ''), COALESCE(family, '') "
+                          'FROM certs')
+        names = self.conn.execute('SELECT id, name_key FROM boat_names').fetchall()
+        self.conn.executemany('INSERT INTO boat_words (word, name_id) VALUES (?, ?)',
+                              [(word, row['id']) for row in names for word in set(row['name_key'].split())])
+        self.conn.executemany('INSERT INTO name_trigrams (trigram, name_key) VALUES (?, ?)',
+                              [(trigram, name) for name in {row['name_key'] for row in names if row['name_key']}
+                               for trigram in _trigrams(name)])
+
+    def _index_file(self, file, stat):
+        country = os.path.basename(file).split('_')[0]
+        rows = []
+        for cert in orc.iter_json_files([file]):
+            rows.append((
+                file,
+                cert.get('RefNo'),
+                cert.get('BIN'),
+                boat_key(cert),
+                cert.get('SailNo'),
+                sail_key(cert.get('SailNo')),
+                cert.get('YachtName'),
+                name_key(cert.get('YachtName')),
+                cert.get('NatAuth') or country,
+                cert.get('Family'),
+                cert.get('C_Type'),
+                cert.get('IssueDate'),
+                json.dumps(cert, separators=(',', ':')),
+            ))
+        self.conn.executemany(
+            'INSERT INTO certs (file, ref_no, bin, boat_key, sail_no, sail_key, yacht_name, name_key, country, '
+            'family, cert_type, issue_date, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        self.conn.execute('INSERT INTO files (path, mtime_ns, size) VALUES (?, ?, ?)', (file, *stat))
+
+    def get(self, ref_no):
+        """Full certificate JSON by RefNo, or None."""
+        row = self.conn.execute('SELECT data FROM certs WHERE ref_no = ? ORDER BY issue_date DESC LIMIT 1',
+                                (ref_no,)).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def get_many(self, ref_nos):
+        """Full certificate JSONs for several RefNos, keyed by RefNo. Missing RefNos are left out."""
+        ref_nos = list(dict.fromkeys(ref_nos))
+        ret = {}
+        for i in range(0, len(ref_nos), 500):
+            chunk = ref_nos[i:i + 500]
+            query = f"SELECT ref_no, data FROM certs WHERE ref_no IN ({','.join('?' * len(chunk))})"
+            for row in self.conn.execute(query, chunk):
+                ret.setdefault(row['ref_no'], json.loads(row['data']))
+        return ret
+
+    def files(self):
+        """(path, mtime_ns, size) of the indexed files, which change whenever update reindexes something."""
+        return [tuple(row) for row in self.conn.execute('SELECT path, mtime_ns, size FROM files ORDER BY path')]
+
+    def iter_certificates(self):
+        """Every indexed certificate JSON, one at a time."""
+        for row in self.conn.execute('SELECT data FROM certs ORDER BY id'):
+            yield json.loads(row['data'])
+
+    def lookup(self, bin=None, ref_no=None, sail_no=None, yacht_name=None):
+        """Exact match on any combination of BIN, RefNo, sail number and yacht name."""
+        conditions, params = [], []
+        for column, value in (('bin', bin), ('ref_no', ref_no),
+                              ('sail_key', sail_key(sail_no) if sail_no else None),
+                              ('name_key', name_key(yacht_name) if yacht_name else None)):
+            if value:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        if not conditions:
+            return []
+        query = f"SELECT data FROM certs WHERE {' AND '.join(conditions)} ORDER BY issue_date DESC"
+        return [json.loads(row['data']) for row in self.conn.execute(query, params)]
+
+    def search(self, query='', country=None, family=None, limit=50, offset=0, fuzzy=True):
+        """
+        Search boats by yacht name or sail number prefix (also matching from any word of the name).
+        Falls back to fuzzy name matching when nothing matches.
+        Returns (total boats, boats) where each boat lists all its certificates (of the country and family).
+
+        Runs on the search tables: a query only reads the name words and sail numbers that start with it,
+        then the matched boats; the fuzzy fallback only compares the names sharing the most trigrams.
+        """
+        scope, scope_params = [], []
+        if country:
+            scope.append('country = ?')
+            scope_params.append(country.upper())
+        if family:
+            scope.append('family = ?')
+            scope_params.append(family)
+        in_scope = (f"boat_key IN (SELECT boat_key FROM boat_scopes WHERE {' AND '.join(scope)})"
+                    if scope else None)
+
+        q_name, q_sail = name_key(query), sail_key(query)
+        if not q_name:
+            conditions = [in_scope] if in_scope else []
+            total, keys = self._page('SELECT boat_key, name_key AS sort_key FROM boats', conditions,
+                                     scope_params, limit, offset)
+            return total, self._boats(keys, scope, scope_params)
+
+        words = q_name.split()
+        # Single word: any name word starting with it. Several: the first word in full, then the whole
+        # query must follow a word boundary of the name
+        first = ('word >= ? AND word < ?', list(_prefix_range(words[0]))) if len(words) == 1 \
+            else ('word = ?', [words[0]])
+        matches = [f"(id IN (SELECT name_id FROM boat_words WHERE {first[0]}) AND (' ' || name_key) LIKE ? ESCAPE '\\')"]
+        params = first[1] + ['% ' + re.sub(r'([%_\\])', r'\\\1', q_name) + '%']
+        if q_sail:
+            matches.append('(sail_key >= ? AND sail_key < ?)')
+            params += _prefix_range(q_sail)
+        conditions = [f"({' OR '.join(matches)})"] + ([in_scope] if in_scope else [])
+        total, keys = self._page('SELECT boat_key, MIN(name_key) AS sort_key FROM boat_names', conditions,
+                                 params + scope_params, limit, offset, group=True)
+
+        if total == 0 and fuzzy:
+            close = self._close_names(q_name, limit, scope, scope_params)
+            if close:
+                conditions = [f"name_key IN ({','.join('?' * len(close))})"] + ([in_scope] if in_scope else [])
+                total, keys = self._page('SELECT boat_key, MIN(name_key) AS sort_key FROM boat_names', conditions,
+                                         close + scope_params, limit, offset, group=True)
+        return total, self._boats(keys, scope, scope_params)
+
+    def _close_names(self, q_name, limit, scope=(), scope_params=()):
+        # Candidates: the names (of the scope) with the highest trigram similarity to the query, then difflib
+        trigrams = sorted(_trigrams(q_name))
+        scoped = (f"AND EXISTS (SELECT 1 FROM name_scopes s WHERE s.name_key = t.name_key "
+                  f"{''.join(' AND s.' + condition for condition in scope)})" if scope else '')
+        candidates = [row[0] for row in self.conn.execute(
+            f"SELECT name_key FROM name_trigrams t WHERE trigram IN ({','.join('?' * len(trigrams))}) {scoped} "
+            'GROUP BY name_key ORDER BY COUNT(*) * 1.0 / (LENGTH(name_key) + ?) DESC, name_key LIMIT ?',
+            trigrams + list(scope_params) + [len(trigrams) + 2, FUZZY_CANDIDATES])]
+        return difflib.get_close_matches(q_name, candidates, n=limit, cutoff=0.6)
+
+    def _page(self, select, conditions, params, limit, offset, group=False):
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        if group:
+            # Matched names: one pass, sorted by name, gives both the count and the page
+            keys = [row[0] for row in self.conn.execute(
+                f'{select} {where} GROUP BY boat_key ORDER BY sort_key, boat_key', params)]
+            return len(keys), keys[offset:offset + limit]
+        # Browsing every boat: count, then read only the page along the (name_key, boat_key) index
+        total = self.conn.execute(f'SELECT COUNT(*) FROM boats {where}', params).fetchone()[0]
+        keys = [row[0] for row in self.conn.execute(
+            f'{select} {where} ORDER BY sort_key, boat_key LIMIT ? OFFSET ?', params + [limit, offset])]
+        return total, keys
+
+    def _boats(self, keys, scope, scope_params):
+        if not keys:
+            return []
+        boats = {key: None for key in keys}
+        rows = self.conn.execute(
+            f"SELECT {SUMMARY_COLUMNS} FROM certs WHERE boat_key IN ({','.join('?' * len(keys))}) "
+            f"{''.join(' AND ' + condition for condition in scope)} ORDER BY issue_date DESC", keys + scope_params)
+        for row in rows:
+            boat = boats[row['boat_key']]
+            if boat is None:
+                boat = boats[row['boat_key']] = {
+                    'BIN': row['bin'],
+                    'YachtName': row['yacht_name'],
+                    'SailNo': row['sail_no'],
+                    'certificates': [],
+                }
+            boat['certificates'].append({
+                'RefNo': row['ref_no'],
+                'Family': row['family'],
+                'C_Type': row['cert_type'],
+                'IssueDate': row['issue_date'],
+                'NatAuth': row['country'],
+            })
+        return [boat for boat in boats.values() if boat is not None]
+
+
+def build_index(path='jsons/', db_path=DEFAULT_DB_PATH):
+    """Create or incrementally refresh the certificate index for the files in path."""
+    index = CertificateIndex(db_path)
+    changed, removed = index.update(path)
+    print(f"Certificate index updated: {len(changed)} files indexed, {len(removed)} files removed")
+    return index
@@ -0,0 +1,225 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+
+import numpy as np
+
+import orc
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: store builds are not serialized between processes
+    fcntl = None
+
+DEFAULT_STORE_PATH = 'certs_store/'
+
+# Certificate fields kept as string columns, every other numeric field becomes a float column
+TEXT_COLUMNS = ['NatAuth', 'BIN', 'CertNo', 'RefNo', 'SailNo', 'YachtName', 'Class', 'C_Type', 'Family',
+                'Division', 'IssueDate']
+# Allowances grids stored in the (boat x leg x wind speed) tensor, in seconds per mile (angles in degrees)
+LEGS = ['R52', 'R60', 'R75', 'R90', 'R110', 'R120', 'R135', 'R150', 'Beat', 'Run', 'WL', 'CR', 'OC',
+        'BeatAngle', 'GybeAngle']
+DEFAULT_WIND_SPEEDS = [6, 8, 10, 12, 14, 16, 20]
+
+
+class CertificateStore:
+    """
+    Columnar view of a set of ORC certificates.
+    Scalar fields are 1D arrays indexed by boat, Allowances are a float32 tensor of shape
+    (boats, len(legs), len(wind_speeds)).
+    """
+
+    def __init__(self, columns, allowances, legs=LEGS, wind_speeds=DEFAULT_WIND_SPEEDS):
+        self.columns = columns
+        self.allowances = allowances
+        self.legs = list(legs)
+        self.wind_speeds = np.asarray(wind_speeds, dtype=np.float32)
+        self._leg_index = {leg: i for i, leg in enumerate(self.legs)}
+
+    def __len__(self):
+        return self.allowances.shape[0]
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def leg(self, leg):
+        """(boats x wind speeds) allowances of a single leg."""
+        return self.allowances[:, self._leg_index[leg], :]
+
+    def select(self, rows):
+        """New store with the given boats (boolean mask or index array)."""
+        return CertificateStore({name: col[rows] for name, col in self.columns.items()},
+                                self.allowances[rows], self.legs, self.wind_speeds)
+
+    def find(self, column, values):
+        """Indices of the boats whose column value is in values, in the order of values."""
+        positions = {}
+        for i, value in enumerate(self.columns[column].tolist()):
+            positions.setdefault(value, i)
+        return np.array([positions[v] for v in values if v in positions], dtype=np.intp)
+
+
+def _as_float(value):
+    if value is None or isinstance(value, bool):
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _allowance_grid(allowances, wind_speeds):
+    grid = np.full((len(LEGS), len(wind_speeds)), np.nan, dtype=np.float32)
+    if not allowances:
+        return grid
+    cert_speeds = allowances.get('WindSpeeds') or []
+    same_speeds = list(cert_speeds) == list(wind_speeds)
+    for i, leg in enumerate(LEGS):
+        values = allowances.get(leg)
+        if not values or len(values) != len(cert_speeds):
+            continue
+        if same_speeds:
+            grid[i] = values
+        else:
+            grid[i] = np.interp(wind_speeds, cert_speeds, values)
+    return grid
+
+
+def from_certificates(certs, wind_speeds=None):
+    """Build a CertificateStore from an iterable of certificate dicts (as found in the 'rms' list)."""
+    certs = list(certs)
+    if wind_speeds is None:
+        wind_speeds = next((c['Allowances']['WindSpeeds'] for c in certs
+                            if (c.get('Allowances') or {}).get('WindSpeeds')), DEFAULT_WIND_SPEEDS)
+    numeric = []
+    for cert in certs:
+        for key, value in cert.items():
+            if key not in TEXT_COLUMNS and key not in numeric and isinstance(value, (int, float)) \
+                    and not isinstance(value, bool):
+                numeric.append(key)
+
+    columns = {}
+    for key in TEXT_COLUMNS:
+        columns[key] = np.array([str(c.get(key) or '') for c in certs], dtype=str)
+    for key in numeric:
+        columns[key] = np.array([_as_float(c.get(key)) for c in certs], dtype=np.float64)
+    allowances = np.empty((len(certs), len(LEGS), len(wind_speeds)), dtype=np.float32)
+    for i, cert in enumerate(certs):
+        allowances[i] = _allowance_grid(cert.get('Allowances'), wind_speeds)
+    return CertificateStore(columns, allowances, LEGS, wind_speeds)
+
+
+def save_store(store, path=DEFAULT_STORE_PATH, sources=None):
+    """
+    Save the store as one .npy file per column so it can be memory-mapped on load.
+    The files are written to a new directory swapped in when complete: a reader loads either the
+    previous store or the new one, and keeps reading its memory-mapped files after the swap.
+    sources ((path, mtime_ns, size) of the certificate files) tells refresh_store when to rebuild.
+    """
+    path = path.rstrip('/\\')
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    os.makedirs(tmp_path)
+    try:
+        for name, col in store.columns.items():
+            np.save(os.path.join(tmp_path, f'{name}.npy'), col)
+        np.save(os.path.join(tmp_path, 'Allowances.npy'), store.allowances)
+        meta = {
+            'count': len(store),
+            'columns': list(store.columns),
+            'legs': store.legs,
+            'wind_speeds': store.wind_speeds.tolist(),
+            'sources': [list(source) for source in sources] if sources is not None else None,
+        }
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        old_path = f'{path}.{uuid.uuid4().hex}.old'
+        if os.path.isdir(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+
+def load_store(path=DEFAULT_STORE_PATH, mmap=True):
+    """Load a store saved by save_store. With mmap the arrays are read from disk only when accessed."""
+    with open(os.path.join(path, 'meta.json'), 'r') as f:
+        meta = json.load(f)
+    mmap_mode = 'r' if mmap else None
+    columns = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in meta['columns']}
+    allowances = np.load(os.path.join(path, 'Allowances.npy'), mmap_mode=mmap_mode)
+    return CertificateStore(columns, allowances, meta['legs'], meta['wind_speeds'])
+
+
+def _saved_sources(path):
+    try:
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            return json.load(f).get('sources')
+    except (OSError, ValueError):
+        return None
+
+
+def refresh_store(index, path=DEFAULT_STORE_PATH):
+    """
+    Rebuild the store saved in path from a CertificateIndex if the index changed since the last build.
+    Processes sharing path (API workers) build it once: the others wait, then find it up to date.
+    Returns True if the store was rebuilt.
+    """
+    path = path.rstrip('/\\')
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f'{path}.lock', 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        sources = [list(source) for source in index.files()]
+        if _saved_sources(path) == sources:
+            return False
+        save_store(from_certificates(index.iter_certificates()), path, sources)
+        return True
+
+
+class SavedStore:
+    """
+    The store saved in path, memory-mapped on first use and reloaded when it is rebuilt
+    (checked on every call, as another process may have rebuilt it).
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._store = None
+        self._rows = {}
+
+    def _current(self):
+        try:
+            st = os.stat(os.path.join(self.path, 'meta.json'))
+            stamp = (st.st_ino, st.st_mtime_ns)
+            with self._lock:
+                if stamp != self._stamp:
+                    store = load_store(self.path)
+                    rows = {}
+                    for i, ref_no in enumerate(store['RefNo'].tolist()):
+                        rows.setdefault(ref_no, i)
+                    self._store, self._rows, self._stamp = store, rows, stamp
+                return self._store, self._rows
+        except (OSError, ValueError):
+            # Missing, or swapped while loading: the caller builds what it needs from the certificates
+            return None, {}
+
+    def get(self):
+        """The saved store, or None if there is none (yet)."""
+        return self._current()[0]
+
+    def select(self, ref_nos):
+        """Store of the certificates with the given RefNos in that order, or None if any is missing."""
+        store, rows = self._current()
+        if store is None or any(ref_no not in rows for ref_no in ref_nos):
+            return None
+        return store.select(np.array([rows[ref_no] for ref_no in ref_nos], dtype=np.intp))
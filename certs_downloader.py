@@ -6,13 +6,18 @@ import aiohttp
 import asyncio
 import time
 import requests
-import xml.etree.ElementTree as ET
+from defusedxml import ElementTree as DefusedET
 
+from cert_changes import detect_changes
+from cert_index import CertificateIndex, DEFAULT_DB_PATH
+from cert_store import refresh_store, DEFAULT_STORE_PATH
 from utils import create_folder
 
 families = {1: 'STD', 3: 'DH', 5: 'NS'}
 
-URL = "http://data.orc.org/public/WPub.dll?action=DownRMS&ext=json&CountryId="
+# Can be pointed at a local stand-in of the ORC server
+ORC_DATA_URL = os.getenv("ORC_DATA_URL", "https://data.orc.org/public/WPub.dll")
+URL = f"{ORC_DATA_URL}?action=DownRMS&ext=json&CountryId="
 headers = {'Connection': 'keep-alive', 'Accept-Encoding': 'gzip, deflate, sdch',
            'Referer': 'https://data.orc.org/public/WPub.dll'}
 
@@ -48,7 +53,8 @@ async def download_certs_async(year, path, backup):
         await asyncio.gather(*tasks)
 
 
-def download_certs(year, path=f'jsons/', backup=True):
+def download_certs(year, path=f'jsons/', backup=True, index_path=os.getenv('CERTS_INDEX_PATH', DEFAULT_DB_PATH),
+                   store_path=os.getenv('CERTS_STORE_PATH', DEFAULT_STORE_PATH)):
     start_time = time.time()
     if backup:
         source_dir = path
@@ -58,17 +64,31 @@ def download_certs(year, path=f'jsons/', backup=True):
             shutil.move(os.path.join(source_dir, file_name), target_dir)
     asyncio.run(download_certs_async(year, path, backup))
     print("--- %s seconds ---" % (time.time() - start_time))
+    # Feed of new / removed / re-rated certificates since the previous download
+    changes = detect_changes(path)
+    # Make the new files searchable, also by a running API sharing the index file and the store
+    index = CertificateIndex(index_path)
+    try:
+        changed, removed = index.update(path)
+        refresh_store(index, store_path)
+    finally:
+        index.close()
+    print(f"Certificate index and store updated: {len(changed)} files indexed, {len(removed)} files removed")
+    return changes
 
 
 def get_countries():
-    url = f"https://data.orc.org/public/WPub.dll"
-    request = requests.get(url)
-    tree = ET.ElementTree(ET.fromstring(request.content))
-    available_countries = []
-    for item in tree.getroot().findall('./DATA/ROW'):
-        for child in item:
-            if child.tag == 'CountryId':
-                available_countries.append((child.text.encode('utf8')).decode('utf-8'))
-    available_countries = set(available_countries)
-    return list(available_countries)
+    request = requests.get(ORC_DATA_URL)
+    return list({country['id'] for country in parse_countries(request.content)})
+
+
+def parse_countries(content):
+    """Countries ({'id', 'name'}) listed in the ORC server's XML index page, without duplicates."""
+    root = DefusedET.fromstring(content)
+    countries = {}
+    for item in root.findall('./DATA/ROW'):
+        country_id = item.findtext('CountryId')
+        if country_id and country_id not in countries:
+            countries[country_id] = {'id': country_id, 'name': item.findtext('CountryName') or country_id}
+    return list(countries.values())
 
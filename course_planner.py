@@ -0,0 +1,46 @@
+import numpy as np
+
+from courses import load_courses
+from settings import target_time_allowance
+
+
+def allowances_at(store, wind_speed):
+    """
+    (boats x legs) allowances of every boat at a wind speed, interpolated between the certificate wind speeds.
+    Raises ValueError if the wind speed is outside the certificate wind range.
+    """
+    speeds = store.wind_speeds.astype(np.float64)
+    if not speeds[0] <= wind_speed <= speeds[-1]:
+        raise ValueError(f"Wind speed must be between {speeds[0]:g} and {speeds[-1]:g} knots")
+    high = int(np.clip(np.searchsorted(speeds, wind_speed), 1, len(speeds) - 1))
+    frac = (wind_speed - speeds[high - 1]) / (speeds[high] - speeds[high - 1])
+    allowances = store.allowances.astype(np.float64)
+    return allowances[:, :, high - 1] * (1 - frac) + allowances[:, :, high] * frac
+
+
+def l1_ranges(store, wind_speed, target_min, target_max, courses=None, time_allowance=target_time_allowance):
+    """
+    L1 (start line to first mark, in miles) range of every course of a CourseSet (default the configured
+    courses) for which all the boats of a CertificateStore finish within [target_min, target_max] minutes
+    at a wind speed. A boat's time is linear in L1 (L1 x sum of leg length x allowance, plus the target
+    time allowance), so the range is solved directly: the fastest boat bounds L1 from below and the
+    slowest from above. Boats without allowances for a course's legs are ignored. Raises ValueError if the
+    wind speed is outside the certificate wind range.
+    Returns per course: (min L1, max L1, index of the fastest boat, index of the slowest boat, seconds per L1).
+    """
+    courses = courses or load_courses()
+    # (courses x boats) seconds per mile of L1
+    per_l1 = courses.seconds_per_l1(allowances_at(store, wind_speed)) * (1 + time_allowance)
+    valid = per_l1 > 0
+
+    fastest = np.where(valid, per_l1, np.inf).argmin(axis=1)
+    slowest = np.where(valid, per_l1, -np.inf).argmax(axis=1)
+    rows = np.arange(len(courses))
+    any_valid = valid.any(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        min_l1 = np.where(any_valid, target_min * 60 / per_l1[rows, fastest], np.nan)
+        max_l1 = np.where(any_valid, target_max * 60 / per_l1[rows, slowest], np.nan)
+    return {
+        name: (min_l1[c], max_l1[c], int(fastest[c]), int(slowest[c]), per_l1[c])
+        for c, name in enumerate(courses.names)
+    }
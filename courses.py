@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import threading
+import uuid
+
+import numpy as np
+
+from cert_store import LEGS
+from settings import course_types as default_course_types
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COURSES_PATH = 'courses.json'
+# Allowances legs sailed at a fixed true wind angle, by angle
+TWA_LEGS = {52: 'R52', 60: 'R60', 75: 'R75', 90: 'R90', 110: 'R110', 120: 'R120', 135: 'R135', 150: 'R150'}
+# Allowances entries that are angles, not seconds per mile
+ANGLE_LEGS = ('BeatAngle', 'GybeAngle')
+
+
+def leg_weights(leg, legs=LEGS):
+    """
+    {Allowances leg: weight} of a course leg: either an Allowances key (Beat, Run, R110, WL...) or TWA<angle>
+    for a reach at any true wind angle, interpolated between the two nearest fixed angle legs.
+    """
+    if leg in legs and leg not in ANGLE_LEGS:
+        return {leg: 1.0}
+    if leg.upper().startswith('TWA'):
+        try:
+            angle = float(leg[3:])
+        except ValueError:
+            raise ValueError(f"Invalid leg: {leg}")
+        angles = sorted(TWA_LEGS)
+        if not angles[0] <= angle <= angles[-1]:
+            raise ValueError(f"TWA must be between {angles[0]} and {angles[-1]} degrees: {leg}")
+        high = next(a for a in angles if a >= angle)
+        if high == angle:
+            return {TWA_LEGS[high]: 1.0}
+        low = angles[angles.index(high) - 1]
+        frac = (angle - low) / (high - low)
+        return {TWA_LEGS[low]: 1 - frac, TWA_LEGS[high]: frac}
+    raise ValueError(f"Unknown leg: {leg}")
+
+
+class CourseSet:
+    """
+    Course definitions {course: {leg: length in multiples of L1}} compiled once into a dense
+    (courses x legs) weight matrix over the Allowances legs, so every course is evaluated against a
+    (boats x legs x wind speeds) allowance tensor with a single matrix product.
+    """
+
+    def __init__(self, definitions, legs=LEGS):
+        if not definitions:
+            raise ValueError("At least one course is required")
+        self.legs = list(legs)
+        self.definitions = {}
+        self.matrix = np.zeros((len(definitions), len(self.legs)))
+        for c, (name, course) in enumerate(definitions.items()):
+            if not isinstance(course, dict) or not course:
+                raise ValueError(f"Course {name} has no legs")
+            self.definitions[str(name)] = {}
+            for leg, length in course.items():
+                if isinstance(length, bool) or not isinstance(length, (int, float)) or length <= 0:
+                    raise ValueError(f"Course {name}: length of leg {leg} must be a positive number")
+                for store_leg, weight in leg_weights(leg, self.legs).items():
+                    self.matrix[c, self.legs.index(store_leg)] += weight * length
+                self.definitions[str(name)][leg] = float(length)
+        self.names = list(self.definitions)
+
+    def __len__(self):
+        return len(self.names)
+
+    def seconds_per_l1(self, allowances):
+        """
+        (courses x boats x ...) seconds per mile of L1 from a (boats x legs x ...) allowance array.
+        NaN where a boat has no allowance for a leg of the course.
+        """
+        allowances = np.asarray(allowances, dtype=np.float64)
+        times = np.einsum('cl,bl...->cb...', self.matrix, np.nan_to_num(allowances))
+        missing = np.einsum('cl,bl...->cb...', (self.matrix > 0).astype(np.float64), np.isnan(allowances))
+        return np.where(missing > 0, np.nan, times)
+
+
+def load_courses(path=DEFAULT_COURSES_PATH):
+    """CourseSet from a JSON file of course definitions, or settings.course_types if there is no file."""
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return CourseSet(json.load(f))
+    return CourseSet(default_course_types)
+
+
+def save_courses(course_set, path=DEFAULT_COURSES_PATH):
+    # Unique temporary name: several worker processes may save at once
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(course_set.definitions, f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SavedCourses:
+    """
+    The course definitions saved in path (settings.course_types if there is no file), reloaded when the
+    file changes (checked on every call, as another worker process may have replaced it).
+    A file that cannot be loaded is logged and the last definitions loaded (or the defaults) are kept.
+    """
+
+    def __init__(self, path=DEFAULT_COURSES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._courses = None
+
+    def get(self):
+        try:
+            st = os.stat(self.path)
+            stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stamp = None
+        with self._lock:
+            if self._courses is None or stamp != self._stamp:
+                try:
+                    self._courses = load_courses(self.path)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Failed to load course definitions from {self.path}: {str(e)}")
+                    if self._courses is None:
+                        self._courses = CourseSet(default_course_types)
+                self._stamp = stamp
+            return self._courses
+
+    def save(self, course_set):
+        save_courses(course_set, self.path)
+        with self._lock:
+            # Reloaded by the next get(), like a file saved by another process
+            self._stamp = None
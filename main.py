@@ -1,4 +1,7 @@
+from cert_index import build_index
+from cert_store import refresh_store
 from certs_downloader import download_certs
+from rating_matrix import export_rating_matrix
 from settings import year
 from targettime import generate_target_time_file
 import argparse
@@ -7,11 +10,25 @@ parser = argparse.ArgumentParser(description="ORC certificate files utils")
 group = parser.add_mutually_exclusive_group()
 group.add_argument("-d", "--download", help="Download latest certificate files from orc.org", action="store_true")
 group.add_argument("-g", "--generate", help="Generate target time tables", action="store_true")
+group.add_argument("-i", "--index", help="Build or refresh the local certificate index", action="store_true")
+group.add_argument("-s", "--store", help="Build the columnar certificate store for rating analytics",
+                   action="store_true")
+group.add_argument("-m", "--matrix", metavar="FILE",
+                   help="Export the pairwise time allowance matrices of the fleet of an .orcsc file or of a "
+                        "certificate .json file to boats/rating_matrix.xlsx")
 args = parser.parse_args()
 
 if args.download:
     download_certs(year)
 elif args.generate:
     generate_target_time_file(f'boats/timetables.xlsx', [], ['ISR'], 'jsons/')
+elif args.index:
+    build_index('jsons/')
+elif args.store:
+    index = build_index('jsons/')
+    rebuilt = refresh_store(index)
+    print(f"Certificate store {'rebuilt' if rebuilt else 'up to date'}")
+elif args.matrix:
+    export_rating_matrix(args.matrix, 'boats/rating_matrix.xlsx')
 else:
     print("No arguments provided")
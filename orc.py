@@ -1,13 +1,124 @@
-import io
+import codecs
 import json
+import mmap
+import os
 
+CHUNK_SIZE = 64 * 1024
+_decoder = json.JSONDecoder()
 
-def load_json_files(files):
-    ret = []
+
+def load_json_files(files, fields=None):
+    return list(iter_json_files(files, fields))
+
+
+def iter_json_files(files, fields=None):
+    """
+    Yield the certificates of the json files one at a time.
+    Files are memory-mapped and decoded incrementally, so only the current certificate is held in memory.
+    If fields is given, each certificate is projected to those fields.
+    """
     for file in files:
-        j = json.load(io.open(file, 'r', encoding='utf-8-sig'))
-        if 'rms' in j:
-            ret += j['rms']
-        else:
-            ret += j
-    return ret
+        for cert in _iter_json_file(file):
+            if fields is not None:
+                cert = {key: cert[key] for key in fields if key in cert}
+            yield cert
+
+
+def _iter_json_file(file):
+    with open(file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            stream = _JsonStream(mm)
+            first = stream.peek()
+            if first == '[':
+                yield from stream.iter_array()
+            elif first == '{':
+                # Certificate files downloaded from orc.org: {"rms": [...], "Countries": [...], ...}
+                stream.expect('{')
+                found = False
+                while stream.peek() != '}':
+                    key = stream.decode()
+                    stream.expect(':')
+                    if key == 'rms':
+                        found = True
+                        yield from stream.iter_array()
+                    else:
+                        stream.decode()
+                    if stream.peek() == ',':
+                        stream.expect(',')
+                if not found:
+                    raise ValueError(f"No 'rms' certificate list in certificate file: {file}")
+            else:
+                raise ValueError(f"Unexpected content in certificate file: {file}")
+
+
+class _JsonStream:
+    """Minimal incremental JSON reader over a bytes buffer (utf-8, optional BOM)."""
+
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+        self.decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, min_chars=0):
+        """Append at least one chunk, and at least min_chars characters, to the unread part of the buffer."""
+        if self.eof:
+            return False
+        parts = []
+        read = 0
+        while True:
+            chunk = self.data[self.offset:self.offset + CHUNK_SIZE]
+            self.offset += len(chunk)
+            final = self.offset >= len(self.data)
+            parts.append(self.decoder.decode(chunk, final=final))
+            read += len(parts[-1])
+            if final or read >= min_chars:
+                break
+        self.buf = self.buf[self.pos:] + ''.join(parts)
+        self.pos = 0
+        self.eof = final
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of certificate file")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' in certificate file")
+        self.pos += 1
+
+    def decode(self):
+        """Decode the next JSON value, reading more data until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                # A value ending exactly at the buffer end may be truncated (e.g. a number)
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # The value runs past the buffer: at least double the unread text before decoding again, so a
+            # value spanning many chunks is decoded a logarithmic number of times instead of once per chunk
+            self._fill(len(self.buf) - self.pos)
+
+    def iter_array(self):
+        self.expect('[')
+        while self.peek() != ']':
+            yield self.decode()
+            if self.peek() == ',':
+                self.expect(',')
+        self.expect(']')
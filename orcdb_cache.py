@@ -0,0 +1,108 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+
+import aiohttp
+
+from certs_downloader import ORC_DATA_URL, URL, headers, parse_countries
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = 'orcdb_cache/'
+DEFAULT_MAX_AGE = 6 * 60 * 60  # Serve without revalidating for 6 hours
+FETCH_TIMEOUT = 60
+
+
+class OrcDbCache:
+    """
+    Shared on-disk cache of ORC DB responses (country list and DownRMS certificate files).
+    Entries are stored gzip compressed and served stale-while-revalidate: a stale entry is returned
+    immediately while a single background fetch refreshes it. Concurrent requests for the same entry
+    share one upstream fetch.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_age=DEFAULT_MAX_AGE):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self._inflight = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    async def countries(self):
+        """Gzipped JSON list of {'id', 'name'} countries."""
+        return await self._get('countries', ORC_DATA_URL, _countries_to_json)
+
+    async def certificates(self, country, family):
+        """Gzipped DownRMS JSON of a country and certificate family."""
+        url = f"{URL}{country}&Family={family}"
+        return await self._get(f'rms_{country}_{family}', url, _rms_to_json)
+
+    async def _get(self, key, url, transform):
+        data, fetched_at = self._read(key)
+        if data is None:
+            return await self._fetch(key, url, transform)
+        if time.time() - fetched_at > self.max_age:
+            self._start_fetch(key, url, transform)
+        return data
+
+    def _start_fetch(self, key, url, transform):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh(key, url, transform))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            task.add_done_callback(_log_refresh_error)
+        return task
+
+    async def _fetch(self, key, url, transform):
+        # shield: a client disconnecting must not cancel the fetch other clients are waiting on
+        return await asyncio.shield(self._start_fetch(key, url, transform))
+
+    async def _refresh(self, key, url, transform):
+        timeout = aiohttp.ClientTimeout(total=FETCH_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.get(url, headers=headers) as resp:
+                resp.raise_for_status()
+                body = await resp.read()
+        data = gzip.compress(transform(body))
+        self._write(key, data)
+        logger.info(f"ORC DB cache refreshed: {key}")
+        return data
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json.gz')
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                return f.read(), os.path.getmtime(path)
+        except OSError:
+            return None, 0
+
+    def _write(self, key, data):
+        # Write then rename so other workers never read a partial entry
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+def _countries_to_json(body):
+    return json.dumps(parse_countries(body)).encode('utf-8')
+
+
+def _rms_to_json(body):
+    # Validate before caching so an upstream error page is never stored
+    data = json.loads(body.decode('utf-8-sig'))
+    if not isinstance(data, dict) or 'rms' not in data:
+        raise ValueError("Unexpected ORC DB response")
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def _log_refresh_error(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"ORC DB cache refresh failed: {task.exception()}")
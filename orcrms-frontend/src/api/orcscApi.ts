@@ -10,11 +10,50 @@ const api = axios.create({
   baseURL: API_BASE_URL,
 });
 
+// Last version of each file seen by this client (from the ETag of a GET, the version returned by a write or
+// the version of a change event applied to the loaded file).
+// Writes send it as If-Match, so the backend rejects them with 412 if someone else changed the file meanwhile.
+const fileVersions = new Map<string, string>();
+
+const fileKey = (filePath: string) => filePath.split(/[\\/]/).pop() || filePath;
+
+const rememberVersion = (filePath: string, version: string | undefined | null) => {
+  if (version === undefined || version === null) {
+    return;
+  }
+  const tag = String(version);
+  fileVersions.set(fileKey(filePath), tag.startsWith('"') || tag.startsWith('W/') ? tag : `"${tag}"`);
+};
+
+const ifMatch = (filePath: string): Record<string, string> => {
+  const tag = fileVersions.get(fileKey(filePath));
+  return tag ? { 'If-Match': tag } : {};
+};
+
+// Remember the version returned by a write and pass its response data through
+const written = <T,>(filePath: string, data: T): T => {
+  rememberVersion(filePath, (data as { version?: string } | null)?.version);
+  return data;
+};
+
 export interface OrcscFileInfo {
   name: string;
   path: string;
   size: number;
   modified: number;
+  event_title: string;
+  start_date: string;
+  end_date: string;
+  classes: number;
+  races: number;
+  boats: number;
+  valid: boolean;
+}
+
+export interface ListFilesOptions {
+  sort?: 'name' | 'size' | 'modified' | 'event_title' | 'start_date' | 'classes' | 'races' | 'boats';
+  order?: 'asc' | 'desc';
+  q?: string;
 }
 
 export interface BackupInfo {
@@ -24,6 +63,156 @@ export interface BackupInfo {
   change_summary: string;
 }
 
+export interface CertificateSummary {
+  RefNo: string;
+  Family: string;
+  C_Type: string;
+  IssueDate: string;
+  NatAuth: string;
+}
+
+export interface CertificateBoat {
+  BIN: string;
+  YachtName: string;
+  SailNo: string;
+  certificates: CertificateSummary[];
+}
+
+export interface CertificateSearchResult {
+  total: number;
+  offset: number;
+  limit: number;
+  boats: CertificateBoat[];
+}
+
+export interface RowChanges<Row, Key> {
+  added: Row[];
+  removed: Key[];
+  updated: Row[];
+}
+
+export interface FileChanges {
+  classes: RowChanges<OrcscFile['classes'][number], string>;
+  races: RowChanges<OrcscFile['races'][number], number>;
+  fleet: RowChanges<OrcscFile['fleet'][number], number>;
+}
+
+export interface FileChangeEvent {
+  file: string;
+  // Content hash of the file after the change, null once deleted
+  version: string | null;
+  deleted: boolean;
+  // Only sent to subscribers of a single file
+  changes: FileChanges | null;
+  // Events were dropped, the client should reload the file
+  resync?: boolean;
+}
+
+const applyRowChanges = <Row,>(rows: Row[], changes: RowChanges<Row, string | number>, key: keyof Row): Row[] => {
+  const removed = new Set(changes.removed.map(String));
+  const updated = new Map(changes.updated.map(row => [String(row[key]), row]));
+  return [
+    ...rows
+      .filter(row => !removed.has(String(row[key])))
+      .map(row => ({ ...row, ...updated.get(String(row[key])) })),
+    ...changes.added
+  ];
+};
+
+// Apply the row-level diff of a file change event to previously loaded file data
+export const applyFileChanges = (data: OrcscFile, changes: FileChanges): OrcscFile => ({
+  ...data,
+  classes: applyRowChanges(data.classes, changes.classes, 'ClassId'),
+  races: applyRowChanges(data.races, changes.races, 'RaceId'),
+  fleet: applyRowChanges(data.fleet, changes.fleet, 'YID'),
+});
+
+export interface RaceResult {
+  YID: number;
+  YachtName: string;
+  SailNo: string;
+  FinishTime: string;
+  Finish: string;
+  ElapsedSeconds: number | null;
+  TOT: number | null;
+  CorrectedSeconds: number | null;
+  PosCls: number | null;
+  PtsCls: number;
+}
+
+export interface RaceResults {
+  RaceId: number;
+  ClassId: string;
+  RatingField: string;
+  results: RaceResult[];
+}
+
+export interface SeriesRaceScore {
+  RaceId: number;
+  points: number | null;
+  discarded: boolean;
+}
+
+export interface SeriesStanding {
+  YID: number;
+  YachtName: string;
+  SailNo: string;
+  races: SeriesRaceScore[];
+  total: number;
+  net: number;
+  position: number;
+}
+
+export interface SeriesStandings {
+  ClassId: string;
+  discards: number;
+  races: number[];
+  standings: SeriesStanding[];
+}
+
+export interface BoatTimeLimit {
+  YID: number;
+  YachtName: string;
+  SailNo: string;
+  Seconds: number | null;
+  Deadline: string | null;
+}
+
+export interface RaceTimeLimit {
+  RaceId: number;
+  ClassId: string;
+  StartTime: string | null;
+  Formula: string | null;
+  Deadline: string | null;
+  boats: BoatTimeLimit[];
+  Error?: string;
+}
+
+export interface SplitBoat {
+  YID: number | string;
+  YachtName: string;
+  SailNo: string;
+  // Rating value under the rating field name of the split
+  [rating: string]: number | string;
+}
+
+export interface SplitClass {
+  ClassId: string;
+  boats: SplitBoat[];
+  min: number;
+  max: number;
+  spread: number;
+}
+
+export interface ClassSplit {
+  rating: string;
+  classes: SplitClass[];
+  unrated: Array<number | string>;
+  total_spread: number;
+  applied: boolean;
+  version: string;
+}
+
 export const orcscApi = {
   createNewFile: async (data: {
     title: string;
@@ -76,11 +265,24 @@ export const orcscApi = {
     return response.data;
   },
 
-  getFile: async (filePath: string): Promise<OrcscFile> => {
+  getFile: async (filePath: string, options?: {
+    offset?: number;
+    limit?: number;
+    fields?: string[];
+    classId?: string;
+  }): Promise<OrcscFile> => {
     if (!filePath) {
       throw new Error('File path is required');
     }
-    const response = await api.get(`/api/files/get/${encodeURIComponent(filePath)}`);
+    const response = await api.get(`/api/files/get/${encodeURIComponent(filePath)}`, {
+      params: options ? {
+        offset: options.offset,
+        limit: options.limit,
+        fields: options.fields?.join(','),
+        class_id: options.classId
+      } : undefined
+    });
+    rememberVersion(filePath, response.headers['etag'] ?? response.data.version);
     return {
       ...response.data,
       filePath: filePath
@@ -103,9 +305,10 @@ export const orcscApi = {
     }
     const response = await api.post(
       `/api/files/${encodeURIComponent(filePath)}/races`,
-      { races }
+      { races },
+      { headers: ifMatch(filePath) }
     );
-    return response.data;
+    return written(filePath, response.data);
   },
 
   addBoats: async (fileId: string, boats: FleetRow[]) => {
@@ -115,17 +318,51 @@ export const orcscApi = {
         SailNo: boat.sailNo,
         ClassId: boat.classId
       }))
+    }, {
+      headers: ifMatch(fileId)
     });
-    return response.data;
+    return written(fileId, response.data);
   },
 
   addBoatFromOrcJson: async (filePath: string, orcJson: object, classId?: string) => {
     const response = await api.post(`/api/files/${encodeURIComponent(filePath)}/boats/orcjson`, orcJson, {
-      params: classId ? { class_id: classId } : undefined
+      params: classId ? { class_id: classId } : undefined,
+      headers: ifMatch(filePath)
     });
+    return written(filePath, response.data);
+  },
+
+  addBoatsFromCertificates: async (filePath: string, refNos: string[], classId?: string) => {
+    const response = await api.post(`/api/files/${encodeURIComponent(filePath)}/boats/orcjson/batch`, {
+      ref_nos: refNos,
+      class_id: classId
+    }, {
+      headers: ifMatch(filePath)
+    });
+    return written(filePath, response.data);
+  },
+
+  searchCertificates: async (params: {
+    q?: string;
+    country?: string;
+    family?: string;
+    offset?: number;
+    limit?: number;
+  }): Promise<CertificateSearchResult> => {
+    const response = await api.get('/api/certificates', { params });
+    return response.data;
+  },
+
+  getOrcDbCountries: async (): Promise<Array<{ id: string; name: string }>> => {
+    const response = await api.get('/api/orcdb/countries');
     return response.data;
   },
 
+  getOrcDbCertificates: async (country: string, family: string): Promise<any[]> => {
+    const response = await api.get('/api/orcdb/certificates', { params: { country, family } });
+    return Array.isArray(response.data.rms) ? response.data.rms : [];
+  },
+
   addClass: async (filePath: string, classData: {
     ClassId: string;
     ClassName: string;
@@ -136,14 +373,58 @@ export const orcscApi = {
     }
     const response = await api.post(
       `/api/files/${encodeURIComponent(filePath)}/classes`,
-      { class_data: classData }
+      { class_data: classData },
+      { headers: ifMatch(filePath) }
     );
-    return response.data;
+    return written(filePath, response.data);
+  },
+
+  // Split the fleet into classes of similar rating. Only a split with apply=true is written to the file
+  // (and checked against the version last seen); without it the proposed classes are just returned.
+  splitClasses: async (filePath: string, split: {
+    rating?: string;
+    classIds: string[];
+    classNames?: string[];
+    minSize?: number;
+    fromClasses?: string[];
+    apply?: boolean;
+  }): Promise<ClassSplit> => {
+    const response = await api.post(`/api/files/${encodeURIComponent(filePath)}/classes/split`, {
+      rating: split.rating,
+      class_ids: split.classIds,
+      class_names: split.classNames,
+      min_size: split.minSize,
+      from_classes: split.fromClasses,
+      apply: split.apply ?? false
+    }, {
+      headers: split.apply ? ifMatch(filePath) : {}
+    });
+    return split.apply ? written(filePath, response.data) : response.data;
   },
 
-  listFiles: async (): Promise<OrcscFileInfo[]> => {
+  // Subscribe to the change events of a file (or of every file when filePath is null). Returns the unsubscribe function.
+  subscribeToFileEvents: (filePath: string | null, onChange: (event: FileChangeEvent) => void): (() => void) => {
+    const url = new URL('/api/events', API_BASE_URL);
+    if (filePath) {
+      url.searchParams.set('file', filePath);
+    }
+    const source = new EventSource(url.toString());
+    source.addEventListener('change', (e) => {
+      const event: FileChangeEvent = JSON.parse((e as MessageEvent).data);
+      if (filePath && event.deleted) {
+        fileVersions.delete(fileKey(filePath));
+      } else if (filePath && event.changes && !event.resync) {
+        // The subscriber applies the changes to its copy, which is then at this version
+        rememberVersion(filePath, event.version);
+      }
+      onChange(event);
+    });
+    return () => source.close();
+  },
+
+  listFiles: async (options: ListFilesOptions = {}): Promise<OrcscFileInfo[]> => {
     try {
-      const response = await api.get('/api/files');
+      const response = await api.get('/api/files', { params: options });
       return response.data.files;
     } catch (error) {
       console.error('Error listing files:', error);
@@ -175,6 +456,21 @@ export const orcscApi = {
     return response.data;
   },
 
+  // Upload several files in one request; invalid files are reported in `rejected` and not saved
+  uploadFiles: async (files: File[]): Promise<{
+    uploaded: Array<{ original_filename: string; filename: string; path: string }>;
+    rejected: Array<{ filename: string; error: string }>;
+  }> => {
+    const formData = new FormData();
+    files.forEach(file => formData.append('files', file));
+    const response = await api.post('/api/files/upload/bulk', formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+    });
+    return response.data;
+  },
+
   updateFileVersion: async (filePath: string, file: File): Promise<{ filename: string; path: string }> => {
     if (!filePath) {
       throw new Error('File path is required');
@@ -199,9 +495,10 @@ export const orcscApi = {
     const response = await api.post(`/api/files/update?file_path=${encodeURIComponent(normalizedPath)}`, formData, {
       headers: {
         'Content-Type': 'multipart/form-data',
+        ...ifMatch(filePath),
       },
     });
-    return response.data;
+    return written(filePath, response.data);
   },
 
   downloadFile: async (filePath: string): Promise<void> => {
@@ -236,7 +533,8 @@ export const orcscApi = {
     if (!filePath) {
       throw new Error('File path is required');
     }
-    await api.delete(`/api/files/${encodeURIComponent(filePath)}`);
+    await api.delete(`/api/files/${encodeURIComponent(filePath)}`, { headers: ifMatch(filePath) });
+    fileVersions.delete(fileKey(filePath));
   },
 
   getTemplates: async (): Promise<string[]> => {
@@ -284,6 +582,69 @@ export const orcscApi = {
     return data.backups;
   },
 
+  // Provisional results computed by the backend from the finish times in the file
+  getRaceResults: async (filePath: string, raceId: number, windSpeed?: number): Promise<RaceResults> => {
+    const response = await api.get(`/api/files/${encodeURIComponent(filePath)}/races/${raceId}/results`, {
+      params: { wind_speed: windSpeed }
+    });
+    return response.data;
+  },
+
+  // Import finish times of a race from a CSV or JSON file (YID or SailNo, FinishTime, Finish, Penalty_ET, Clear)
+  // A triple number race is only re-scored with windSpeed; the finishes are saved either way
+  importFinishes: async (filePath: string, raceId: number, file: File, windSpeed?: number): Promise<{
+    written: number;
+    version: string;
+    results: RaceResults | null;
+    scoring_error: string | null;
+  }> => {
+    const formData = new FormData();
+    formData.append('file', file);
+    const response = await api.post(`/api/files/${encodeURIComponent(filePath)}/races/${raceId}/finishes`, formData, {
+      params: { wind_speed: windSpeed },
+      headers: {
+        'Content-Type': 'multipart/form-data',
+        ...ifMatch(filePath),
+      },
+    });
+    return written(filePath, response.data);
+  },
+
+  // Series standings of a class over the races with results, after discards and tie-breaks
+  // Triple number races are scored on the wind speed given for them in windSpeeds (knots by RaceId)
+  getSeriesStandings: async (
+    filePath: string, classId: string, windSpeeds: Record<number, number> = {}
+  ): Promise<SeriesStandings> => {
+    const speeds = Object.entries(windSpeeds).map(([raceId, knots]) => `${raceId}:${knots}`).join(',');
+    const response = await api.get(
+      `/api/files/${encodeURIComponent(filePath)}/classes/${encodeURIComponent(classId)}/series`,
+      { params: speeds ? { wind_speeds: speeds } : {} }
+    );
+    return response.data;
+  },
+
+  // Time limits per race and boat from the class TimeLimitFormulae, or from a formula to try
+  getTimeLimits: async (filePath: string, classId?: string, formula?: string): Promise<RaceTimeLimit[]> => {
+    const response = await api.get(`/api/files/${encodeURIComponent(filePath)}/time-limits`, {
+      params: { class_id: classId, formula }
+    });
+    return response.data.races;
+  },
+
+  // Row-level diff between two versions: backup filenames from getFileHistory, or 'current'
+  getFileHistoryDiff: async (filePath: string, from: string, to: string = 'current'): Promise<FileChanges> => {
+    if (!filePath) {
+      throw new Error('File path is required');
+    }
+    const params = new URLSearchParams({ from, to });
+    const response = await fetch(`${API_BASE_URL}/api/files/${encodeURIComponent(filePath)}/history/diff?${params}`);
+    if (!response.ok) {
+      throw new Error(`Failed to get file history diff: ${response.statusText}`);
+    }
+    const data = await response.json();
+    return data.changes;
+  },
+
   restoreFromBackup: async (filePath: string, backupPath: string): Promise<void> => {
     if (!filePath || !backupPath) {
       throw new Error('File path and backup path are required');
@@ -292,12 +653,14 @@ export const orcscApi = {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
+        ...ifMatch(filePath),
       },
       body: JSON.stringify({ backup_path: backupPath }),
     });
     if (!response.ok) {
       throw new Error(`Failed to restore from backup: ${response.statusText}`);
     }
+    written(filePath, await response.json());
   },
 
   updateBoat: async (filePath: string, boat: { YID: string; classId: string; yachtName: string; sailNo?: string; rating?: string }) => {
@@ -307,8 +670,10 @@ export const orcscApi = {
       YachtName: boat.yachtName,
       SailNo: boat.sailNo || '',
       Rating: boat.rating
+    }, {
+      headers: ifMatch(filePath)
     });
-    return response.data;
+    return written(filePath, response.data);
   },
 
   deleteClass: async (filePath: string, classId: string): Promise<void> => {
@@ -316,7 +681,10 @@ export const orcscApi = {
       throw new Error('File path and class ID are required');
     }
     const normalizedPath = filePath.replace(/\\/g, '/');
-    await api.delete(`/api/classes?file_path=${encodeURIComponent(normalizedPath)}&class_id=${encodeURIComponent(classId)}`);
+    const response = await api.delete(`/api/classes?file_path=${encodeURIComponent(normalizedPath)}&class_id=${encodeURIComponent(classId)}`, {
+      headers: ifMatch(filePath)
+    });
+    written(filePath, response.data);
   },
 
   deleteRace: async (filePath: string, raceId: string): Promise<void> => {
@@ -324,7 +692,10 @@ export const orcscApi = {
       throw new Error('File path and race ID are required');
     }
     const normalizedPath = filePath.replace(/\\/g, '/');
-    await api.delete(`/api/races?file_path=${encodeURIComponent(normalizedPath)}&race_id=${encodeURIComponent(raceId)}`);
+    const response = await api.delete(`/api/races?file_path=${encodeURIComponent(normalizedPath)}&race_id=${encodeURIComponent(raceId)}`, {
+      headers: ifMatch(filePath)
+    });
+    written(filePath, response.data);
   },
 
   deleteBoat: async (filePath: string, boatId: string): Promise<void> => {
@@ -332,6 +703,9 @@ export const orcscApi = {
       throw new Error('File path and boat ID are required');
     }
     const normalizedPath = filePath.replace(/\\/g, '/');
-    await api.delete(`/api/boats?file_path=${encodeURIComponent(normalizedPath)}&boat_id=${encodeURIComponent(boatId)}`);
+    const response = await api.delete(`/api/boats?file_path=${encodeURIComponent(normalizedPath)}&boat_id=${encodeURIComponent(boatId)}`, {
+      headers: ifMatch(filePath)
+    });
+    written(filePath, response.data);
   }
 }; 
\ No newline at end of file
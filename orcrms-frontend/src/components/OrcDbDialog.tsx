@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { Dialog, DialogTitle, DialogContent, DialogActions, Button, FormControl, InputLabel, Select, MenuItem, CircularProgress, Box, Typography, TextField, Checkbox } from '@mui/material';
 import type { OrcscFile } from '../types/orcsc';
+import { orcscApi } from '../api/orcscApi';
 
 interface OrcDbDialogProps {
     open: boolean;
@@ -38,24 +39,9 @@ export const OrcDbDialog: React.FC<OrcDbDialogProps> = ({ open, onClose, onSucce
         if (open) {
             setLoading(true);
             setError(null);
-            fetch('https://data.orc.org/public/WPub.dll')
-                .then(async (res) => {
-                    const text = await res.text();
-                    // Parse XML to extract country list
-                    const parser = new DOMParser();
-                    const xml = parser.parseFromString(text, 'application/xml');
-                    const rowNodes = Array.from(xml.getElementsByTagName('ROW'));
-                    // Deduplicate by id
-                    const seen = new Set();
-                    const countryList = rowNodes.map((node) => {
-                        const idNode = node.getElementsByTagName('CountryId')[0];
-                        const nameNode = node.getElementsByTagName('CountryName')[0];
-                        return {
-                            id: idNode ? idNode.textContent || '' : '',
-                            name: nameNode ? nameNode.textContent || '' : '',
-                        };
-                    }).filter(c => c.id && c.name && !seen.has(c.id) && seen.add(c.id));
-                    setCountries(countryList);
+            orcscApi.getOrcDbCountries()
+                .then((countryList) => {
+                    setCountries(countryList.filter(c => c.id && c.name));
                     setLoading(false);
                 })
                 .catch(() => {
@@ -73,11 +59,9 @@ export const OrcDbDialog: React.FC<OrcDbDialogProps> = ({ open, onClose, onSucce
         if (selectedCountry) {
             setBoatsLoading(true);
             setBoatsError(null);
-            // Helper to fetch for a given family
+            // Helper to fetch for a given family (served from the backend's ORC DB cache)
             const fetchFamily = (family: string) =>
-                fetch(`https://data.orc.org/public/WPub.dll?action=DownRMS&CountryId=${selectedCountry}&Family=${family}&ext=json`)
-                    .then(res => res.json())
-                    .then(data => Array.isArray(data.rms) ? data.rms : [])
+                orcscApi.getOrcDbCertificates(selectedCountry, family)
                     .catch(() => []);
             // Fetch all types in parallel
             Promise.all([
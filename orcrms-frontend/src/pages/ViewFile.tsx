@@ -37,7 +37,7 @@ import {
     Description as CsvIcon,
     Delete as DeleteIcon
 } from '@mui/icons-material';
-import { orcscApi } from '../api/orcscApi';
+import { orcscApi, applyFileChanges } from '../api/orcscApi';
 import type { OrcscFile, YachtClass } from '../types/orcsc';
 import { AddRacesDialog } from '../components/AddRacesDialog';
 import { SideMenu } from '../components/SideMenu';
@@ -272,22 +272,12 @@ export const ViewFile: React.FC = () => {
 
     const fetchFiles = useCallback(async () => {
         try {
+            // The file list carries the event titles, no need to load every file
             const fileList = await orcscApi.listFiles();
-            const fileData = await Promise.all(
-                fileList.map(async (file) => {
-                    try {
-                        const data = await orcscApi.getFile(file.path);
-                        return {
-                            path: file.path,
-                            eventName: data.event.EventTitle
-                        };
-                    } catch (err) {
-                        console.error(`Error loading file ${file.path}:`, err);
-                        return null;
-                    }
-                })
-            );
-            setFiles(fileData.filter((file): file is { path: string; eventName: string } => file !== null));
+            setFiles(fileList.filter(file => file.valid).map(file => ({
+                path: file.path,
+                eventName: file.event_title
+            })));
         } catch (error) {
             console.error('Error fetching files:', error);
         }
@@ -300,6 +290,24 @@ export const ViewFile: React.FC = () => {
         }
     }, [filePath, fetchFile, fetchFiles]);
 
+    // Keep the file in sync with changes made by other clients
+    useEffect(() => {
+        if (!filePath) {
+            return;
+        }
+        return orcscApi.subscribeToFileEvents(filePath, (event) => {
+            if (event.deleted || event.resync || !event.changes) {
+                fetchFile();
+                return;
+            }
+            const changes = event.changes;
+            setFileData(data => data ? applyFileChanges(data, changes) : data);
+        });
+    }, [filePath, fetchFile]);
+
+    // Refresh the file list when any file is created, changed or deleted
+    useEffect(() => orcscApi.subscribeToFileEvents(null, () => fetchFiles()), [fetchFiles]);
+
     const handleAddRacesSuccess = () => {
         setAddRacesOpen(false);
         fetchFile();
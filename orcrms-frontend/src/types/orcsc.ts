@@ -54,6 +54,8 @@ export interface FleetData {
 
 export interface OrcscFile {
   filePath: string;
+  // Version of the file when it was read; send it as If-Match on writes to reject stale edits
+  version?: string;
   event: {
     EventTitle: string;
     Venue: string;
@@ -0,0 +1,99 @@
+import numpy as np
+
+from orcsc.model.class_enum import YachtClass
+from orcsc.model.cls_row import ClsRow
+
+# Ratings a fleet can be split on, with True if a higher value is a faster boat
+SPLIT_RATINGS = {'CDL': True, 'GPH': False}
+
+
+def split_sorted(values, classes, min_size=1):
+    """
+    Split sorted ratings into contiguous classes minimizing the sum of the class rating spreads
+    (max - min), each class having at least min_size boats. Returns the start index of every class.
+
+    The spread of a class starting at i and ending at j - 1 is values[j - 1] - values[i], so the best split
+    of the first j boats into c classes is values[j - 1] + min over i <= j - min_size of
+    (best split of the first i boats into c - 1 classes - values[i]): a running minimum, O(n) per class.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if classes < 1:
+        raise ValueError("At least one class is required")
+    if min_size < 1 or classes * min_size > n:
+        raise ValueError(f"Cannot split {n} boats into {classes} classes of at least {min_size} boats")
+
+    positions = np.arange(n)
+    best = np.full(n + 1, np.inf)
+    best[0] = 0.0
+    starts = np.zeros((classes + 1, n + 1), dtype=np.intp)
+    for c in range(1, classes + 1):
+        # Cost so far minus the first rating of a class starting at i
+        opening = best[:n] - values
+        running = np.minimum.accumulate(opening)
+        # Latest position of the running minimum, to backtrack from
+        arg = np.maximum.accumulate(np.where(opening == running, positions, 0))
+        current = np.full(n + 1, np.inf)
+        current[min_size:] = values[min_size - 1:] + running[:n - min_size + 1]
+        starts[c, min_size:] = arg[:n - min_size + 1]
+        best = current
+
+    bounds = []
+    end = n
+    for c in range(classes, 0, -1):
+        end = starts[c, end]
+        bounds.append(int(end))
+    return bounds[::-1]
+
+
+def split_fleet(fleet, rating='CDL', class_ids=('O1', 'O2'), min_size=1):
+    """
+    Split raw Fleet rows into len(class_ids) classes on a rating, fastest boats in the first class.
+    Returns ({YID: ClassId}, classes, unrated) where classes lists per class its ClassId, boats and spread,
+    and unrated the YIDs of the boats without the rating (left as they are).
+    """
+    if rating not in SPLIT_RATINGS:
+        raise ValueError(f"Rating must be one of {', '.join(SPLIT_RATINGS)}")
+    rated, unrated = [], []
+    for boat in fleet:
+        try:
+            value = float(boat.get(rating))
+        except (TypeError, ValueError):
+            value = 0.0
+        (rated if value > 0 else unrated).append((boat, value))
+    unrated = [boat.get('YID') for boat, _ in unrated]
+
+    values = np.array([value for _, value in rated])
+    order = np.argsort(values, kind='stable')
+    sorted_values = values[order]
+    bounds = split_sorted(sorted_values, len(class_ids), min_size)
+    segments = list(zip(bounds, bounds[1:] + [len(values)]))
+    if SPLIT_RATINGS[rating]:
+        # Highest ratings are the fastest boats
+        segments = [(start, end, -1) for start, end in reversed(segments)]
+    else:
+        segments = [(start, end, 1) for start, end in segments]
+
+    assignments, classes = {}, []
+    for class_id, (start, end, step) in zip(class_ids, segments):
+        members = [rated[i] for i in order[start:end][::step]]
+        for boat, _ in members:
+            assignments[boat.get('YID')] = class_id
+        class_values = sorted_values[start:end]
+        classes.append({
+            "ClassId": class_id,
+            "boats": [{"YID": int(boat['YID']) if (boat.get('YID') or '').isdigit() else boat.get('YID'),
+                       "YachtName": boat.get('YachtName') or "", "SailNo": boat.get('SailNo') or "",
+                       rating: value} for boat, value in members],
+            "min": float(class_values.min()),
+            "max": float(class_values.max()),
+            "spread": float(class_values.max() - class_values.min()),
+        })
+    return assignments, classes, unrated
+
+
+def split_class_rows(class_ids, class_names=None):
+    """ClsRows of the split classes, named ORC1, ORC2... unless class_names are given."""
+    names = class_names or [f"ORC{i}" for i in range(1, len(class_ids) + 1)]
+    return [ClsRow("ROW", ClassId=class_id, ClassName=name, _class_enum=YachtClass.ORC)
+            for class_id, name in zip(class_ids, names)]
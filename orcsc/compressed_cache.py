@@ -0,0 +1,104 @@
+import gzip
+import logging
+import os
+import shutil
+import uuid
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+EXTENSIONS = {'gzip': 'gz', 'br': 'br'}
+
+
+def encoding_qualities(accept_encoding):
+    """{coding: q} of an Accept-Encoding header; q=0 means not acceptable, '*' stands for unlisted codings."""
+    qualities = {}
+    for part in (accept_encoding or '').split(','):
+        coding, *params = [item.strip() for item in part.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding.lower()] = q
+    return qualities
+
+
+def accepts_encoding(accept_encoding, coding):
+    qualities = encoding_qualities(accept_encoding)
+    return qualities.get(coding, qualities.get('*', 0.0)) > 0
+
+
+def accepted_encoding(accept_encoding):
+    """Best precompressed encoding accepted by the client (br, then gzip, unless refused with q=0), or None."""
+    if brotli is not None and accepts_encoding(accept_encoding, 'br'):
+        return 'br'
+    if accepts_encoding(accept_encoding, 'gzip'):
+        return 'gzip'
+    return None
+
+
+class CompressedFileCache:
+    """
+    Precompressed (gzip/brotli) variants of files, created on first request.
+    Variants are named after the file's mtime and size so a stale variant is never served;
+    invalidate() removes the variants of a file once it has been written.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, path, encoding):
+        """Path of the variant of path compressed with encoding ('gzip' or 'br'), creating it if needed."""
+        st = os.stat(path)
+        name = os.path.basename(path)
+        variant = os.path.join(self.cache_dir, f'{name}.{st.st_mtime_ns}-{st.st_size}.{EXTENSIONS[encoding]}')
+        if not os.path.exists(variant):
+            self.invalidate(path, encoding, keep=variant)
+            self._compress(path, variant, encoding)
+        return variant
+
+    def invalidate(self, path, encoding=None, keep=None):
+        """Remove the variants of path (only those of encoding if given), except keep."""
+        name = os.path.basename(path)
+        extensions = [EXTENSIONS[encoding]] if encoding else list(EXTENSIONS.values())
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                prefix, _, ext = entry.name.rpartition('.')
+                if ext in extensions and prefix.rpartition('.')[0] == name and entry.path != keep:
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+
+    def _compress(self, path, variant, encoding):
+        # Write then rename so concurrent requests never serve a partial variant. The temporary name is
+        # unique per call: requests of the same process compress in parallel threads
+        tmp_path = f'{variant}.{uuid.uuid4().hex}.tmp'
+        try:
+            if encoding == 'br':
+                with open(path, 'rb') as f:
+                    data = brotli.compress(f.read(), quality=BROTLI_QUALITY)
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+            else:
+                with open(path, 'rb') as src, gzip.open(tmp_path, 'wb', compresslevel=GZIP_LEVEL) as dst:
+                    shutil.copyfileobj(src, dst)
+            os.replace(tmp_path, variant)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info(f"Compressed {os.path.basename(path)}: {os.path.getsize(path)} -> {os.path.getsize(variant)} bytes ({encoding})")
@@ -0,0 +1,138 @@
+import logging
+import os
+import threading
+
+from orcsc.file_reader import iter_orcsc_rows, InvalidOrcscFile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 5
+SORT_KEYS = ('name', 'size', 'modified', 'event_title', 'start_date', 'classes', 'races', 'boats')
+
+
+def summarize_orcsc_file(path):
+    """Event title/dates and class, race and boat counts of an ORCSC file, read in one streaming pass."""
+    summary = {"event_title": "", "start_date": "", "end_date": "", "classes": 0, "races": 0, "boats": 0,
+               "valid": True}
+    counts = {'Cls': 'classes', 'Race': 'races', 'Fleet': 'boats'}
+    try:
+        for section, row in iter_orcsc_rows(path):
+            if section == 'Event':
+                if not summary["event_title"]:
+                    summary["event_title"] = row.get('EventTitle') or ""
+                    summary["start_date"] = row.get('StartDate') or ""
+                    summary["end_date"] = row.get('EndDate') or ""
+            else:
+                summary[counts[section]] += 1
+    except InvalidOrcscFile as e:
+        logger.warning(f"Could not read ORCSC file {path}: {e}")
+        summary["valid"] = False
+    return summary
+
+
+class FileCatalog:
+    """
+    In-memory catalog of the .orcsc files of a directory with their size, modification time
+    and event summary. Entries are refreshed by the write endpoints through update() and by
+    a polling watcher that rescans the directory and re-reads only files whose size or mtime changed.
+    on_change(path) is called from the watcher thread for every file it finds changed or removed.
+    """
+
+    def __init__(self, directory, on_change=None):
+        self.directory = directory
+        self.on_change = on_change
+        self._entries = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def refresh(self):
+        """Rescan the directory. Returns the names of added/changed and removed files."""
+        try:
+            with os.scandir(self.directory) as entries:
+                found = {entry.name: entry.stat() for entry in entries
+                         if entry.name.endswith('.orcsc') and entry.is_file()}
+        except OSError as e:
+            logger.error(f"Error scanning {self.directory}: {e}")
+            return [], []
+        changed = [name for name, st in found.items() if self._is_changed(name, st)]
+        for name in changed:
+            self._load(name, found[name])
+        with self._lock:
+            removed = [name for name in self._entries if name not in found]
+            for name in removed:
+                del self._entries[name]
+                del self._keys[name]
+        return changed, removed
+
+    def update(self, path):
+        """Refresh a single file after it was written or deleted."""
+        name = os.path.basename(path)
+        try:
+            st = os.stat(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(name, None)
+                self._keys.pop(name, None)
+            return None
+        return self._load(name, st)
+
+    def get(self, name):
+        with self._lock:
+            return self._entries.get(name)
+
+    def list(self, sort='name', descending=False, q=None):
+        """Catalog entries sorted by sort key, optionally filtered by a name/event title substring."""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Invalid sort key: {sort}")
+        with self._lock:
+            files = list(self._entries.values())
+        if q:
+            q = q.lower()
+            files = [f for f in files if q in f["name"].lower() or q in f["event_title"].lower()]
+        return sorted(files, key=lambda f: f[sort], reverse=descending)
+
+    def start_watcher(self, interval=DEFAULT_POLL_INTERVAL):
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="orcsc-file-catalog",
+                                         daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            changed, removed = self.refresh()
+            if changed or removed:
+                logger.info(f"File catalog: {len(changed)} files changed, {len(removed)} files removed")
+            if self.on_change is not None:
+                for name in changed + removed:
+                    try:
+                        self.on_change(os.path.join(self.directory, name))
+                    except Exception as e:
+                        logger.error(f"Error handling change of {name}: {e}", exc_info=True)
+
+    def _is_changed(self, name, st):
+        with self._lock:
+            return self._keys.get(name) != (st.st_mtime_ns, st.st_size)
+
+    def _load(self, name, st):
+        path = os.path.join(self.directory, name)
+        entry = {
+            "name": name,
+            "path": path,
+            "size": st.st_size,
+            "modified": st.st_mtime,
+            **summarize_orcsc_file(path),
+        }
+        with self._lock:
+            self._entries[name] = entry
+            self._keys[name] = (st.st_mtime_ns, st.st_size)
+        return entry
@@ -0,0 +1,72 @@
+import hashlib
+
+from orcsc.file_reader import iter_orcsc_rows, project_fleet_row, class_row, race_row
+
+# Key field of the rows of each diffed section
+ROW_KEYS = {'Cls': 'ClassId', 'Race': 'RaceId', 'Fleet': 'YID'}
+SECTION_NAMES = {'Cls': 'classes', 'Race': 'races', 'Fleet': 'fleet'}
+
+
+def _row_hash(row):
+    h = hashlib.blake2b(digest_size=8)
+    for tag, text in row.items():
+        h.update(f"{tag}\x1f{text or ''}\x1e".encode('utf-8'))
+    return h.digest()
+
+
+def snapshot_rows(path):
+    """
+    {section: {key: (content hash, raw row)}} of the class, race and fleet rows of an ORCSC file
+    (path or binary file object).
+    Rows without a key are skipped.
+    """
+    snapshot = {section: {} for section in ROW_KEYS}
+    for section, row in iter_orcsc_rows(path, tuple(ROW_KEYS)):
+        key = row.get(ROW_KEYS[section])
+        if key:
+            snapshot[section][key] = (_row_hash(row), row)
+    return snapshot
+
+
+def _format_row(section, row):
+    if section == 'Fleet':
+        return project_fleet_row(row)
+    if section == 'Race':
+        return race_row(row)
+    return class_row(row)
+
+
+def _format_key(section, key):
+    # YID and RaceId are integers in the file read endpoint
+    if section != 'Cls' and key.isdigit():
+        return int(key)
+    return key
+
+
+def diff_rows(old, new):
+    """
+    Keyed diff of two snapshots, in linear time by comparing row hashes.
+    Returns {"classes"|"races"|"fleet": {"added": [row], "removed": [key], "updated": [row]}}
+    with rows formatted as in the file read endpoint.
+    """
+    diff = {}
+    for section, name in SECTION_NAMES.items():
+        old_rows, new_rows = old.get(section, {}), new.get(section, {})
+        added, updated = [], []
+        for key, (row_hash, row) in new_rows.items():
+            previous = old_rows.get(key)
+            if previous is None:
+                added.append(_format_row(section, row))
+            elif previous[0] != row_hash:
+                updated.append(_format_row(section, row))
+        removed = [_format_key(section, key) for key in old_rows if key not in new_rows]
+        diff[name] = {"added": added, "removed": removed, "updated": updated}
+    return diff
+
+
+def is_empty(diff):
+    return not any(changes[kind] for changes in diff.values() for kind in changes)
+
+
+def diff_files(old_path, new_path):
+    return diff_rows(snapshot_rows(old_path), snapshot_rows(new_path))
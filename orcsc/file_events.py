@@ -0,0 +1,113 @@
+import asyncio
+import io
+import logging
+import os
+import threading
+
+from orcsc.file_diff import snapshot_rows, diff_rows
+from orcsc.file_versions import content_version
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 100
+
+
+class FileEvents:
+    """
+    Broadcasts file change events to subscribers (one asyncio queue per connected client).
+    Subscribers either follow one file or every file of the directory. For files with at least one
+    file subscriber the last row snapshot is kept, so each event carries a row-level diff.
+    subscribe() and publish() read the file and may be called from any thread. Each event carries the
+    version (see file_versions) of the content it was diffed from; publishing an unchanged file sends nothing.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._snapshots = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._publish_locks = {}
+
+    def subscribe(self, path=None, loop=None):
+        """Queue receiving the events of path (or of every file if path is None) on loop (default the running one)."""
+        loop = loop or asyncio.get_running_loop()
+        queue = asyncio.Queue(QUEUE_SIZE)
+        name = os.path.basename(path) if path else None
+        # Parsed outside the lock; a snapshot kept for other subscribers of the file stays in use
+        if name is not None:
+            version, data = _read(path)
+            snapshot = snapshot_rows(io.BytesIO(data)) if data is not None else {}
+        with self._lock:
+            if name is not None and name not in self._snapshots:
+                self._snapshots[name] = snapshot
+                self._versions[name] = version
+            self._subscribers[queue] = (loop, name)
+        return queue
+
+    def version(self, path):
+        """Version the events of a followed file are diffed from (None if not followed)."""
+        with self._lock:
+            return self._versions.get(os.path.basename(path))
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            _, name = self._subscribers.pop(queue, (None, None))
+            if name is not None and all(n != name for _, n in self._subscribers.values()):
+                self._snapshots.pop(name, None)
+
+    def publish(self, path):
+        """Send the current content of path (deleted if it no longer exists) to its subscribers."""
+        name = os.path.basename(path)
+        with self._lock:
+            publish_lock = self._publish_locks.setdefault(name, threading.Lock())
+        # One publication of a file at a time: each reads the file after the previous one was sent
+        with publish_lock:
+            version, data = _read(path)
+            deleted = data is None
+            with self._lock:
+                if name in self._versions and self._versions[name] == version:
+                    return
+                followed = name in self._snapshots
+            snapshot = None
+            if followed:
+                try:
+                    snapshot = {} if deleted else snapshot_rows(io.BytesIO(data))
+                except Exception as e:
+                    logger.warning(f"Could not read {name} for its change event: {e}")
+            with self._lock:
+                self._versions[name] = version
+                changes = None
+                if snapshot is not None and name in self._snapshots:
+                    changes = diff_rows(self._snapshots[name], snapshot)
+                    self._snapshots[name] = snapshot
+                event = {"file": name, "version": version, "deleted": deleted, "changes": changes}
+                # Directory subscribers only get the version
+                summary = {**event, "changes": None}
+                targets = [(queue, loop, summary if n is None else event)
+                           for queue, (loop, n) in self._subscribers.items() if n is None or n == name]
+            for queue, loop, event in targets:
+                try:
+                    loop.call_soon_threadsafe(_deliver, queue, event)
+                except RuntimeError:
+                    # The subscriber's event loop is closed
+                    self.unsubscribe(queue)
+
+
+def _read(path):
+    # (version, content) of a file, or (None, None) if it does not exist
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None, None
+    return content_version(data), data
+
+
+def _deliver(queue, event):
+    if queue.full():
+        # Slow client: drop the backlog and ask it to reload
+        while not queue.empty():
+            queue.get_nowait()
+        event = {"file": event["file"], "version": event["version"], "deleted": event["deleted"],
+                 "changes": None, "resync": True}
+    queue.put_nowait(event)
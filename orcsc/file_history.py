@@ -12,37 +12,55 @@ class FileHistory:
         self.backup_dir = self.base_dir / "backups"
         self.backup_dir.mkdir(parents=True, exist_ok=True)
 
+    def _backup(self, source_path: str, change_summary: str, timestamp: str) -> str:
+        source_path = Path(source_path).resolve()
+        relative_path = source_path.relative_to(self.base_dir)
+        backup_dir = self.backup_dir / relative_path.parent
+        backup_dir.mkdir(parents=True, exist_ok=True)
+
+        # Backups of the same file within the same second get a -1, -2... suffix instead of overwriting
+        backup_path = backup_dir / f"{relative_path.stem}_{timestamp}{relative_path.suffix}"
+        count = 0
+        while backup_path.exists():
+            count += 1
+            backup_path = backup_dir / f"{relative_path.stem}_{timestamp}-{count}{relative_path.suffix}"
+
+        # Create metadata file for the backup
+        metadata = {
+            "timestamp": timestamp,
+            "change_summary": change_summary,
+            "original_path": str(relative_path)
+        }
+        metadata_path = backup_path.with_suffix('.json')
+
+        # Copy the file and save metadata
+        shutil.copy2(source_path, backup_path)
+        with open(metadata_path, 'w') as f:
+            json.dump(metadata, f)
+        return str(backup_path)
+
     def create_backup(self, source_path: str, change_summary: str = "") -> str:
         """Create a backup of a file with a summary of changes."""
         try:
-            source_path = Path(source_path).resolve()
-            relative_path = source_path.relative_to(self.base_dir)
-            backup_dir = self.backup_dir / relative_path.parent
-            backup_dir.mkdir(parents=True, exist_ok=True)
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_filename = f"{relative_path.stem}_{timestamp}{relative_path.suffix}"
-            backup_path = backup_dir / backup_filename
-            
-            # Create metadata file for the backup
-            metadata = {
-                "timestamp": timestamp,
-                "change_summary": change_summary,
-                "original_path": str(relative_path)
-            }
-            metadata_path = backup_path.with_suffix('.json')
-            
-            # Copy the file and save metadata
-            shutil.copy2(source_path, backup_path)
-            with open(metadata_path, 'w') as f:
-                json.dump(metadata, f)
-                
+            backup_path = self._backup(source_path, change_summary, datetime.now().strftime("%Y%m%d_%H%M%S"))
             logger.info(f"Created backup: {backup_path} with summary: {change_summary}")
-            return str(backup_path)
+            return backup_path
         except Exception as e:
             logger.error(f"Error creating backup: {str(e)}")
             raise
 
+    def create_backups(self, entries: list[tuple[str, str]]) -> list[str]:
+        """Create the backups of several files, as (source path, change summary) pairs, with one timestamp."""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        try:
+            backup_paths = [self._backup(source_path, change_summary, timestamp)
+                            for source_path, change_summary in entries]
+            logger.info(f"Created {len(backup_paths)} backups")
+            return backup_paths
+        except Exception as e:
+            logger.error(f"Error creating backups: {str(e)}")
+            raise
+
     def list_backups(self, file_path: str) -> list[dict]:
         """List all backups for a file with their change summaries."""
         try:
@@ -77,7 +95,8 @@ class FileHistory:
                     logger.warning(f"Invalid metadata for backup {backup_file}: {str(e)}")
                     continue
             
-            return sorted(backups, key=lambda x: x["timestamp"], reverse=True)
+            # Same second backups: the -N suffixed names are the newer ones
+            return sorted(backups, key=lambda x: (x["timestamp"], len(x["filename"]), x["filename"]), reverse=True)
         except Exception as e:
             logger.error(f"Error listing backups: {str(e)}")
             raise
@@ -0,0 +1,159 @@
+import os
+import typing
+from collections import OrderedDict
+
+from defusedxml import ElementTree as DefusedET
+
+from orcsc.model.fleet_row import FleetRow
+
+# Fleet fields returned when no projection is requested
+DEFAULT_FLEET_FIELDS = [
+    "YID", "YachtName", "SailNo", "ClassId", "CDL", "Rating", "GPH",
+    "TN_Inshore_Low", "TN_Inshore_Medium", "TN_Inshore_High",
+    "TN_Offshore_Low", "TN_Offshore_Medium", "TN_Offshore_High",
+    "TND_Inshore_Low", "TND_Inshore_Medium", "TND_Inshore_High",
+    "TND_Offshore_Low", "TND_Offshore_Medium", "TND_Offshore_High",
+]
+FLEET_FIELD_TYPES = typing.get_type_hints(FleetRow)
+# Top level sections holding the rows returned by the API
+ROW_SECTIONS = ('Event', 'Cls', 'Race', 'Fleet')
+CACHE_SIZE = 32
+
+_cache = OrderedDict()
+
+
+class InvalidOrcscFile(ValueError):
+    pass
+
+
+def _int(text):
+    try:
+        return int(text) if text else 0
+    except ValueError:
+        return 0
+
+
+def _float(text):
+    try:
+        return float(text) if text else None
+    except ValueError:
+        return None
+
+
+def iter_orcsc_rows(path, sections=ROW_SECTIONS):
+    """
+    Stream the ROW elements of the requested top level sections as (section, {tag: text}) tuples.
+    Elements are detached as soon as they are read and other sections (reports, logos, tracks...)
+    are discarded while parsing, so memory stays bounded regardless of the file size.
+    """
+    # Elements being parsed, from the root down: [root, section, ROW, field...]
+    open_elems = []
+    try:
+        for event, elem in DefusedET.iterparse(path, events=('start', 'end')):
+            if event == 'start':
+                open_elems.append(elem)
+                continue
+            open_elems.pop()
+            if not open_elems:
+                continue
+            requested = len(open_elems) > 1 and open_elems[1].tag in sections
+            if requested and len(open_elems) > 2:
+                # Field of a requested ROW, read when the ROW ends
+                continue
+            if requested and elem.tag == 'ROW':
+                yield open_elems[1].tag, {child.tag: child.text for child in elem}
+            # Detached as soon as it ends, so the tree never holds more than the current row
+            open_elems[-1].remove(elem)
+    except DefusedET.ParseError as e:
+        raise InvalidOrcscFile(f"Failed to parse XML file: {e}")
+
+
+def event_row(raw):
+    return {
+        "EventTitle": raw.get('EventTitle') or "",
+        "StartDate": raw.get('StartDate') or "",
+        "EndDate": raw.get('EndDate') or "",
+        "Venue": raw.get('Venue') or "",
+        "Organizer": raw.get('Organizer') or ""
+    }
+
+
+def class_row(raw):
+    return {
+        "ClassId": raw.get('ClassId') or "",
+        "ClassName": raw.get('ClassName') or "",
+        "YachtClass": raw.get('YachtClass') or "Unknown"
+    }
+
+
+def race_row(raw):
+    return {
+        "RaceId": _int(raw.get('RaceId')),
+        "RaceName": raw.get('RaceName') or "",
+        "StartTime": raw.get('StartTime') or "",
+        "ClassId": raw.get('ClassId') or "",
+        "ScoringType": raw.get('ScoringType') or ""
+    }
+
+
+def parse_orcsc_file(path, sections=ROW_SECTIONS):
+    """
+    Parse an ORCSC file into event, classes, races and fleet (only the requested sections are kept).
+    Fleet rows keep every field as raw text; use project_fleet_row to convert them.
+    """
+    data = {"event": None, "classes": [], "races": [], "fleet": []}
+    for section, row in iter_orcsc_rows(path, sections):
+        if section == 'Event' and data["event"] is None:
+            data["event"] = event_row(row)
+        elif section == 'Cls':
+            data["classes"].append(class_row(row))
+        elif section == 'Race':
+            data["races"].append(race_row(row))
+        elif section == 'Fleet':
+            data["fleet"].append(row)
+    if 'Event' in sections and data["event"] is None:
+        raise InvalidOrcscFile("Missing Event row")
+    return data
+
+
+def read_orcsc_file(path):
+    """parse_orcsc_file, cached until the file's modification time or size changes."""
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _cache.get(path)
+    if cached is not None and cached[0] == key:
+        _cache.move_to_end(path)
+        return cached[1]
+    data = parse_orcsc_file(path)
+    _cache[path] = (key, data)
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return data
+
+
+def invalidate(path):
+    _cache.pop(path, None)
+
+
+def project_fleet_row(raw, fields=DEFAULT_FLEET_FIELDS):
+    """Convert a raw fleet row to the requested fields, typed as in FleetRow."""
+    row = {}
+    for field in fields:
+        text = raw.get(field)
+        field_type = FLEET_FIELD_TYPES.get(field, str)
+        if field_type is int:
+            row[field] = _int(text)
+        elif field_type is float:
+            row[field] = _float(text)
+        else:
+            row[field] = text or ""
+    return row
+
+
+def fleet_page(fleet, offset=0, limit=None, fields=None, class_id=None):
+    """Filter, paginate and project fleet rows. Returns (total rows after filtering, page)."""
+    if class_id is not None:
+        fleet = [boat for boat in fleet if boat.get('ClassId') == class_id]
+    end = None if limit is None else offset + limit
+    page = [project_fleet_row(boat, fields or DEFAULT_FLEET_FIELDS) for boat in fleet[offset:end]]
+    return len(fleet), page
@@ -0,0 +1,62 @@
+import os
+import uuid
+from xml.etree.ElementTree import ParseError
+
+from defusedxml.common import DefusedXmlException
+from defusedxml.ElementTree import DefusedXMLParser
+
+CHUNK_SIZE = 64 * 1024
+
+
+class InvalidUpload(ValueError):
+    pass
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class _NullTarget:
+    """Parser target that keeps nothing: the upload is only checked to be well-formed XML."""
+
+    def start(self, tag, attrib):
+        pass
+
+    def end(self, tag):
+        pass
+
+    def data(self, data):
+        pass
+
+    def close(self):
+        return None
+
+
+def stage_upload(src, staging_dir, max_size, chunk_size=CHUNK_SIZE):
+    """
+    Copy a file object to a new file in staging_dir, checking it is well-formed XML (with XXE protection)
+    while it is copied. Returns the staged path; nothing is left behind if the upload is rejected.
+    """
+    os.makedirs(staging_dir, exist_ok=True)
+    staged_path = os.path.join(staging_dir, f"{uuid.uuid4()}.part")
+    parser = DefusedXMLParser(target=_NullTarget())
+    size = 0
+    try:
+        with open(staged_path, "wb") as dst:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(f"File size exceeds maximum limit of {max_size / (1024 * 1024):.0f}MB")
+                parser.feed(chunk)
+                dst.write(chunk)
+        parser.close()
+    except (ParseError, DefusedXmlException) as e:
+        os.remove(staged_path)
+        raise InvalidUpload(f"Not valid XML: {e}")
+    except BaseException:
+        os.remove(staged_path)
+        raise
+    return staged_path
@@ -0,0 +1,53 @@
+import hashlib
+import os
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: writes are only serialized within a process
+    fcntl = None
+
+CHUNK_SIZE = 1 << 20
+
+
+def content_version(data):
+    """Version of file content: a hash, so every worker process derives the same version from the file."""
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def file_version(path):
+    """Version (see content_version) of a file's current content, or None if it does not exist."""
+    digest = hashlib.blake2b(digest_size=8)
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+class FileLocks:
+    """
+    OS file locks (flock) serializing the writes to the files of a directory across threads and worker
+    processes. A file is locked through a companion file in lock_dir, as writes may replace the file itself.
+    """
+
+    def __init__(self, lock_dir):
+        self.lock_dir = lock_dir
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def acquire(self, path):
+        """Block until the lock of path is held. Returns the handle to pass to release."""
+        handle = open(os.path.join(self.lock_dir, f'{os.path.basename(path)}.lock'), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            except BaseException:
+                handle.close()
+                raise
+        return handle
+
+    def release(self, handle):
+        # Closing the file releases its flock
+        handle.close()
@@ -0,0 +1,166 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+from orcsc.file_reader import iter_orcsc_rows
+from orcsc.model.rslt_row import RsltRow
+from orcsc.scoring import PENALTY_CODES
+
+# Columns of a finish record; a boat is identified by YID or SailNo
+FINISH_FIELDS = ('YID', 'SailNo', 'FinishTime', 'Finish', 'Penalty_ET', 'Clear')
+# Fields a record can clear, listed in its Clear column ("all" for every one of them)
+CLEARABLE_FIELDS = ('FinishTime', 'Finish', 'Penalty_ET')
+
+
+class InvalidFinishes(ValueError):
+    """Finish records that cannot be imported, with the error of each record as (record number, message)."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(f"record {number}: {message}" for number, message in errors))
+
+
+def read_finish_records(content: bytes, fmt: str):
+    """
+    Finish records from a CSV file (header row with FINISH_FIELDS columns) or a JSON array of objects.
+    """
+    text = content.decode('utf-8-sig')
+    if fmt == 'csv':
+        return [{k.strip(): (v or '').strip() for k, v in row.items() if k} for row in csv.DictReader(io.StringIO(text))]
+    if fmt == 'json':
+        records = json.loads(text)
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            raise InvalidFinishes([(0, "Expected a JSON array of finish objects")])
+        return records
+    raise ValueError(f"Unsupported finish format: {fmt}")
+
+
+def _sail_key(sail_no):
+    return "".join((sail_no or "").split()).upper()
+
+
+def _file_time(dt):
+    # Same clock and format as the race StartTime: event local time with a Z suffix
+    return f"{dt:%Y-%m-%dT%H:%M:%S}.{dt.microsecond // 1000:03d}Z"
+
+
+class FinishResolver:
+    """
+    Turns finish records of one race into RsltRows: boats are looked up in the race's class by YID or
+    sail number, finish codes are checked and finish times normalized to the clock of the race start.
+    A finish time is either a full ISO timestamp (converted to event local time if it has a UTC offset)
+    or a time of day on the start date, rolling over to the next day if it is before the start.
+    """
+
+    def __init__(self, path, race_id):
+        self.race_id = str(race_id)
+        self.race = None
+        self.utc_offset = 0
+        boats = []
+        for section, row in iter_orcsc_rows(path, ('Event', 'Race', 'Fleet')):
+            if section == 'Event':
+                self.utc_offset = int(row.get('UTCOffset') or 0)
+            elif section == 'Race' and row.get('RaceId') == self.race_id:
+                self.race = row
+            elif section == 'Fleet':
+                boats.append(row)
+        if self.race is None:
+            raise KeyError(f"Race not found: {race_id}")
+        boats = [boat for boat in boats if boat.get('ClassId') == self.race.get('ClassId')]
+        self.yids = {boat.get('YID') for boat in boats}
+        self.sail_numbers = {_sail_key(boat.get('SailNo')): boat.get('YID') for boat in boats if boat.get('SailNo')}
+        self.start = datetime.fromisoformat(self.race['StartTime']).replace(tzinfo=None) \
+            if self.race.get('StartTime') else None
+
+    def _yid(self, record):
+        yid = str(record.get('YID') or '').strip()
+        if yid:
+            if yid not in self.yids:
+                raise ValueError(f"Boat {yid} is not in class {self.race.get('ClassId')}")
+            return yid
+        sail_no = _sail_key(record.get('SailNo'))
+        if sail_no not in self.sail_numbers:
+            raise ValueError(f"Unknown sail number: {record.get('SailNo') or ''}")
+        return self.sail_numbers[sail_no]
+
+    def _finish_time(self, text):
+        try:
+            if 'T' in text or '-' in text:
+                dt = datetime.fromisoformat(text)
+                if dt.tzinfo is not None:
+                    dt = dt.astimezone(timezone(timedelta(seconds=self.utc_offset))).replace(tzinfo=None)
+                return dt
+            time_of_day = datetime.strptime(text, '%H:%M:%S.%f' if '.' in text else '%H:%M:%S').time()
+        except ValueError:
+            raise ValueError(f"Invalid finish time: {text}")
+        if self.start is None:
+            raise ValueError("A time of day needs the race start time")
+        dt = datetime.combine(self.start.date(), time_of_day)
+        return dt + timedelta(days=1) if dt < self.start else dt
+
+    @staticmethod
+    def _cleared(record):
+        value = record.get('Clear') or ''
+        names = [name.strip() for name in (value if isinstance(value, list) else str(value).split(','))]
+        names = [name for name in names if name]
+        if any(name.lower() == 'all' for name in names):
+            return set(CLEARABLE_FIELDS)
+        unknown = [name for name in names if name not in CLEARABLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Cannot clear {', '.join(unknown)}, use {', '.join(CLEARABLE_FIELDS)} or all")
+        return set(names)
+
+    def resolve(self, record):
+        """
+        RsltRow of a finish record. Raises ValueError if the record is invalid.
+        Fields listed in the record's Clear column are emptied in the file (e.g. Clear=FinishTime to
+        remove a finish time entered for the wrong boat).
+        """
+        yid = self._yid(record)
+        cleared = self._cleared(record)
+        code = str(record.get('Finish') or '').strip().upper()
+        finish_time = str(record.get('FinishTime') or '').strip()
+        penalty = str(record.get('Penalty_ET') or '').strip()
+        if code and code not in PENALTY_CODES:
+            raise ValueError(f"Unknown finish code: {code}")
+        if not code and not finish_time and not cleared:
+            raise ValueError("A finish time, a finish code or a field to clear is required")
+        given = {field for field, value in (('Finish', code), ('FinishTime', finish_time), ('Penalty_ET', penalty))
+                 if value}
+        if given & cleared:
+            raise ValueError(f"Cannot both set and clear {', '.join(sorted(given & cleared))}")
+        # A finish time without a code also clears an earlier code (e.g. a DNF entered too early)
+        row = RsltRow("ROW", RaceId=self.race_id, YID=yid,
+                      Finish=code or ('' if finish_time or 'Finish' in cleared else None))
+        if 'FinishTime' in cleared:
+            row.FinishTime = ''
+        if 'Penalty_ET' in cleared:
+            row.Penalty_ET = ''
+        if finish_time:
+            finished = self._finish_time(finish_time)
+            if self.start is not None and finished <= self.start:
+                raise ValueError(f"Finish time {finish_time} is not after the start")
+            row.FinishTime = _file_time(finished)
+        if penalty:
+            try:
+                row.Penalty_ET = str(float(penalty))
+            except ValueError:
+                raise ValueError(f"Invalid time penalty: {penalty}")
+        return row
+
+    def resolve_all(self, records):
+        """
+        RsltRows of all records, the last record of a boat winning. Raises InvalidFinishes listing every
+        invalid record (numbered from 1) so a bulk import is all or nothing.
+        """
+        rows, errors = {}, []
+        for number, record in enumerate(records, 1):
+            try:
+                row = self.resolve(record)
+                rows[row.YID] = row
+            except ValueError as e:
+                errors.append((number, str(e)))
+        if errors:
+            raise InvalidFinishes(errors)
+        return list(rows.values())
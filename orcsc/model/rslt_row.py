@@ -0,0 +1,40 @@
+from dataclasses import dataclass
+
+from orcsc.model.xml_element import XmlElement
+
+
+@dataclass
+class RsltRow(XmlElement):
+    RaceId: int = None
+    YID: int = None
+    Finish: str = None
+    FinishTime: str = None
+    TOD: str = None
+    CorrectedSeconds: str = None
+    Remarks: str = None
+    TOT: str = None
+    Penalty_ET: str = None
+    Penalty: str = None
+    IW: str = None
+    PosOvl: str = None
+    PtsOvl: str = None
+    PosCls: str = None
+    PtsCls: str = None
+    DiscardedOvl: str = None
+    DiscardedCls: str = None
+    CorrDelay: str = None
+    CorrectedSeconds2: str = None
+    IW2: str = None
+    Pts1: str = None
+    Pts2: str = None
+    CorrDelay2: str = None
+    TOT2: str = None
+    TOD2: str = None
+    RaceNo: str = None
+    CorrectedSeconds1: str = None
+    CorrDelay1: str = None
+    StartOffset: str = None
+    StartDelay: str = None
+    StartOffsetIdeal: str = None
+    ProjElapsed: str = None
+    PWHandle: str = None
@@ -10,6 +10,8 @@ from orcsc.model.cls_row import ClsRow
 from orcsc.model.event_row import EventRow
 from orcsc.model.fleet_row import FleetRow
 from orcsc.model.logo import logo
+from orcsc.model.rslt_row import RsltRow
+from orcsc.model.xml_element import to_xml_str
 from utils import backup_file, default_input, create_folder
 
 
@@ -70,6 +72,13 @@ def add_classes(input_file, output_file, classes: List[ClsRow]):
 
 def add_reports(input_file, output_file, classes: List[ClsRow]):
     tree = ET.parse(input_file)
+    _add_class_reports(tree, classes)
+    ET.indent(tree, space="\t", level=0)
+    remove_namespace(tree, "http://www.topografix.com/GPX/1/1")
+    tree.write(output_file, encoding='utf-8', xml_declaration=False)
+
+
+def _add_class_reports(tree, classes: List[ClsRow]):
     reports = tree.getroot().find('./reports')
     # Add Event results
     preexisting_report = reports.find(f".//report[@name='TEventResults']")
@@ -117,9 +126,6 @@ def add_reports(input_file, output_file, classes: List[ClsRow]):
             # race_results_one_design = ET.parse("model/RaceResultsReportZ.xml")
             race_results_one_design.getroot().set('id', cls_row.ClassId)
             reports.append(race_results_one_design.getroot())
-    ET.indent(tree, space="\t", level=0)
-    remove_namespace(tree, "http://www.topografix.com/GPX/1/1")
-    tree.write(output_file, encoding='utf-8', xml_declaration=False)
 
 
 def add_logos(input_file, output_file, logos):
@@ -271,19 +277,96 @@ def update_fleet(input_file, output_file, updated_fleet: FleetRow):
     tree.write(output_file, encoding='utf-8', xml_declaration=False)
 
 
+def assign_classes(input_file, output_file, classes: List[ClsRow], assignments):
+    """
+    Move boats to classes with a single parse and write. assignments maps YID to ClassId; classes that
+    are not in the file yet are added (with their reports).
+    """
+    tree = ET.parse(input_file)
+    root = tree.getroot()
+    Cls = root.find('./Cls')
+    existing = {row.findtext('ClassId') for row in Cls.findall('./ROW')}
+    new_classes = [cls_row for cls_row in classes if cls_row.ClassId not in existing]
+    for cls_row in new_classes:
+        Cls.append(cls_row.to_element())
+    if new_classes:
+        _add_class_reports(tree, new_classes)
+        remove_namespace(tree, "http://www.topografix.com/GPX/1/1")
+
+    assignments = {str(yid): class_id for yid, class_id in assignments.items()}
+    for row in root.find('./Fleet').findall('./ROW'):
+        class_id = assignments.get(row.findtext('YID'))
+        if class_id is None:
+            continue
+        elem = row.find('ClassId')
+        if elem is None:
+            elem = ET.SubElement(row, 'ClassId')
+        elem.text = class_id
+    ET.indent(tree, space="\t", level=0)
+    tree.write(output_file, encoding='utf-8', xml_declaration=False)
+    logging.info(f"Assigned {len(assignments)} boats to classes {', '.join(c.ClassId for c in classes)}")
+
+
+def set_finishes(input_file, output_file, finishes: List[RsltRow]):
+    """
+    Write finish data into the Rslt rows with a single parse and write.
+    The row of each finish is found by RaceId and YID and a new row is added for boats without one.
+    Fields that are None are left as they are; an empty string clears a field (e.g. a wrong FinishTime).
+    """
+    tree = ET.parse(input_file)
+    root = tree.getroot()
+    Rslt = root.find('./Rslt')
+    if Rslt is None:
+        Rslt = ET.SubElement(root, 'Rslt')
+    rows = {(row.findtext('RaceId'), row.findtext('YID')): row for row in Rslt.findall('./ROW')}
+    for finish in finishes:
+        row = rows.get((str(finish.RaceId), str(finish.YID)))
+        if row is None:
+            row = finish.to_element()
+            Rslt.append(row)
+            rows[str(finish.RaceId), str(finish.YID)] = row
+            continue
+        for field in vars(finish):
+            value = getattr(finish, field)
+            if value is None or field.startswith("_"):
+                continue
+            elem = row.find(field)
+            if elem is None:
+                elem = ET.SubElement(row, field)
+            elem.text = to_xml_str(value) or None
+    ET.indent(tree, space="\t", level=0)
+    tree.write(output_file, encoding='utf-8', xml_declaration=False)
+
+
 def add_fleet_from_orc_json(input_file, output_file, orc_json, class_id=None):
     """
     Add a fleet (boat) entry from ORC API JSON to the XML file.
     """
+    add_fleets_from_orc_json(input_file, output_file, [orc_json], class_id=class_id)
+
+
+def add_fleets_from_orc_json(input_file, output_file, orc_jsons, class_id=None):
+    """
+    Add several fleet (boat) entries from ORC API JSON to the XML file with a single parse and write.
+    """
     tree = ET.parse(input_file)
     Fleet = tree.getroot().find('./Fleet')
     # Determine next YID
-    yids = get_yids(get_fleets(input_file))
+    yids = [int(row.find('YID').text) for row in Fleet.findall('./ROW') if row.find('YID') is not None]
     next_yid = max(yids) + 1 if yids else 1
+    for orc_json in orc_jsons:
+        fleet_row = fleet_row_from_orc_json(orc_json, next_yid, class_id=class_id)
+        logging.info(f"Adding fleet from ORC JSON: {fleet_row.YachtName} ({fleet_row.SailNo})")
+        Fleet.append(fleet_row.to_element())
+        next_yid += 1
+    ET.indent(tree, space="\t", level=0)
+    tree.write(output_file, encoding='utf-8', xml_declaration=False)
+
 
-    # Map JSON fields to FleetRow fields
+def fleet_row_from_orc_json(orc_json, yid, class_id=None):
+    """Map an ORC API certificate JSON to a FleetRow."""
     fleet_row = FleetRow("ROW")
-    fleet_row.YID = next_yid
+    fleet_row.YID = yid
     fleet_row.SailNo = orc_json.get("SailNo")
     fleet_row.YachtName = orc_json.get("YachtName")
     fleet_row.BowNo = ""
@@ -440,10 +523,7 @@ def add_fleet_from_orc_json(input_file, output_file, orc_json, class_id=None):
     fleet_row.BRA_ALL_DN_TOT = orc_json.get("BRA_ALL_DN_TOT")
     fleet_row.BRA_7030_TOT = orc_json.get("BRA_7030_TOT")
     fleet_row.BRA_3070_TOT = orc_json.get("BRA_3070_TOT")
-    logging.info(f"Adding fleet from ORC JSON: {fleet_row}")
-    Fleet.append(fleet_row.to_element())
-    ET.indent(tree, space="\t", level=0)
-    tree.write(output_file, encoding='utf-8', xml_declaration=False)
+    return fleet_row
 
 
 def delete_class(input_file, output_file, class_id: str):
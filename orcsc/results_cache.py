@@ -0,0 +1,155 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from orcsc.scoring import rating_field, score_race, read_scoring_rows
+from orcsc.series import class_series, has_finishes
+
+# Inputs of score_race: race row fields, fleet fields (plus the rating field) and Rslt fields
+RACE_FIELDS = ('RaceId', 'ClassId', 'StartTime')
+FLEET_FIELDS = ('YID', 'YachtName', 'SailNo')
+RESULT_FIELDS = ('YID', 'FinishTime', 'Finish', 'Penalty_ET')
+# Files kept in the cache, least recently used first out (also drops deleted and renamed files)
+CACHE_SIZE = 32
+
+
+def _digest(rows, fields):
+    h = hashlib.blake2b(digest_size=8)
+    for row in rows:
+        for field in fields:
+            h.update(f"{row.get(field) or ''}\x1f".encode('utf-8'))
+        h.update(b'\x1e')
+    return h.digest()
+
+
+class _CachedFile:
+    def __init__(self):
+        self.stat = None
+        self.rows = None
+        self.races = {}    # RaceId -> (key, scored race)
+        self.series = {}   # ClassId -> (structure, SeriesStandings, {RaceId: key of the scores set})
+        self.answers = {}  # (kind, id, wind speeds) -> last answer for the current file version
+
+
+class ResultsCache:
+    """
+    Scored races and series standings of the ORCSC files.
+    As long as a file's modification time and size are unchanged, its parsed rows and the answers
+    already computed are served from memory without reading the file. After a change the rows are read
+    again once; each race is then keyed by (race id, fleet rating hash, finish data hash, rating field),
+    so only the races whose inputs changed are re-scored and a series only replaces their columns.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._files = OrderedDict()  # path -> _CachedFile
+        self._lock = threading.Lock()
+
+    def _file(self, path):
+        st = os.stat(path)
+        stat = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._files.get(path)
+            if cached is not None and cached.stat == stat:
+                self._files.move_to_end(path)
+                return cached
+        rows = read_scoring_rows(path)
+        with self._lock:
+            cached = self._files.get(path)
+            if cached is None:
+                cached = self._files[path] = _CachedFile()
+            cached.stat, cached.rows, cached.answers = stat, rows, {}
+            self._files.move_to_end(path)
+            while len(self._files) > self.size:
+                self._files.popitem(last=False)
+            return cached
+
+    @staticmethod
+    def _score(cached, race, results, wind_speed, fleet_hashes):
+        _, _, fleet, _ = cached.rows
+        field = rating_field(race.get('ScoringType') or '', wind_speed)
+        class_id = race.get('ClassId')
+        if (class_id, field) not in fleet_hashes:
+            boats = [boat for boat in fleet if boat.get('ClassId') == class_id]
+            fleet_hashes[class_id, field] = _digest(boats, FLEET_FIELDS + (field,))
+        race_id = race.get('RaceId')
+        key = (race_id, fleet_hashes[class_id, field],
+               _digest([race], RACE_FIELDS) + _digest(results, RESULT_FIELDS), field)
+
+        previous = cached.races.get(race_id)
+        if previous is not None and previous[0] == key:
+            return key, previous[1]
+        scored = score_race(race, fleet, results, wind_speed)
+        cached.races[race_id] = (key, scored)
+        return key, scored
+
+    def race(self, path, race_id, wind_speed=None):
+        """Scored race of a file (see score_race). Raises KeyError if the race does not exist."""
+        cached = self._file(path)
+        with self._lock:
+            answer = cached.answers.get(('race', str(race_id), wind_speed))
+            if answer is not None:
+                return answer
+            _, races, _, results = cached.rows
+            race = next((race for race in races if race.get('RaceId') == str(race_id)), None)
+            if race is None:
+                raise KeyError(f"Race not found: {race_id}")
+            _, scored = self._score(cached, race, results.get(race['RaceId'], []), wind_speed, {})
+            cached.answers['race', str(race_id), wind_speed] = scored
+            return scored
+
+    def series(self, path, class_id, wind_speeds=None):
+        """
+        Series standings of a class (see SeriesStandings.standings), re-scoring only the races whose inputs
+        changed since the last call. wind_speeds optionally maps RaceId to the wind speed of the race.
+        Raises KeyError if the class does not exist.
+        """
+        cached = self._file(path)
+        answer_key = ('series', class_id, tuple(sorted((wind_speeds or {}).items())))
+        with self._lock:
+            answer = cached.answers.get(answer_key)
+            if answer is not None:
+                return answer
+            classes, races, fleet, results = cached.rows
+            if class_id not in classes:
+                raise KeyError(f"Class not found: {class_id}")
+            races = [race for race in races if race.get('ClassId') == class_id]
+            series, boats = class_series(classes[class_id], races, fleet)
+            structure = (tuple(series.yids), tuple(series.race_ids), series.discards,
+                         series.coefficients.tobytes(), series.discardable.tobytes())
+
+            previous = cached.series.get(class_id)
+            if previous is not None and previous[0] == structure:
+                _, series, applied = previous
+            else:
+                applied = {}
+                cached.series[class_id] = (structure, series, applied)
+
+            fleet_hashes = {}
+            for race in races:
+                race_id = race['RaceId']
+                race_results = results.get(race_id, [])
+                if not has_finishes(race_results):
+                    if applied.pop(race_id, None) is not None:
+                        series.clear_race(int(race_id))
+                    continue
+                try:
+                    key, scored = self._score(cached, race, race_results,
+                                              (wind_speeds or {}).get(int(race_id)), fleet_hashes)
+                except ValueError as e:
+                    # Name the race: a series can mix scoring types
+                    raise ValueError(f"Race {race_id}: {e}") from e
+                if applied.get(race_id) != key:
+                    series.set_race(int(race_id), {row["YID"]: row["PtsCls"] for row in scored["results"]})
+                    applied[race_id] = key
+
+            answer = {"ClassId": class_id, "discards": series.discards, "races": series.race_ids,
+                      "standings": series.standings(boats)}
+            cached.answers[answer_key] = answer
+            return answer
+
+    def invalidate(self, path):
+        """Drop everything cached for a file."""
+        with self._lock:
+            self._files.pop(path, None)
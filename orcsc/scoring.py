@@ -0,0 +1,163 @@
+from datetime import datetime
+
+import numpy as np
+
+from orcsc.file_reader import iter_orcsc_rows
+from orcsc.model.scoring_codes_enum import ScoringCode
+
+# Finish codes scored as the number of entries + 1
+PENALTY_CODES = ('DNC', 'DNS', 'OCS', 'DNF', 'RET', 'DSQ', 'DNE', 'BFD', 'UFD')
+# Upper wind speed (knots) of the triple number Low and Medium bands, above is High
+TRIPLE_NUMBER_BANDS = ((9, 'Low'), (14, 'Medium'))
+# Triple number scoring types whose band is picked from the wind speed
+TRIPLE_NUMBER_TYPES = ('TN_Inshore', 'TN_Offshore')
+
+
+def rating_field(scoring_type, wind_speed=None):
+    """
+    FleetRow rating field a race is scored on. scoring_type is a ScoringCode name or value, or
+    TN_Inshore/TN_Offshore to select the triple number band from wind_speed (knots).
+    """
+    if scoring_type in TRIPLE_NUMBER_TYPES:
+        if wind_speed is None:
+            raise ValueError(f"Wind speed is required for {scoring_type} scoring")
+        band = next((name for limit, name in TRIPLE_NUMBER_BANDS if wind_speed < limit), 'High')
+        return f"{scoring_type}_{band}"
+    if scoring_type in ScoringCode.__members__:
+        return ScoringCode[scoring_type].value
+    if scoring_type in {code.value for code in ScoringCode}:
+        return scoring_type
+    raise ValueError(f"Unknown scoring type: {scoring_type}")
+
+
+def _timestamp(text):
+    if not text:
+        return np.nan
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        return np.nan
+
+
+def _float_array(values):
+    out = np.full(len(values), np.nan)
+    for i, value in enumerate(values):
+        try:
+            out[i] = float(value)
+        except (TypeError, ValueError):
+            pass
+    return out
+
+
+def rank(corrected, entries):
+    """
+    Positions and low point scores for corrected times (NaN for boats without a valid finish).
+    Boats with equal corrected times share the position and the average of the tied places' points;
+    boats without a finish score entries + 1.
+    """
+    finished = ~np.isnan(corrected)
+    times = np.sort(corrected[finished])
+    first = np.searchsorted(times, corrected, side='left')
+    tied = np.searchsorted(times, corrected, side='right') - first
+    position = np.where(finished, first + 1, 0)
+    points = np.where(finished, first + 1 + (tied - 1) / 2, entries + 1)
+    return position, points
+
+
+def score_class(start_time, finish_times, ratings, codes=None, penalties=None):
+    """
+    Elapsed and corrected seconds, positions and points for a whole class at once.
+    finish_times are ISO timestamps, ratings TOT factors; codes are finish codes (DNF, DNS...) and
+    penalties elapsed time penalties in seconds. Corrected time is elapsed x TOT rounded to the second.
+    """
+    count = len(finish_times)
+    codes = list(codes) if codes is not None else [None] * count
+    elapsed = np.array([_timestamp(t) for t in finish_times]) - _timestamp(start_time)
+    if penalties is not None:
+        elapsed = elapsed + np.nan_to_num(_float_array(penalties))
+    ratings = _float_array(ratings)
+    penalized = np.array([(code or '').upper() in PENALTY_CODES for code in codes], dtype=bool)
+    valid = ~penalized & (elapsed > 0) & (ratings > 0)
+    corrected = np.where(valid, np.rint(elapsed * ratings), np.nan)
+    position, points = rank(corrected, count)
+    return {
+        "elapsed": np.where(elapsed > 0, elapsed, np.nan),
+        "ratings": ratings,
+        "corrected": corrected,
+        "position": position,
+        "points": points,
+    }
+
+
+def _number(value):
+    return None if np.isnan(value) else float(value)
+
+
+def score_race(race, fleet, results, wind_speed=None):
+    """
+    Provisional results of a race from its raw Race row, the raw Fleet rows and the raw Rslt rows of
+    the race. Every boat of the race's class is scored; boats without a result row are DNC.
+    Returns result rows sorted by position, non finishers last.
+    """
+    field = rating_field(race.get('ScoringType') or '', wind_speed)
+    boats = [boat for boat in fleet if boat.get('ClassId') == race.get('ClassId')]
+    by_yid = {result.get('YID'): result for result in results}
+    rows = [by_yid.get(boat.get('YID'), {}) for boat in boats]
+    codes = [row.get('Finish') if row else 'DNC' for row in rows]
+    scored = score_class(race.get('StartTime'), [row.get('FinishTime') for row in rows],
+                         [boat.get(field) for boat in boats], codes, [row.get('Penalty_ET') for row in rows])
+
+    scored_rows = []
+    for i, boat in enumerate(boats):
+        position = int(scored["position"][i])
+        scored_rows.append({
+            "YID": int(boat['YID']) if (boat.get('YID') or '').isdigit() else boat.get('YID'),
+            "YachtName": boat.get('YachtName') or "",
+            "SailNo": boat.get('SailNo') or "",
+            "FinishTime": rows[i].get('FinishTime') or "",
+            "Finish": (codes[i] or "").upper(),
+            "ElapsedSeconds": _number(scored["elapsed"][i]),
+            "TOT": _number(scored["ratings"][i]),
+            "CorrectedSeconds": _number(scored["corrected"][i]),
+            "PosCls": position or None,
+            "PtsCls": float(scored["points"][i]),
+        })
+    scored_rows.sort(key=lambda row: (row["PosCls"] is None, row["PosCls"] or 0))
+    race_id = race.get('RaceId') or ''
+    return {"RaceId": int(race_id) if race_id.isdigit() else race_id, "ClassId": race.get('ClassId'),
+            "RatingField": field,
+            "results": scored_rows}
+
+
+def score_file_race(path, race_id, wind_speed=None):
+    """Read a race, its class fleet and its Rslt rows from an ORCSC file and score it."""
+    race = None
+    fleet, results = [], []
+    for section, row in iter_orcsc_rows(path, ('Race', 'Fleet', 'Rslt')):
+        if section == 'Race' and row.get('RaceId') == str(race_id):
+            race = row
+        elif section == 'Fleet':
+            fleet.append(row)
+        elif section == 'Rslt' and row.get('RaceId') == str(race_id):
+            results.append(row)
+    if race is None:
+        raise KeyError(f"Race not found: {race_id}")
+    return score_race(race, fleet, results, wind_speed)
+
+
+def read_scoring_rows(path):
+    """
+    Rows needed to score every race of an ORCSC file, read in one pass: class rows by ClassId, race rows,
+    fleet rows and Rslt rows grouped by RaceId.
+    """
+    classes, races, fleet, results = {}, [], [], {}
+    for section, row in iter_orcsc_rows(path, ('Cls', 'Race', 'Fleet', 'Rslt')):
+        if section == 'Cls':
+            classes[row.get('ClassId')] = row
+        elif section == 'Race':
+            races.append(row)
+        elif section == 'Fleet':
+            fleet.append(row)
+        elif section == 'Rslt':
+            results.setdefault(row.get('RaceId'), []).append(row)
+    return classes, races, fleet, results
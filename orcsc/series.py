@@ -0,0 +1,145 @@
+import numpy as np
+
+from orcsc.scoring import score_race, read_scoring_rows
+
+
+def _float(text, default):
+    try:
+        return float(text) if text else default
+    except ValueError:
+        return default
+
+
+class SeriesStandings:
+    """
+    Series standings of one class: a (boats x races) points matrix with race coefficients, discards and
+    RRS A8 tie-breaks. Setting one race's points only replaces that column; standings are recomputed from
+    the matrix with array operations, so no race is re-scored.
+    """
+
+    def __init__(self, yids, race_ids, discards=0, coefficients=None, discardable=None):
+        self.yids = list(yids)
+        self.race_ids = list(race_ids)
+        self.discards = int(discards)
+        self.coefficients = np.asarray(coefficients if coefficients is not None else [1.0] * len(self.race_ids),
+                                       dtype=np.float64)
+        self.discardable = np.asarray(discardable if discardable is not None else [True] * len(self.race_ids),
+                                      dtype=bool)
+        # NaN columns are races without results yet
+        self.points = np.full((len(self.yids), len(self.race_ids)), np.nan)
+        self._boat_index = {yid: i for i, yid in enumerate(self.yids)}
+        self._race_index = {race_id: j for j, race_id in enumerate(self.race_ids)}
+
+    def set_race(self, race_id, points):
+        """Replace the points of a race, as {YID: points}. Boats missing from points keep no score (NaN)."""
+        column = np.full(len(self.yids), np.nan)
+        for yid, value in points.items():
+            if yid in self._boat_index:
+                column[self._boat_index[yid]] = value
+        self.points[:, self._race_index[race_id]] = column
+
+    def clear_race(self, race_id):
+        self.points[:, self._race_index[race_id]] = np.nan
+
+    def compute(self):
+        """
+        Returns (order, position, total, net, discarded) where order lists boat indices from first to last,
+        position is per boat, and discarded is a (boats x races) mask of the excluded scores.
+        """
+        boats, races = self.points.shape
+        sailed = ~np.isnan(self.points).all(axis=0)
+        # A boat without a score in a sailed race is scored as not having started (entries + 1)
+        filled = np.where(np.isnan(self.points), boats + 1, self.points)
+        scores = np.where(sailed, filled * self.coefficients, np.nan)
+
+        # Exclude each boat's worst discardable scores
+        discards = min(self.discards, int((sailed & self.discardable).sum()))
+        discarded = np.zeros(scores.shape, dtype=bool)
+        if discards:
+            candidates = np.where(sailed & self.discardable, scores, -np.inf)
+            worst = np.argsort(-candidates, axis=1, kind='stable')[:, :discards]
+            np.put_along_axis(discarded, worst, True, axis=1)
+
+        total = np.nansum(scores, axis=1)
+        net = np.nansum(np.where(discarded, 0, scores), axis=1)
+
+        # A8.1: counted scores sorted best to worst; A8.2: scores of the last race, then the previous ones
+        counted = np.sort(np.where(discarded | np.isnan(scores), np.inf, scores), axis=1)
+        last_races = np.nan_to_num(scores[:, sailed][:, ::-1], nan=np.inf)
+        keys = [last_races[:, j] for j in range(last_races.shape[1] - 1, -1, -1)]
+        keys += [counted[:, j] for j in range(races - 1, -1, -1)]
+        keys.append(net)
+        order = np.lexsort(keys) if boats else np.array([], dtype=np.intp)
+
+        # Boats still tied on every key share the position
+        stacked = np.column_stack(keys[::-1]) if boats else np.empty((0, len(keys)))
+        ordered = stacked[order]
+        new_place = np.ones(boats, dtype=bool)
+        new_place[1:] = (ordered[1:] != ordered[:-1]).any(axis=1)
+        places = np.maximum.accumulate(np.where(new_place, np.arange(1, boats + 1), 0))
+        position = np.empty(boats, dtype=np.intp)
+        position[order] = places
+        return order, position, total, net, discarded
+
+    def standings(self, boats=None):
+        """Standings rows ordered by position. boats maps YID to extra fields (YachtName, SailNo...)."""
+        order, position, total, net, discarded = self.compute()
+        rows = []
+        for i in order:
+            yid = self.yids[i]
+            rows.append({
+                "YID": yid,
+                **((boats or {}).get(yid) or {}),
+                "races": [{"RaceId": race_id,
+                           "points": None if np.isnan(self.points[i, j]) else float(self.points[i, j]),
+                           "discarded": bool(discarded[i, j])}
+                          for j, race_id in enumerate(self.race_ids)],
+                "total": float(total[i]),
+                "net": float(net[i]),
+                "position": int(position[i]),
+            })
+        return rows
+
+
+def has_finishes(results):
+    return any(row.get('FinishTime') for row in results)
+
+
+def class_series(class_row, races, fleet):
+    """
+    Empty SeriesStandings of a class from its raw Cls row, the raw Race rows of the class and the raw
+    Fleet rows. Returns (standings, boats) with boats mapping YID to name and sail number.
+    """
+    class_id = class_row.get('ClassId')
+    boats = {int(boat['YID']): {"YachtName": boat.get('YachtName') or "", "SailNo": boat.get('SailNo') or ""}
+             for boat in fleet if boat.get('ClassId') == class_id and (boat.get('YID') or '').isdigit()}
+    series = SeriesStandings(
+        boats, [int(race['RaceId']) for race in races],
+        discards=_float(class_row.get('Discards'), 0),
+        coefficients=[_float(race.get('Coeff'), 1.0) for race in races],
+        discardable=[(race.get('Discardable') or 'true').lower() != 'false' for race in races]
+    )
+    return series, boats
+
+
+def read_series(path, class_id, wind_speeds=None):
+    """
+    Build the SeriesStandings of a class from an ORCSC file, scoring every race of the class from its
+    Rslt rows. wind_speeds optionally maps RaceId to the wind speed used for triple number scoring.
+    Races without any finish are left out of the standings until they have results.
+    Reads the file and re-scores every race on each call; for repeated queries on a changing file use
+    ResultsCache.series, which re-scores only the races whose inputs changed.
+    Returns (standings, boats) with boats mapping YID to name and sail number.
+    """
+    classes, races, fleet, results = read_scoring_rows(path)
+    if class_id not in classes:
+        raise KeyError(f"Class not found: {class_id}")
+    races = [race for race in races if race.get('ClassId') == class_id]
+    series, boats = class_series(classes[class_id], races, fleet)
+    for race in races:
+        race_results = results.get(race['RaceId'], [])
+        if not has_finishes(race_results):
+            continue
+        scored = score_race(race, fleet, race_results, (wind_speeds or {}).get(int(race['RaceId'])))
+        series.set_race(int(race['RaceId']), {row["YID"]: row["PtsCls"] for row in scored["results"]})
+    return series, boats
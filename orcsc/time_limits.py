@@ -0,0 +1,210 @@
+import ast
+import operator
+from dataclasses import fields
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from orcsc.model.fleet_row import FleetRow
+from orcsc.scoring import read_scoring_rows
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+_FUNCTIONS = {
+    'min': lambda *args: np.minimum.reduce(np.broadcast_arrays(*args)),
+    'max': lambda *args: np.maximum.reduce(np.broadcast_arrays(*args)),
+    'abs': np.abs,
+    'round': np.round,
+}
+# Race fields available to the formulas, every other name is a FleetRow field
+RACE_VARIABLES = ('Distance',)
+FLEET_VARIABLES = tuple(field.name for field in fields(FleetRow))
+_MAX_SECONDS = timedelta.max.total_seconds()
+
+
+class InvalidFormula(ValueError):
+    pass
+
+
+def compile_formula(formula):
+    """
+    Parse a TimeLimitFormulae expression: the time limit in seconds after the start, from FleetRow rating
+    fields (GPH, APHD, TMF_Offshore...) and the race Distance in miles, e.g. "GPH * Distance * 1.5" or
+    "max(GPH * Distance * 2, 3600)". Only arithmetic and min/max/abs/round are allowed.
+    Returns (expression tree, names of the variables used).
+    """
+    try:
+        tree = ast.parse(formula, mode='eval')
+    except SyntaxError:
+        raise InvalidFormula(f"Invalid time limit formula: {formula}")
+    names = set()
+    # Only the callee of a call is a function name; the same name anywhere else is a variable
+    functions = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id.lower() not in _FUNCTIONS or node.keywords:
+                raise InvalidFormula(f"Unsupported function in time limit formula: {ast.unparse(node.func)}")
+        elif isinstance(node, ast.Name):
+            if id(node) not in functions:
+                names.add(node.id)
+        elif isinstance(node, ast.BinOp) and type(node.op) not in _BINARY_OPERATORS:
+            raise InvalidFormula(f"Unsupported operator in time limit formula: {formula}")
+        elif isinstance(node, ast.UnaryOp) and type(node.op) not in _UNARY_OPERATORS:
+            raise InvalidFormula(f"Unsupported operator in time limit formula: {formula}")
+        elif isinstance(node, ast.Constant) and (isinstance(node.value, bool) or
+                                                 not isinstance(node.value, (int, float))):
+            raise InvalidFormula(f"Unsupported constant in time limit formula: {formula}")
+        elif not isinstance(node, (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Load, ast.operator,
+                                   ast.unaryop)):
+            raise InvalidFormula(f"Unsupported expression in time limit formula: {formula}")
+    unknown = sorted(name for name in names if name not in RACE_VARIABLES and name not in FLEET_VARIABLES)
+    if unknown:
+        raise InvalidFormula(f"Unknown variables in time limit formula: {', '.join(unknown)}")
+    return tree, names
+
+
+def evaluate_formula(tree, variables):
+    """
+    Evaluate a compiled formula on numpy arrays, broadcasting the variables against each other.
+    Raises InvalidFormula if it cannot be evaluated (e.g. a function called without arguments, or an
+    integer constant too large for a float).
+    """
+
+    def visit(node):
+        if isinstance(node, ast.Expression):
+            return visit(node.body)
+        if isinstance(node, ast.Constant):
+            return np.float64(node.value)
+        if isinstance(node, ast.Name):
+            return variables[node.id]
+        if isinstance(node, ast.BinOp):
+            return _BINARY_OPERATORS[type(node.op)](visit(node.left), visit(node.right))
+        if isinstance(node, ast.UnaryOp):
+            return _UNARY_OPERATORS[type(node.op)](visit(node.operand))
+        return _FUNCTIONS[node.func.id.lower()](*[visit(arg) for arg in node.args])
+
+    try:
+        with np.errstate(all='ignore'):
+            return np.asarray(visit(tree), dtype=np.float64)
+    except (KeyError, TypeError, ValueError, OverflowError, ZeroDivisionError) as e:
+        raise InvalidFormula(f"Cannot evaluate time limit formula {ast.unparse(tree)}: {e}")
+
+
+def _float_array(values):
+    out = np.full(len(values), np.nan)
+    for i, value in enumerate(values):
+        try:
+            out[i] = float(value)
+        except (TypeError, ValueError):
+            pass
+    return out
+
+
+def _race_id(race):
+    race_id = race.get('RaceId') or ''
+    return int(race_id) if race_id.isdigit() else race_id
+
+
+def _start_time(text):
+    if not text:
+        return None
+    try:
+        return datetime.fromisoformat(text).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def _seconds(value):
+    # Whole seconds of a limit, None if it is not a number or beyond any representable time
+    if not np.isfinite(value) or abs(value) > _MAX_SECONDS:
+        return None
+    return round(float(value))
+
+
+def _deadline(start, seconds):
+    seconds = _seconds(seconds)
+    if start is None or seconds is None or seconds < 0:
+        return None
+    try:
+        dt = start + timedelta(seconds=seconds)
+    except OverflowError:
+        # Beyond the datetime range: no deadline
+        return None
+    # Same clock and format as StartTime
+    return f"{dt:%Y-%m-%dT%H:%M:%S}.000Z"
+
+
+def class_time_limits(class_row, races, boats, formula=None):
+    """
+    Time limits of every race of a class: the formula is compiled once and evaluated on a
+    (races x boats) grid, races broadcast against boats. The class deadline of a race is the latest
+    boat deadline. formula defaults to the class TimeLimitFormulae.
+    """
+    formula = formula or class_row.get('TimeLimitFormulae')
+    if not formula:
+        return [{"RaceId": _race_id(race), "ClassId": class_row.get('ClassId'), "StartTime": race.get('StartTime'),
+                 "Formula": None, "Deadline": None, "boats": []} for race in races]
+
+    tree, names = compile_formula(formula)
+    variables = {}
+    for name in names:
+        if name in RACE_VARIABLES:
+            variables[name] = _float_array([race.get(name) for race in races])[:, None]
+        else:
+            variables[name] = _float_array([boat.get(name) for boat in boats])[None, :]
+    seconds = np.broadcast_to(evaluate_formula(tree, variables), (len(races), len(boats)))
+
+    rows = []
+    for r, race in enumerate(races):
+        start = _start_time(race.get('StartTime'))
+        boat_limits = []
+        for b, boat in enumerate(boats):
+            boat_limits.append({
+                "YID": int(boat['YID']) if (boat.get('YID') or '').isdigit() else boat.get('YID'),
+                "YachtName": boat.get('YachtName') or "",
+                "SailNo": boat.get('SailNo') or "",
+                "Seconds": _seconds(seconds[r, b]),
+                "Deadline": _deadline(start, seconds[r, b]),
+            })
+        finite = seconds[r][np.isfinite(seconds[r])]
+        rows.append({
+            "RaceId": _race_id(race),
+            "ClassId": class_row.get('ClassId'),
+            "StartTime": race.get('StartTime'),
+            "Formula": formula,
+            "Deadline": _deadline(start, finite.max()) if len(finite) else None,
+            "boats": boat_limits,
+        })
+    return rows
+
+
+def file_time_limits(path, class_id=None, formula=None):
+    """
+    Time limits of every race of an ORCSC file (or of one class), per class from its TimeLimitFormulae
+    unless a formula is given. Raises KeyError if class_id is not in the file.
+    """
+    classes, races, fleet, _ = read_scoring_rows(path)
+    if class_id is not None and class_id not in classes:
+        raise KeyError(f"Class not found: {class_id}")
+    rows = []
+    for cls_id, class_row in classes.items():
+        if class_id is not None and cls_id != class_id:
+            continue
+        class_races = [race for race in races if race.get('ClassId') == cls_id]
+        boats = [boat for boat in fleet if boat.get('ClassId') == cls_id]
+        try:
+            rows += class_time_limits(class_row, class_races, boats, formula)
+        except InvalidFormula as e:
+            if formula:
+                raise
+            # A bad formula of one class does not hide the deadlines of the others
+            rows += [{"RaceId": _race_id(race), "ClassId": cls_id, "StartTime": race.get('StartTime'),
+                      "Formula": class_row.get('TimeLimitFormulae'), "Deadline": None, "boats": [],
+                      "Error": str(e)} for race in class_races]
+    return rows
@@ -0,0 +1,137 @@
+import numpy as np
+
+from courses import ANGLE_LEGS
+from orcsc.scoring import rank
+
+
+def course_weights(store, course):
+    """Normalized weight per store leg for a course composition {leg: weight} (e.g. {'Beat': 0.5, 'Run': 0.5})."""
+    weights = np.zeros(len(store.legs))
+    for leg, weight in course.items():
+        if leg not in store.legs:
+            raise ValueError(f"Unknown leg: {leg}")
+        if leg in ANGLE_LEGS:
+            raise ValueError(f"{leg} is an angle, not a leg allowance")
+        weights[store.legs.index(leg)] = weight
+    if weights.sum() <= 0:
+        raise ValueError("Course composition has no legs")
+    return weights / weights.sum()
+
+
+def course_allowances(store, course):
+    """(boats x wind speeds) time allowance in seconds per mile of every boat on the course."""
+    return np.einsum('l,blw->bw', course_weights(store, course), store.allowances.astype(np.float64))
+
+
+def monotone_allowances(allowances):
+    """
+    Allowance curves made non-increasing with wind speed, so they can be inverted. Certificates are not
+    always strictly monotone (a Beat allowance can rise slightly between 16 and 20 kn); the curve then
+    keeps its lowest value so far.
+    """
+    return np.minimum.accumulate(allowances, axis=1)
+
+
+def _end_segments(curves):
+    # First and last segment of each curve where the allowance falls, used to extrapolate beyond the
+    # certificate wind range (flat end segments would map every faster or slower boat to one wind)
+    falling = curves[:, :-1] > curves[:, 1:]
+    first = falling.argmax(axis=1)
+    last = falling.shape[1] - 1 - falling[:, ::-1].argmax(axis=1)
+    return first, last, falling.any(axis=1)
+
+
+def implied_wind(allowances, wind_speeds, seconds_per_mile):
+    """
+    Wind speed at which each boat's allowance curve equals its elapsed seconds per mile, found for all boats
+    at once by linear interpolation between the certificate wind speeds on the monotone curves. Boats
+    slower than the lightest wind curve or faster than the strongest are extrapolated from the end
+    segments, so they keep their order instead of all tying at the range limits.
+    NaN for boats without a time or a certificate.
+    """
+    wind_speeds = np.asarray(wind_speeds, dtype=np.float64)
+    curves = monotone_allowances(allowances)
+    t = np.asarray(seconds_per_mile, dtype=np.float64)
+    first, last, falling = _end_segments(curves)
+    # Segment containing the time: the last wind speed the boat is slower than its time at
+    inside = np.clip((curves >= t[:, None]).sum(axis=1) - 1, 0, len(wind_speeds) - 2)
+    segment = np.where(t > curves[:, 0], first, np.where(t < curves[:, -1], last, inside))
+    rows = np.arange(len(curves))
+    low, high = curves[rows, segment], curves[rows, segment + 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = np.where(low != high, (low - t) / (low - high), 0.0)
+    wind = wind_speeds[segment] + frac * (wind_speeds[segment + 1] - wind_speeds[segment])
+    invalid = np.isnan(t) | np.isnan(allowances).any(axis=1) | ~falling
+    return np.where(invalid, np.nan, wind)
+
+
+def allowance_at(curve, wind_speeds, wind):
+    """Seconds per mile of one monotone allowance curve at wind speeds, extrapolated like implied_wind."""
+    wind_speeds = np.asarray(wind_speeds, dtype=np.float64)
+    wind = np.asarray(wind, dtype=np.float64)
+    (first,), (last,), _ = _end_segments(curve[None, :])
+
+    def slope(i):
+        return (curve[i + 1] - curve[i]) / (wind_speeds[i + 1] - wind_speeds[i])
+
+    return np.where(wind < wind_speeds[0], curve[first] + (wind - wind_speeds[first]) * slope(first),
+                    np.where(wind > wind_speeds[-1], curve[last] + (wind - wind_speeds[last]) * slope(last),
+                             np.interp(wind, wind_speeds, curve)))
+
+
+def _default_scratch(allowances):
+    # Fastest boat: lowest mean allowance among the boats with a complete curve
+    return int(np.where(np.isnan(allowances).any(axis=1), np.inf, allowances.mean(axis=1)).argmin())
+
+
+def score_pcs(store, elapsed, distance, course, scratch=None):
+    """
+    Performance curve scoring of the boats of a CertificateStore.
+    elapsed are elapsed seconds per boat (NaN if not finished), distance the course length in miles and
+    course the leg composition. Boats are ranked on implied wind; corrected time is the time the scratch
+    boat (index into the store, default the fastest boat) would need at each boat's implied wind.
+    """
+    allowances = course_allowances(store, course)
+    elapsed = np.asarray(elapsed, dtype=np.float64)
+    wind = implied_wind(allowances, store.wind_speeds, elapsed / distance)
+    if scratch is None:
+        scratch = _default_scratch(allowances)
+    scratch_curve = monotone_allowances(allowances[scratch][None, :])[0]
+    corrected = np.rint(allowance_at(scratch_curve, store.wind_speeds, wind) * distance)
+    corrected = np.where(np.isnan(wind), np.nan, corrected)
+    position, points = rank(-wind, len(elapsed))
+    return {
+        "implied_wind": wind,
+        "corrected": corrected,
+        "position": position,
+        "points": points,
+        "scratch": scratch,
+    }
+
+
+def score_tod(store, elapsed, distance, course, wind_speed, scratch=None):
+    """
+    Time on distance scoring at a fixed wind speed: each boat's course allowance (seconds per mile) at
+    wind_speed, interpolated between the certificate wind speeds, is compared with the scratch boat's.
+    Corrected time is elapsed - (allowance - scratch allowance) x distance, so the scratch boat keeps its
+    elapsed time. wind_speed must be within the certificate wind range.
+    """
+    wind_speeds = np.asarray(store.wind_speeds, dtype=np.float64)
+    if not wind_speeds[0] <= wind_speed <= wind_speeds[-1]:
+        raise ValueError(f"Wind speed must be between {wind_speeds[0]:g} and {wind_speeds[-1]:g} knots")
+    allowances = course_allowances(store, course)
+    elapsed = np.asarray(elapsed, dtype=np.float64)
+    if scratch is None:
+        scratch = _default_scratch(allowances)
+    high = int(np.clip(np.searchsorted(wind_speeds, wind_speed), 1, len(wind_speeds) - 1))
+    frac = (wind_speed - wind_speeds[high - 1]) / (wind_speeds[high] - wind_speeds[high - 1])
+    at_wind = allowances[:, high - 1] * (1 - frac) + allowances[:, high] * frac
+    corrected = np.rint(elapsed - (at_wind - at_wind[scratch]) * distance)
+    position, points = rank(corrected, len(elapsed))
+    return {
+        "allowance": at_wind,
+        "corrected": corrected,
+        "position": position,
+        "points": points,
+        "scratch": scratch,
+    }
@@ -0,0 +1,152 @@
+import csv
+import io
+
+import numpy as np
+import xlsxwriter
+
+import orc
+from cert_store import from_certificates
+from orcsc.file_reader import iter_orcsc_rows
+from orcsc.model.scoring_codes_enum import ScoringCode
+from orcsc.scoring import TRIPLE_NUMBER_TYPES, TRIPLE_NUMBER_BANDS
+from utils import create_folder
+
+
+def _time_on_distance_field(field):
+    if field.startswith('TN_'):
+        return 'TND_' + field[len('TN_'):]
+    return {'APHT': 'APHD', 'CTOT': 'CTOD'}.get(field)
+
+
+# Scoring options compared, as rating field -> (time on time field, time on distance field or None).
+# Triple number options have one entry per wind band.
+_BANDS = [name for _, name in TRIPLE_NUMBER_BANDS] + ['High']
+SCORING_OPTIONS = {
+    field: (field, _time_on_distance_field(field))
+    for field in dict.fromkeys([code.value for code in ScoringCode]
+                               + [f"{kind}_{band}" for kind in TRIPLE_NUMBER_TYPES for band in _BANDS])
+}
+UNITS = ('hour', 'mile')
+BOAT_COLUMNS = ('YID', 'RefNo', 'SailNo', 'YachtName')
+
+
+def _float_column(values):
+    out = np.full(len(values), np.nan)
+    for i, value in enumerate(values):
+        try:
+            out[i] = float(value)
+        except (TypeError, ValueError):
+            pass
+    return out
+
+
+def ratings_from_fleet(fleet):
+    """(boats, {field: ratings array}) of raw Fleet rows of an ORCSC file; missing ratings are NaN."""
+    boats = [{column: row.get(column) or "" for column in BOAT_COLUMNS} for row in fleet]
+    for boat in boats:
+        if boat['YID'].isdigit():
+            boat['YID'] = int(boat['YID'])
+    fields = {field for option in SCORING_OPTIONS.values() for field in option if field}
+    return boats, {field: _float_column([row.get(field) for row in fleet]) for field in fields}
+
+
+def ratings_from_store(store):
+    """(boats, {field: ratings array}) of a CertificateStore."""
+    boats = [{column: str(store[column][i]) if column in store else "" for column in BOAT_COLUMNS}
+             for i in range(len(store))]
+    fields = {field for option in SCORING_OPTIONS.values() for field in option if field}
+    ratings = {field: np.asarray(store[field], dtype=np.float64) if field in store else np.full(len(store), np.nan)
+               for field in fields}
+    return boats, ratings
+
+
+def allowance_matrix(ratings, option, unit='hour'):
+    """
+    (boats x boats) time allowance the row boat gives the column boat under a scoring option:
+    seconds per hour of the row boat's elapsed time (time on time) or seconds per mile (time on distance,
+    None if the option has no time on distance rating). NaN where a boat has no rating.
+    """
+    tot_field, tod_field = SCORING_OPTIONS[option]
+    if unit == 'hour':
+        tot = ratings[tot_field]
+        tot = np.where(tot > 0, tot, np.nan)
+        return 3600.0 * (tot[:, None] / tot[None, :] - 1.0)
+    if unit == 'mile':
+        if tod_field is None:
+            return None
+        tod = np.where(ratings[tod_field] > 0, ratings[tod_field], np.nan)
+        return tod[None, :] - tod[:, None]
+    raise ValueError(f"Unknown unit: {unit}")
+
+
+def allowance_matrices(ratings, options=None, units=UNITS):
+    """{(option, unit): matrix} for every requested scoring option and unit that applies to it."""
+    options = list(options) if options else list(SCORING_OPTIONS)
+    unknown = [option for option in options if option not in SCORING_OPTIONS]
+    if unknown:
+        raise ValueError(f"Unknown scoring options: {', '.join(unknown)}")
+    matrices = {}
+    for option in options:
+        for unit in units:
+            matrix = allowance_matrix(ratings, option, unit)
+            if matrix is not None:
+                matrices[option, unit] = matrix
+    return matrices
+
+
+def _rows(matrix, decimals=1):
+    # Rounded values with None for missing ratings
+    values = np.round(matrix, decimals).astype(object)
+    values[np.isnan(matrix)] = None
+    return values.tolist()
+
+
+def _label(boat):
+    return boat.get('SailNo') or boat.get('YachtName') or boat.get('RefNo') or str(boat.get('YID'))
+
+
+def matrices_json(boats, matrices):
+    return {
+        "boats": boats,
+        "matrices": [{"option": option, "unit": unit, "values": _rows(matrix)}
+                     for (option, unit), matrix in matrices.items()],
+    }
+
+
+def matrices_csv(boats, matrices):
+    """One block per matrix: a title line, a header line with the column boats, then one line per boat."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    labels = [_label(boat) for boat in boats]
+    for (option, unit), matrix in matrices.items():
+        writer.writerow([f"{option} (seconds per {unit})"])
+        writer.writerow([""] + labels)
+        writer.writerows([label] + row for label, row in zip(labels, _rows(matrix)))
+        writer.writerow([])
+    return out.getvalue()
+
+
+def write_matrices_xlsx(boats, matrices, output):
+    """Write one worksheet per matrix to output (a path or a file object)."""
+    workbook = xlsxwriter.Workbook(output, {'in_memory': True, 'nan_inf_to_errors': True})
+    bold = workbook.add_format({'bold': True})
+    labels = [_label(boat) for boat in boats]
+    for (option, unit), matrix in matrices.items():
+        worksheet = workbook.add_worksheet(f"{option} {unit}"[:31])
+        worksheet.write_row(0, 1, labels, bold)
+        worksheet.write_column(1, 0, labels, bold)
+        for i, row in enumerate(_rows(matrix)):
+            worksheet.write_row(i + 1, 1, row)
+        worksheet.freeze_panes(1, 1)
+    workbook.close()
+
+
+def export_rating_matrix(source, output):
+    """Export the matrices of the fleet of an .orcsc file or of the certificates of a .json file to XLSX."""
+    if source.endswith('.orcsc'):
+        boats, ratings = ratings_from_fleet([row for _, row in iter_orcsc_rows(source, ('Fleet',))])
+    else:
+        boats, ratings = ratings_from_store(from_certificates(orc.load_json_files([source])))
+    create_folder(output)
+    write_matrices_xlsx(boats, allowance_matrices(ratings), output)
+    print(f"Rating matrix saved: {output} ({len(boats)} boats)")
@@ -4,13 +4,15 @@ import xlsxwriter
 
 import orc
 import settings
-from settings import L1_dist_interval, L1_min_dist, L1_max_dist, selected_boats, classes, course_types, \
+from cert_store import from_certificates
+from courses import load_courses
+from settings import L1_dist_interval, L1_min_dist, L1_max_dist, selected_boats, classes, \
     target_time, target_time_margin, target_time_allowance
 from utils import create_folder, is_int
 from prompt_toolkit import print_formatted_text, HTML
 
 
-def generate_boat_sheet(workbook, wind_speeds, boat_rows, name):
+def generate_boat_sheet(workbook, wind_speeds, boat_rows, name, course_types):
     global row, c, idx
     worksheet = workbook.add_worksheet(name)
     worksheet.write(0, 0, name)
@@ -57,7 +59,7 @@ def generate_boat_sheet(workbook, wind_speeds, boat_rows, name):
     worksheet.fit_to_pages(1, 1)
 
 
-def generate_ranking_sheet(workbook, wind_speeds, boats_number, lengths):
+def generate_ranking_sheet(workbook, wind_speeds, boats_number, lengths, course_types):
     worksheet = workbook.add_worksheet('_Ranking')
     cell_formats = {}
     for name, color in classes.items():
@@ -91,41 +93,45 @@ def generate_ranking_sheet(workbook, wind_speeds, boats_number, lengths):
     worksheet.fit_to_pages(1, 1)
 
 
-def generate_target_time_file(filename, jsons=[], countries=[], path=f'jsons/'):
+def generate_target_time_file(filename, jsons=[], countries=[], path=f'jsons/', courses=None):
     if len(countries) > 0:
         for file in os.scandir(path):
             for country in countries:
                 if file.is_file() and country in file.name:
                     jsons.append(file)
 
-    rms = orc.load_json_files(jsons)
+    # Only the fields needed for the tables, and only the selected boats, are kept in memory
+    rms = [boat for boat in orc.iter_json_files(jsons, fields=('YachtName', 'Allowances'))
+           if len(selected_boats) == 0 or boat['YachtName'] in selected_boats]
+    courses = courses or load_courses()
+    course_types = courses.names
+    store = from_certificates(rms)
+    # (courses x boats x wind speeds) seconds per mile of L1, for all boats and courses at once, on the
+    # store's wind speed grid (certificates with other wind speeds are interpolated onto it)
+    seconds_per_l1 = courses.seconds_per_l1(store.allowances)
     course_lengths = {}
     create_folder(filename)
     workbook = xlsxwriter.Workbook(filename)
-    wind_speeds = rms[0]['Allowances']['WindSpeeds']
+    wind_speeds = [int(spd) for spd in store.wind_speeds]
 
     boats_rows = {}
-    for boat in rms:
-        allowances = boat['Allowances']
+    for b, boat in enumerate(rms):
         boat_name = boat['YachtName']
         boats_rows[boat_name] = []
         if boat_name not in selected_boats.keys() and len(selected_boats) != 0:
             continue  # Skip if boat not selected and selected_boats list is not empty
         course_lengths[boat_name] = {}
 
-        for course in course_types:
-            course_rows = [[course] + [' ' for x in range(len(allowances['WindSpeeds']))]]
+        for c, course in enumerate(course_types):
+            course_rows = [[course] + [' ' for x in range(len(wind_speeds))]]
             course_lengths[boat_name][course] = {}
-            course_rows.append(['L1'] + ([str(x) for x in allowances['WindSpeeds']]))
+            course_rows.append(['L1'] + ([str(x) for x in wind_speeds]))
             lengths = [x * L1_dist_interval for x in
                        range(int(L1_min_dist * (1 / L1_dist_interval)), int(1 / L1_dist_interval * L1_max_dist + 1))]
             for length in lengths:
                 distances = [f'{length:.1f}']
-                for idx, spd in enumerate(allowances['WindSpeeds']):
-                    spd = int(spd)
-                    total_time = 0
-                    for leg in course_types[course]:
-                        total_time += length * course_types[course][leg] * allowances[leg][idx]
+                for idx, spd in enumerate(wind_speeds):
+                    total_time = length * seconds_per_l1[c, b, idx]
                     total_time *= 1 + target_time_allowance  # Add Allowance % for target time
                     distances.append(f'{total_time / 60:.0f}')
                     course_lengths[boat_name][course][spd] = total_time / 60
@@ -139,17 +145,17 @@ def generate_target_time_file(filename, jsons=[], countries=[], path=f'jsons/'):
     sorted_lengths = {}
     for c in course_types:
         sorted_lengths[c] = {}
-        for s in rms[1]['Allowances']['WindSpeeds']:
+        for s in wind_speeds:
             sorted_lengths[c][s] = []
             for boat in course_lengths:
                 sorted_lengths[c][s].append((boat, course_lengths[boat][c][s]))
             sorted_lengths[c][s] = sorted(sorted_lengths[c][s], key=lambda k: k[1])
             boats_number = len(course_lengths)
 
-    generate_ranking_sheet(workbook, wind_speeds, boats_number, sorted_lengths)
+    generate_ranking_sheet(workbook, wind_speeds, boats_number, sorted_lengths, course_types)
     for boat in selected_boats.keys():
         if boat in boats_rows:
-            generate_boat_sheet(workbook, wind_speeds, boats_rows[boat], boat)
+            generate_boat_sheet(workbook, wind_speeds, boats_rows[boat], boat, course_types)
         else:
             print_formatted_text(
                 HTML('<ansired>' + f'{boat} not found in json files' + '</ansired>'))
@@ -0,0 +1,56 @@
+import importlib
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import orc
+from cert_store import from_certificates
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+SAMPLE_ORCSC = REPO_DIR / 'orcsc' / 'testout.orcsc'
+TEMPLATE_ORCSC = REPO_DIR / 'orcsc' / 'templates' / 'template.orcsc'
+ORC_JSON = REPO_DIR / 'ISR_ORC.json'
+NS_JSON = REPO_DIR / 'ISR_NS.json'
+# Copy of SAMPLE_ORCSC in the output directory of the api_module fixture
+FILE = 'sample.orcsc'
+
+
+@pytest.fixture(scope='session')
+def orc_certificates():
+    return list(orc.iter_json_files([ORC_JSON]))
+
+
+@pytest.fixture(scope='session')
+def orc_store(orc_certificates):
+    return from_certificates(orc_certificates)
+
+
+@pytest.fixture(scope='module')
+def api_module(tmp_path_factory):
+    # api resolves its directories relative to the working directory when it is imported
+    root = tmp_path_factory.mktemp('api')
+    os.makedirs(root / 'orcsc' / 'output')
+    os.makedirs(root / 'jsons')
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(root)
+        mp.setenv('CATALOG_POLL_INTERVAL', '0')
+        mp.setenv('CERTS_DIR', str(root / 'jsons'))
+        mp.setenv('CERTS_INDEX_PATH', str(root / 'certs_index.db'))
+        mp.setenv('CERTS_STORE_PATH', str(root / 'certs_store'))
+        mp.setenv('ORCDB_CACHE_DIR', str(root / 'orcdb_cache'))
+        mp.setenv('COURSES_PATH', str(root / 'courses.json'))
+        sys.modules.pop('api', None)
+        module = importlib.import_module('api')
+        yield module
+        sys.modules.pop('api', None)
+
+
+@pytest.fixture
+def client(api_module):
+    shutil.copy(SAMPLE_ORCSC, os.path.join(api_module.OUTPUT_DIR, FILE))
+    with TestClient(api_module.app) as client:
+        yield client
@@ -0,0 +1,346 @@
+import asyncio
+import json
+import os
+import re
+import shutil
+
+import pytest
+
+from tests.conftest import FILE, ORC_JSON, SAMPLE_ORCSC
+from tests.test_file_events import rename_boat
+
+
+def test_fleet_is_paginated_filtered_and_projected(client):
+    data = client.get(f'/api/files/get/{FILE}').json()
+    assert data['fleet_total'] == len(data['fleet']) == 39
+    assert {race['RaceId'] for race in data['races']} == {2, 3, 4, 5, 6, 7, 8}
+
+    fields = {'class_id': 'Z', 'fields': 'YID, YachtName,CTOT'}
+    whole = client.get(f'/api/files/get/{FILE}', params=fields).json()['fleet']
+    page = client.get(f'/api/files/get/{FILE}', params={**fields, 'offset': 30, 'limit': 5}).json()
+    assert page['fleet_total'] == len(whole) == 32
+    assert page['fleet'] == whole[30:]
+    assert set(whole[0]) == {'YID', 'YachtName', 'CTOT'}
+    assert isinstance(whole[0]['YID'], int) and isinstance(whole[0]['CTOT'], float)
+
+@pytest.mark.parametrize('params', [{'fields': 'YID,Nope'}, {'limit': 0}, {'offset': -1}])
+def test_invalid_fleet_queries_are_rejected(client, params):
+    assert client.get(f'/api/files/get/{FILE}', params=params).status_code in (400, 422)
+
+
+def ndjson(response):
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_stream_matches_the_parsed_file(client):
+    data = client.get(f'/api/files/get/{FILE}').json()
+    lines = ndjson(client.get(f'/api/files/stream/{FILE}'))
+    by_type = {}
+    for line in lines:
+        by_type.setdefault(line['type'], []).append(line['data'])
+    assert by_type == {'event': [data['event']], 'class': data['classes'], 'race': data['races'],
+                       'boat': data['fleet']}
+
+    lines = ndjson(client.get(f'/api/files/stream/{FILE}', params={'class_id': 'O2', 'fields': 'YID,GPH'}))
+    boats = [line['data'] for line in lines if line['type'] == 'boat']
+    assert boats == client.get(f'/api/files/get/{FILE}', params={'class_id': 'O2', 'fields': 'YID,GPH'}).json()['fleet']
+    assert len(boats) == 3
+
+
+def test_stream_errors(client, api_module):
+    assert client.get('/api/files/stream/missing.orcsc').status_code == 404
+    assert client.get(f'/api/files/stream/{FILE}', params={'fields': 'Nope'}).status_code == 400
+    with open(os.path.join(api_module.OUTPUT_DIR, 'broken.orcsc'), 'wb') as f:
+        f.write(SAMPLE_ORCSC.read_bytes()[:5000])
+    assert ndjson(client.get('/api/files/stream/broken.orcsc'))[-1] == {'type': 'error', 'data': 'Invalid file format'}
+    os.remove(os.path.join(api_module.OUTPUT_DIR, 'broken.orcsc'))
+
+
+def test_file_list_as_ndjson(client):
+    files = client.get('/api/files').json()['files']
+    assert FILE in [info['name'] for info in files]
+    assert ndjson(client.get('/api/files', params={'format': 'ndjson'})) == files
+
+
+@pytest.mark.parametrize('accept, encoding', [('gzip, br;q=0', 'gzip'), ('gzip;q=0', None), ('identity', None)])
+def test_download_is_precompressed_when_accepted(client, accept, encoding):
+    response = client.get(f'/api/files/download/{FILE}', headers={'Accept-Encoding': accept})
+    assert response.status_code == 200
+    assert response.headers.get('content-encoding') == encoding
+    assert 'Accept-Encoding' in response.headers['vary']
+    assert response.content == SAMPLE_ORCSC.read_bytes()
+
+
+def test_json_responses_are_compressed_but_streams_are_not(client):
+    headers = {'Accept-Encoding': 'gzip'}
+    assert client.get(f'/api/files/get/{FILE}', headers=headers).headers.get('content-encoding') == 'gzip'
+    assert 'content-encoding' not in client.get(f'/api/files/stream/{FILE}', headers=headers).headers
+    assert 'content-encoding' not in client.get('/api/files', params={'format': 'ndjson'}, headers=headers).headers
+    assert 'content-encoding' not in client.get(f'/api/files/get/{FILE}', headers={'Accept-Encoding': 'gzip;q=0'}).headers
+
+
+def etag(client):
+    response = client.get(f'/api/files/get/{FILE}')
+    assert response.status_code == 200
+    assert response.headers['etag'] == f'"{response.json()["version"]}"'
+    return response.headers['etag']
+
+
+def add_race(client, headers=None, name='R'):
+    race = {'RaceName': name, 'ClassId': 'O1', 'StartTime': '2024-06-01T11:00:00.000Z', 'ScoringType': 'CTOT'}
+    return client.post(f'/api/files/{FILE}/races', json={'races': [race]}, headers=headers or {})
+
+
+def test_write_with_current_etag_returns_the_new_version(client):
+    before = etag(client)
+    response = add_race(client, {'If-Match': before})
+    assert response.status_code == 200
+    after = etag(client)
+    assert after == f'"{response.json()["version"]}"' != before
+
+
+def test_stale_if_match_is_rejected(client, api_module):
+    stale = etag(client)
+    assert add_race(client).status_code == 200
+    content = open(os.path.join(api_module.OUTPUT_DIR, FILE), 'rb').read()
+    assert add_race(client, {'If-Match': stale}).status_code == 412
+    assert open(os.path.join(api_module.OUTPUT_DIR, FILE), 'rb').read() == content
+    assert add_race(client, {'If-Match': f'W/"0", {etag(client)}'}).status_code == 200
+    assert add_race(client, {'If-Match': '*'}).status_code == 200
+
+
+def test_etag_follows_writes_of_other_workers(client, api_module):
+    # Another worker (or process) writing the file changes its ETag in this one too
+    before = etag(client)
+    path = os.path.join(api_module.OUTPUT_DIR, FILE)
+    with open(path, 'rb') as f:
+        content = f.read()
+    with open(path, 'wb') as f:
+        f.write(content.replace(b'Dakar Memorial', b'Dakar Memorial 2'))
+    assert add_race(client, {'If-Match': before}).status_code == 412
+    assert add_race(client, {'If-Match': etag(client)}).status_code == 200
+
+
+def test_split_preview_ignores_if_match(client):
+    split = {'rating': 'CDL', 'class_ids': ['A', 'B']}
+    response = client.post(f'/api/files/{FILE}/classes/split', json=split, headers={'If-Match': '"0"'})
+    assert response.status_code == 200
+    assert response.json()['applied'] is False
+    assert f'"{response.json()["version"]}"' == etag(client)
+    split['apply'] = True
+    response = client.post(f'/api/files/{FILE}/classes/split', json=split, headers={'If-Match': '"0"'})
+    assert response.status_code == 412
+    response = client.post(f'/api/files/{FILE}/classes/split', json=split, headers={'If-Match': etag(client)})
+    assert response.status_code == 200
+    assert f'"{response.json()["version"]}"' == etag(client)
+    fleet = client.get(f'/api/files/get/{FILE}').json()['fleet']
+    assert {boat['ClassId'] for boat in fleet if boat['YID'] in (23, 24)} <= {'A', 'B'}
+
+
+def test_events_stream(client, api_module):
+    assert client.get('/api/events', params={'file': 'missing.orcsc'}).status_code == 404
+    path = os.path.join(api_module.OUTPUT_DIR, FILE)
+
+    async def run():
+        requests, chunks = asyncio.Queue(), asyncio.Queue()
+        await requests.put({'type': 'http.request', 'body': b'', 'more_body': False})
+
+        async def send(message):
+            if message['type'] == 'http.response.body':
+                await chunks.put(message.get('body', b''))
+        scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                 'scheme': 'http', 'path': '/api/events', 'raw_path': b'/api/events',
+                 'query_string': f'file={FILE}'.encode(), 'headers': [], 'client': ('test', 1), 'server': ('test', 80)}
+        app = asyncio.create_task(api_module.app(scope, requests.get, send))
+
+        async def next_event():
+            data = b''
+            while b'\n\n' not in data:
+                data += await asyncio.wait_for(chunks.get(), 5)
+            lines = data.decode().split('\n')
+            return lines[0][len('event: '):], json.loads(lines[1][len('data: '):])
+        name, hello = await next_event()
+        assert (name, hello['file']) == ('hello', FILE)
+        rename_boat(path, 'Peter pan', 'Wendy')
+        api_module.publish_file_change(path)
+        name, change = await next_event()
+        assert name == 'change' and change['version'] != hello['version']
+        assert [boat['YachtName'] for boat in change['changes']['fleet']['updated']] == ['Wendy']
+        await requests.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(app, 5)
+        assert api_module.file_events._subscribers == {}
+    asyncio.run(run())
+
+
+def test_history_diff(client):
+    # Backups are taken after each write
+    assert add_race(client).status_code == 200
+    assert add_race(client, name='S').status_code == 200
+    latest, previous = [b['filename'] for b in client.get(f'/api/files/{FILE}/history').json()['backups'][:2]]
+    response = client.get(f'/api/files/{FILE}/history/diff', params={'from': previous, 'to': latest})
+    assert response.status_code == 200
+    changes = response.json()['changes']
+    assert [race['RaceName'] for race in changes['races']['added']] == ['S']
+    assert changes['fleet'] == {'added': [], 'removed': [], 'updated': []}
+    reverse = client.get(f'/api/files/{FILE}/history/diff', params={'from': 'current', 'to': previous}).json()
+    assert reverse['changes']['races']['removed'] == [changes['races']['added'][0]['RaceId']]
+    assert client.get(f'/api/files/{FILE}/history/diff', params={'from': 'nope.orcsc'}).status_code == 404
+
+
+def test_upload_is_validated_before_it_reaches_the_output_directory(client, api_module, monkeypatch):
+    files = set(os.listdir(api_module.OUTPUT_DIR))
+    response = client.post('/api/files/upload', files={'file': ('bad.orcsc', b'<ROOT><Event>', 'application/xml')})
+    assert response.status_code == 400
+    monkeypatch.setattr(api_module, 'MAX_UPLOAD_FILE_SIZE', 1000)
+    response = client.post('/api/files/upload', files={'file': ('big.orcsc', SAMPLE_ORCSC.read_bytes())})
+    assert response.status_code == 413
+    assert set(os.listdir(api_module.OUTPUT_DIR)) == files
+    monkeypatch.undo()
+    response = client.post('/api/files/upload', files={'file': ('good.orcsc', SAMPLE_ORCSC.read_bytes())})
+    assert response.status_code == 200
+    assert os.path.exists(os.path.join(api_module.OUTPUT_DIR, response.json()['filename']))
+    assert os.listdir(api_module.STAGING_DIR) == []
+
+
+def test_series_scores_triple_number_races_on_the_given_wind_speeds(client, api_module):
+    path = os.path.join(api_module.OUTPUT_DIR, FILE)
+    with open(path, 'rb') as f:
+        content = f.read()
+    with open(path, 'wb') as f:
+        f.write(content.replace(b'<ScoringType>TMF_Offshore</ScoringType>', b'<ScoringType>TN_Inshore</ScoringType>', 1))
+    csv = b'YID,FinishTime\n24,2024-05-31T13:00:00\n25,2024-05-31T12:30:00\n'
+    assert client.post(f'/api/files/{FILE}/races/2/finishes', files={'file': ('finishes.csv', csv)}).status_code == 200
+
+    series = f'/api/files/{FILE}/classes/O1/series'
+    response = client.get(series)
+    assert response.status_code == 400 and response.json()['detail'].startswith('Race 2:')
+    assert client.get(series, params={'wind_speeds': '2:x'}).status_code == 400
+    assert client.get(series, params={'wind_speeds': '2:-1'}).status_code == 400
+    response = client.get(series, params={'wind_speeds': '2:10'})
+    assert response.status_code == 200
+    standings = response.json()['standings']
+    assert [row['races'][0]['points'] for row in standings if row['YID'] in (26, 27)] == [5.0, 5.0]
+
+
+def test_finish_import_scores_the_race(client, api_module):
+    csv = b'YID,FinishTime\n1,2024-05-31T13:00:00\n2,2024-05-31T13:00:00\n3,2024-05-31T12:30:00\n'
+    response = client.post(f'/api/files/{FILE}/races/8/finishes', files={'file': ('finishes.csv', csv)},
+                           headers={'If-Match': etag(client)})
+    assert response.status_code == 200
+    assert response.json()['written'] == 3 and response.json()['scoring_error'] is None
+    results = {row['YID']: row for row in response.json()['results']['results']}
+    assert results[3]['PosCls'] == 1
+    assert results[1]['PosCls'] == results[2]['PosCls'] == 2
+    assert results[1]['PtsCls'] == 2.5
+
+    # All or nothing
+    content = open(os.path.join(api_module.OUTPUT_DIR, FILE), 'rb').read()
+    response = client.post(f'/api/files/{FILE}/races/8/finishes',
+                           files={'file': ('finishes.csv', b'YID,FinishTime\n4,13:00:00\n24,13:00:00\n')})
+    assert response.status_code == 400
+    assert response.json()['detail']['errors'][0]['record'] == 2
+    assert open(os.path.join(api_module.OUTPUT_DIR, FILE), 'rb').read() == content
+    assert client.post(f'/api/files/{FILE}/races/99/finishes', files={'file': ('f.csv', csv)}).status_code == 404
+    assert client.post(f'/api/files/{FILE}/races/8/finishes', files={'file': ('f.txt', csv)}).status_code == 400
+
+
+def test_finishes_are_saved_when_the_race_cannot_be_scored(client, api_module):
+    path = os.path.join(api_module.OUTPUT_DIR, FILE)
+    with open(path, 'rb') as f:
+        content = f.read()
+    with open(path, 'wb') as f:
+        f.write(content.replace(b'<ScoringType>TMF_Offshore</ScoringType>', b'<ScoringType>TN_Inshore</ScoringType>', 1))
+    csv = b'SailNo,FinishTime\nISR 40,13:00:00\n'
+    response = client.post(f'/api/files/{FILE}/races/2/finishes', files={'file': ('finishes.csv', csv)})
+    assert response.status_code == 200
+    assert response.json()['results'] is None and 'Wind speed' in response.json()['scoring_error']
+    response = client.post(f'/api/files/{FILE}/races/2/finishes', files={'file': ('finishes.csv', csv)},
+                           params={'wind_speed': 10})
+    assert response.json()['results']['RatingField'] == 'TN_Inshore_Medium'
+
+
+def test_live_finishes_stream(client, api_module, monkeypatch):
+    monkeypatch.setattr(api_module, 'FINISH_BATCH_SIZE', 2)
+    lines = [{'YID': 1, 'FinishTime': '13:00:00'}, {'YID': 2, 'FinishTime': '12:30:00'}, 'not json',
+             {'YID': 99, 'FinishTime': '13:00:00'}, {'YID': 3, 'Finish': 'DNF'}]
+    body = '\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines).encode()
+    url = f'/api/files/{FILE}/races/8/finishes/stream'
+    assert client.post(url, content=body, headers={'If-Match': '"0"'}).status_code == 412
+    response = client.post(url, content=body, headers={'If-Match': etag(client)})
+    assert response.status_code == 200
+    data = response.json()
+    assert (data['written'], data['batches']) == (3, 2)
+    assert [rejected['record'] for rejected in data['rejected']] == [3, 4]
+    assert f'"{data["version"]}"' == etag(client)
+    results = {row['YID']: row for row in client.get(f'/api/files/{FILE}/races/8/results').json()['results']}
+    assert (results[2]['PosCls'], results[1]['PosCls'], results[3]['Finish']) == (1, 2, 'DNF')
+
+
+def test_fleet_rating_matrix(client):
+    url = f'/api/files/{FILE}/rating-matrix'
+    data = client.get(url, params={'class_id': 'O1', 'options': 'APHT', 'unit': 'mile'}).json()
+    assert [boat['YID'] for boat in data['boats']] == [24, 25, 26, 27]
+    [matrix] = data['matrices']
+    assert (matrix['option'], matrix['unit']) == ('APHT', 'mile')
+    values = matrix['values']
+    assert all(values[i][j] == -values[j][i] for i in range(4) for j in range(4))
+    assert len(client.get(url, params={'class_id': 'O1', 'options': 'APHT,CTOT'}).json()['matrices']) == 4
+    csv = client.get(url, params={'class_id': 'O1', 'options': 'APHT', 'format': 'csv'})
+    assert csv.headers['content-type'].startswith('text/csv')
+    assert csv.text.startswith('APHT (seconds per hour)')
+    assert client.get(url, params={'options': 'Nope'}).status_code == 400
+    assert client.get(url, params={'unit': 'knot'}).status_code == 400
+    assert client.get(url, params={'format': 'pdf'}).status_code == 400
+    response = client.post('/api/certificates/rating-matrix', json={'ref_nos': ['NOPE']})
+    assert response.status_code == 404
+
+
+def test_course_plan(client, api_module, orc_certificates):
+    url = f'/api/files/{FILE}/course-plan'
+    assert client.get(url, params={'wind_speed': 10}).status_code == 404
+    assert client.get(url, params={'wind_speed': 10, 'target_min': 60, 'target_max': 50}).status_code == 400
+
+    # Boats 24-27 (class O1) get certificates of the index
+    shutil.copy(ORC_JSON, os.path.join(api_module.CERTS_DIR, ORC_JSON.name))
+    api_module.update_certificate_index()
+    path = os.path.join(api_module.OUTPUT_DIR, FILE)
+    with open(path, encoding='utf-8') as f:
+        content = f.read()
+    for yid, certificate in zip(range(24, 28), orc_certificates):
+        content = re.sub(rf'<RefNo>[^<]*</RefNo>((?:(?!</ROW>).)*<YID>{yid}</YID>)',
+                         rf'<RefNo>{certificate["RefNo"]}</RefNo>\g<1>', content, count=1, flags=re.S)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+    response = client.get(url, params={'wind_speed': 10, 'class_id': 'O1', 'target_min': 50, 'target_max': 70})
+    assert response.status_code == 200
+    data = response.json()
+    assert data['missing'] == []
+    assert data['courses'] and all(course['min_l1'] <= course['max_l1'] for course in data['courses'] if course['feasible'])
+    assert {course['fastest']['YID'] for course in data['courses']} <= {24, 25, 26, 27}
+    assert client.get(url, params={'wind_speed': 30, 'class_id': 'O1'}).status_code == 400
+
+
+def test_courses_are_shared_through_the_file(client, api_module):
+    response = client.put('/api/courses', json={'WL': {'Beat': 1, 'Run': 1}})
+    assert response.status_code == 200
+    assert client.get('/api/courses').json()['courses'] == {'WL': {'Beat': 1.0, 'Run': 1.0}}
+    assert client.put('/api/courses', json={'WL': {'Beat': -1}}).status_code == 400
+    # Replaced by another worker
+    with open(api_module.COURSES_PATH, 'w') as f:
+        json.dump({'Reach': {'TWA100': 2}}, f)
+    data = client.get('/api/courses').json()
+    assert data['courses'] == {'Reach': {'TWA100': 2.0}}
+    assert 'BeatAngle' not in data['legs'] and 'R90' in data['legs']
+    os.remove(api_module.COURSES_PATH)
+
+
+@pytest.mark.parametrize('formula, status', [('GPH * Distance * 1.5', 200), ('GPH * 1e300', 200),
+                                             ('1' + '0' * 400 + ' * GPH', 400), ('min(GPH, 3600) + min', 400)])
+def test_time_limit_formulas(client, formula, status):
+    response = client.get(f'/api/files/{FILE}/time-limits', params={'class_id': 'O1', 'formula': formula})
+    assert response.status_code == status
+    if status == 200:
+        assert [row['RaceId'] for row in response.json()['races']] == [2]
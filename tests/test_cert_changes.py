@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from cert_changes import detect_changes, diff_snapshots, load_snapshot
+
+
+def cert(ref_no, bin, gph=600.0, c_type='CLUB', family='ORC'):
+    return {'RefNo': ref_no, 'BIN': bin, 'SailNo': bin, 'YachtName': f'Boat {bin}', 'Family': family,
+            'C_Type': c_type, 'NatAuth': 'ISR', 'IssueDate': '2024-01-01', 'GPH': gph}
+
+
+@pytest.fixture
+def feed(tmp_path):
+    certs_dir = tmp_path / 'jsons'
+    certs_dir.mkdir()
+
+    def detect(certs):
+        (certs_dir / 'ISR_ORC.json').write_text(json.dumps({'rms': certs}), encoding='utf-8')
+        return detect_changes(str(certs_dir), str(tmp_path / 'snapshot.json'), str(tmp_path / 'changes'))
+    return detect
+
+
+def test_first_run_reports_every_certificate_as_new(feed, tmp_path):
+    changes = feed([cert('R1', 'B1'), cert('R2', 'B2')])
+    assert changes['initial']
+    assert [c['key'] for c in changes['new']] == ['R1', 'R2']
+    assert changes['affected'] == ['R1', 'R2']
+    assert set(load_snapshot(str(tmp_path / 'snapshot.json'))) == {'R1', 'R2'}
+    assert len(list((tmp_path / 'changes').iterdir())) == 1
+
+
+def test_unchanged_certificates_give_an_empty_feed(feed):
+    feed([cert('R1', 'B1')])
+    changes = feed([cert('R1', 'B1')])
+    assert not changes['initial']
+    assert changes['new'] == changes['removed'] == changes['rerated'] == changes['affected'] == []
+
+
+def test_rerated_in_place_lists_the_changed_fields(feed):
+    feed([cert('R1', 'B1'), cert('R2', 'B2')])
+    changes = feed([cert('R1', 'B1', gph=610.0), cert('R2', 'B2')])
+    assert [(c['key'], c['previous_RefNo'], c['changed_fields']) for c in changes['rerated']] == \
+        [('R1', 'R1', ['GPH'])]
+    assert changes['affected'] == ['R1']
+
+
+def test_reissued_certificate_is_paired_with_the_previous_refno(feed):
+    feed([cert('R1', 'B1'), cert('R2', 'B2')])
+    changes = feed([cert('R3', 'B1', gph=590.0), cert('R2', 'B2')])
+    assert changes['new'] == changes['removed'] == []
+    assert [(c['key'], c['previous_RefNo'], c['changed_fields']) for c in changes['rerated']] == \
+        [('R3', 'R1', ['GPH', 'RefNo'])]
+    assert changes['affected'] == ['R1', 'R3']
+
+
+def test_new_removed_and_ambiguous_reissues(feed):
+    feed([cert('R1', 'B1'), cert('R2', 'B2', c_type='INTL'), cert('R4', 'B2', c_type='INTL', family='DH')])
+    # B1: an INTL certificate is not a re-issue of the CLUB one; B2 DH: two candidates for one removal
+    changes = feed([cert('R5', 'B1', c_type='INTL'), cert('R2', 'B2', c_type='INTL'),
+                    cert('R6', 'B2', c_type='INTL', family='DH'), cert('R7', 'B2', c_type='INTL', family='DH')])
+    assert [c['key'] for c in changes['new']] == ['R5', 'R6', 'R7']
+    assert [c['key'] for c in changes['removed']] == ['R1', 'R4']
+    assert changes['rerated'] == []
+
+
+def test_certificates_without_refno_are_keyed_by_hash():
+    changes = diff_snapshots({}, {'hash:abc': {'summary': {'RefNo': None, 'BIN': None}, 'hash': 'abc',
+                                               'fields': {}}})
+    assert [c['key'] for c in changes['new']] == ['hash:abc']
@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+import threading
+
+import pytest
+
+from cert_index import CertificateIndex, boat_key, name_key, sail_key
+from tests.conftest import NS_JSON, ORC_JSON
+
+
+@pytest.fixture
+def certs_dir(tmp_path):
+    path = tmp_path / 'jsons'
+    path.mkdir()
+    shutil.copy(ORC_JSON, path / 'ISR_ORC.json')
+    shutil.copy(NS_JSON, path / 'ISR_NS.json')
+    return path
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = CertificateIndex(str(tmp_path / 'index.db'))
+    yield index
+    index.close()
+
+
+def test_keys():
+    assert name_key('  Blue   POINT ') == 'blue point'
+    assert sail_key('ISR-376') == sail_key('isr 376') == 'isr376'
+    assert boat_key({'BIN': ' isr112 '}) == 'ISR112'
+    assert boat_key({'SailNo': 'ISR 1', 'YachtName': 'A  B'}) == 'isr1|a b'
+
+
+def test_update_indexes_only_changed_files(index, certs_dir, orc_certificates):
+    changed, removed = index.update(str(certs_dir))
+    assert len(changed) == 2 and removed == []
+    assert index.update(str(certs_dir)) == ([], [])
+
+    ref_no = orc_certificates[0]['RefNo']
+    assert index.get(ref_no) == orc_certificates[0]
+    assert set(index.get_many([ref_no, 'missing'])) == {ref_no}
+    assert index.lookup(sail_no=orc_certificates[0]['SailNo'].lower())[0]['RefNo'] == ref_no
+
+    # Rewritten file: its certificates are replaced, the other file is left alone
+    with open(certs_dir / 'ISR_ORC.json', 'w', encoding='utf-8') as f:
+        json.dump({'rms': orc_certificates[:1]}, f)
+    changed, removed = index.update(str(certs_dir))
+    assert changed == [os.path.abspath(certs_dir / 'ISR_ORC.json')] and removed == []
+    assert index.get(orc_certificates[1]['RefNo']) is None
+
+    os.remove(certs_dir / 'ISR_ORC.json')
+    changed, removed = index.update(str(certs_dir))
+    assert changed == [] and len(removed) == 1
+    assert index.get(ref_no) is None
+
+
+def test_file_without_certificates_is_skipped(index, certs_dir):
+    (certs_dir / 'countries.json').write_text(json.dumps({'Countries': []}))
+    changed, _ = index.update(str(certs_dir))
+    assert len(changed) == 3
+    total, _ = index.search('')
+    assert total > 0
+
+
+def test_threads_use_their_own_connection(index, certs_dir, orc_certificates):
+    index.update(str(certs_dir))
+    ref_nos = [cert['RefNo'] for cert in orc_certificates]
+    errors, connections = [], set()
+
+    def read():
+        try:
+            connections.add(id(index.conn))
+            for _ in range(20):
+                assert len(index.get_many(ref_nos)) == len(ref_nos)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(connections) == 8
+
+
+def test_a_second_index_on_the_same_file_sees_updates(tmp_path, certs_dir, orc_certificates):
+    reader = CertificateIndex(str(tmp_path / 'shared.db'))
+    writer = CertificateIndex(str(tmp_path / 'shared.db'))
+    try:
+        assert reader.get(orc_certificates[0]['RefNo']) is None
+        writer.update(str(certs_dir))
+        assert reader.get(orc_certificates[0]['RefNo']) == orc_certificates[0]
+    finally:
+        reader.close()
+        writer.close()
@@ -0,0 +1,134 @@
+import json
+import random
+import time
+
+import numpy as np
+import pytest
+
+from cert_index import CertificateIndex
+
+WORDS = ['blue', 'point', 'sea', 'wind', 'star', 'fox', 'lady', 'spirit', 'ocean', 'wave', 'north', 'south',
+         'gold', 'silver', 'magic', 'dream', 'fast', 'lucky', 'white', 'black', 'red', 'storm', 'dolphin',
+         'eagle', 'falcon', 'moon', 'sun', 'orca', 'tiger', 'breeze', 'arrow', 'comet', 'nova', 'delta']
+COUNTRIES = ['ISR', 'GRE', 'ITA', 'ESP', 'FRA', 'GER', 'NED', 'GBR', 'USA', 'AUS']
+FAMILIES = ['ORC', 'NS', 'DH']
+
+
+def certificate(country, number, name, family='ORC', issued='2025-01-01'):
+    return {'NatAuth': country, 'BIN': f'{country}{number}', 'RefNo': f'{country}{number}{family}',
+            'SailNo': f'{country} {number}', 'YachtName': name, 'Family': family, 'C_Type': 'INTL',
+            'IssueDate': issued}
+
+
+@pytest.fixture
+def index(tmp_path):
+    certs = [
+        certificate('ISR', 1, 'Blue Point'),
+        certificate('ISR', 1, 'Blue Point', 'DH', '2025-03-01'),
+        certificate('ISR', 2, 'The Blue Pearl'),
+        certificate('ISR', 376, 'Azzurra'),
+        certificate('GRE', 3, 'Bluebird'),
+        certificate('GRE', 4, 'Sea 100%_Blue'),
+    ]
+    (tmp_path / 'jsons').mkdir()
+    with open(tmp_path / 'jsons' / 'ALL_ORC.json', 'w') as f:
+        json.dump({'rms': certs}, f)
+    index = CertificateIndex(str(tmp_path / 'index.db'))
+    index.update(str(tmp_path / 'jsons'))
+    yield index
+    index.close()
+
+
+def names(result):
+    return [boat['YachtName'] for boat in result[1]]
+
+
+def test_name_prefix_from_any_word(index):
+    assert names(index.search('blue')) == ['Blue Point', 'Bluebird', 'The Blue Pearl']
+    assert names(index.search('blue p')) == ['Blue Point', 'The Blue Pearl']
+    assert names(index.search('BLUE  POINT')) == ['Blue Point']
+    # Matches start at a word boundary only
+    assert names(index.search('lue')) == []
+
+
+def test_like_wildcards_are_literal(index):
+    assert names(index.search('100%_')) == ['Sea 100%_Blue']
+    assert names(index.search('100__')) == []
+
+
+def test_sail_number_prefix(index):
+    assert names(index.search('isr-37')) == ['Azzurra']
+    assert index.search('ISR')[0] == 3
+
+
+def test_boat_lists_all_its_certificates_newest_first(index):
+    boat, = index.search('blue point')[1]
+    assert [cert['Family'] for cert in boat['certificates']] == ['DH', 'ORC']
+    boat, = index.search('blue point', family='ORC')[1]
+    assert [cert['Family'] for cert in boat['certificates']] == ['ORC']
+
+
+def test_country_and_family_scope(index):
+    assert names(index.search('blue', country='gre')) == ['Bluebird']
+    assert names(index.search('', family='DH')) == ['Blue Point']
+    assert index.search('', country='ISR')[0] == 3
+    assert index.search('bluebird', country='ISR') == (0, [])
+
+
+def test_paging(index):
+    total, first = index.search('', limit=2)
+    assert total == 5 and len(first) == 2
+    _, rest = index.search('', limit=2, offset=2)
+    _, beyond = index.search('', limit=2, offset=10)
+    assert names((0, first + rest)) == names(index.search('', limit=4)) and beyond == []
+
+
+def test_fuzzy_fallback(index):
+    assert names(index.search('blu pont')) == ['Blue Point']
+    assert names(index.search('azura')) == ['Azzurra']
+    assert index.search('azura', fuzzy=False) == (0, [])
+    assert index.search('xqzzy') == (0, [])
+
+
+def test_search_tables_follow_updates(index, tmp_path):
+    with open(tmp_path / 'jsons' / 'ITA_ORC.json', 'w') as f:
+        json.dump({'rms': [certificate('ITA', 9, 'Blue Moon')]}, f)
+    index.update(str(tmp_path / 'jsons'))
+    assert 'Blue Moon' in names(index.search('blue'))
+
+
+@pytest.fixture(scope='module')
+def large_index(tmp_path_factory):
+    # About as many certificates as the ORC publishes in a year, with overlapping names
+    rng = random.Random(1)
+    path = tmp_path_factory.mktemp('large')
+    (path / 'jsons').mkdir()
+    for country in COUNTRIES:
+        certs = []
+        for number in range(700):
+            name = ' '.join(rng.sample(WORDS, rng.randint(1, 3))).title()
+            for family in rng.sample(FAMILIES, rng.randint(1, 2)):
+                certs.append(certificate(country, number, name, family))
+        with open(path / 'jsons' / f'{country}_ALL.json', 'w') as f:
+            json.dump({'rms': certs}, f)
+    index = CertificateIndex(str(path / 'index.db'))
+    index.update(str(path / 'jsons'))
+    yield index
+    index.close()
+
+
+def test_search_latency(large_index):
+    queries = ['', 'b', 'blue', 'blue p', 'storm', 'isr 12', 'gre1', 'xqzzy', 'blu pont', 'dolfin', 'o']
+    scopes = [{}, {'country': 'ISR'}, {'family': 'DH'}, {'country': 'GRE', 'family': 'ORC'}]
+    for query in queries:
+        large_index.search(query)
+    timings = []
+    for _ in range(5):
+        for query in queries:
+            for scope in scopes:
+                start = time.perf_counter()
+                large_index.search(query, limit=50, **scope)
+                timings.append(time.perf_counter() - start)
+    p50, p99 = np.percentile(timings, [50, 99]) * 1000
+    print(f"certificate search: p50 {p50:.2f} ms, p99 {p99:.2f} ms over {len(timings)} queries")
+    assert p99 < 10
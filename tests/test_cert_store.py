@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from cert_index import CertificateIndex
+from cert_store import from_certificates, save_store, load_store, refresh_store, SavedStore
+from tests.conftest import ORC_JSON
+
+
+def test_from_certificates_columns_and_allowances(orc_certificates, orc_store):
+    assert len(orc_store) == len(orc_certificates)
+    assert orc_store['RefNo'].tolist() == [c['RefNo'] for c in orc_certificates]
+    assert orc_store['GPH'][0] == orc_certificates[0]['GPH']
+    assert orc_store.allowances.dtype == np.float32
+    assert orc_store.allowances.shape == (len(orc_certificates), len(orc_store.legs), len(orc_store.wind_speeds))
+    np.testing.assert_allclose(orc_store.leg('Beat')[0], orc_certificates[0]['Allowances']['Beat'], rtol=1e-6)
+
+
+def test_null_allowances_give_nan_rows(orc_certificates):
+    store = from_certificates([dict(orc_certificates[0], Allowances=None), orc_certificates[1]])
+    assert np.isnan(store.allowances[0]).all()
+    assert not np.isnan(store.leg('Beat')[1]).any()
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_save_load_round_trip(tmp_path, orc_store, mmap):
+    save_store(orc_store, str(tmp_path / 'store'))
+    loaded = load_store(str(tmp_path / 'store'), mmap=mmap)
+    assert isinstance(loaded.allowances, np.memmap) == mmap
+    assert loaded.legs == orc_store.legs
+    np.testing.assert_array_equal(loaded.wind_speeds, orc_store.wind_speeds)
+    np.testing.assert_array_equal(loaded.allowances, orc_store.allowances)
+    assert loaded.columns.keys() == orc_store.columns.keys()
+    for name, col in orc_store.columns.items():
+        np.testing.assert_array_equal(loaded[name], col)
+    assert list(tmp_path.iterdir()) == [tmp_path / 'store']
+
+
+def test_refresh_store_rebuilds_only_when_the_index_changes(tmp_path, orc_certificates):
+    certs_dir = tmp_path / 'jsons'
+    certs_dir.mkdir()
+    (certs_dir / 'ISR_ORC.json').write_bytes(ORC_JSON.read_bytes())
+    index = CertificateIndex(str(tmp_path / 'index.db'))
+    index.update(str(certs_dir))
+    path = str(tmp_path / 'store')
+    saved = SavedStore(path)
+    assert saved.get() is None
+
+    assert refresh_store(index, path)
+    assert not refresh_store(index, path)
+    first = saved.get()
+    assert len(first) == len(orc_certificates)
+    assert saved.get() is first
+
+    ref_nos = [orc_certificates[3]['RefNo'], orc_certificates[0]['RefNo']]
+    selected = saved.select(ref_nos)
+    assert selected['RefNo'].tolist() == ref_nos
+    np.testing.assert_array_equal(selected.allowances, first.allowances[[3, 0]])
+    assert saved.select(ref_nos + ['missing']) is None
+
+    (certs_dir / 'ISR_ORC.json').write_text('[]')
+    index.update(str(certs_dir))
+    assert refresh_store(index, path)
+    assert len(saved.get()) == 0
+    assert saved.select(ref_nos) is None
+    index.close()
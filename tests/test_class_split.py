@@ -0,0 +1,53 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from orcsc.class_split import split_fleet, split_sorted
+from orcsc.scoring import read_scoring_rows
+from tests.conftest import SAMPLE_ORCSC
+
+
+def spread(values, bounds):
+    ends = list(bounds[1:]) + [len(values)]
+    return sum(values[end - 1] - values[start] for start, end in zip(bounds, ends))
+
+
+def brute_force(values, classes, min_size):
+    best = np.inf
+    for cuts in itertools.combinations(range(1, len(values)), classes - 1):
+        bounds = (0,) + cuts
+        sizes = np.diff(bounds + (len(values),))
+        if sizes.min() >= min_size:
+            best = min(best, spread(values, bounds))
+    return best
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_split_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(2, 9))
+    values = np.sort(rng.uniform(5, 15, n).round(2))
+    for classes in range(1, min(n, 4) + 1):
+        for min_size in range(1, n // classes + 1):
+            bounds = split_sorted(values, classes, min_size)
+            assert bounds[0] == 0 and len(bounds) == classes
+            assert np.diff(bounds + [n]).min() >= min_size
+            assert spread(values, bounds) == pytest.approx(brute_force(values, classes, min_size))
+
+
+def test_split_rejects_impossible_sizes():
+    with pytest.raises(ValueError):
+        split_sorted([1.0, 2.0, 3.0], 2, min_size=2)
+    with pytest.raises(ValueError):
+        split_sorted([1.0, 2.0], 0)
+
+
+def test_split_sample_fleet_on_cdl():
+    _, _, fleet, _ = read_scoring_rows(SAMPLE_ORCSC)
+    assignments, classes, unrated = split_fleet(fleet, 'CDL', ['A', 'B'])
+    assert len(assignments) == 7
+    assert len(unrated) == len(fleet) - 7
+    # Higher CDL is faster, so the first class has the highest ratings
+    assert classes[0]["min"] >= classes[1]["max"]
+    assert sum(len(c["boats"]) for c in classes) == 7
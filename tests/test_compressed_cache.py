@@ -0,0 +1,77 @@
+import gzip
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from orcsc import compressed_cache
+from orcsc.compressed_cache import CompressedFileCache, accepted_encoding, accepts_encoding, encoding_qualities
+from tests.conftest import SAMPLE_ORCSC
+
+
+def test_encoding_qualities():
+    assert encoding_qualities('gzip, br;q=0.5, *;q=0, deflate;q=x') == {'gzip': 1.0, 'br': 0.5, '*': 0.0,
+                                                                       'deflate': 0.0}
+    assert encoding_qualities(None) == {}
+
+
+@pytest.mark.parametrize('header, coding, accepted', [
+    ('gzip', 'gzip', True),
+    ('GZIP;q=0.1', 'gzip', True),
+    ('gzip;q=0', 'gzip', False),
+    ('*', 'gzip', True),
+    ('*, gzip;q=0', 'gzip', False),
+    ('identity', 'gzip', False),
+    (None, 'gzip', False),
+])
+def test_accepts_encoding(header, coding, accepted):
+    assert accepts_encoding(header, coding) is accepted
+
+
+def test_accepted_encoding_prefers_brotli(monkeypatch):
+    monkeypatch.setattr(compressed_cache, 'brotli', object())
+    assert accepted_encoding('gzip, br') == 'br'
+    assert accepted_encoding('gzip, br;q=0') == 'gzip'
+    monkeypatch.setattr(compressed_cache, 'brotli', None)
+    assert accepted_encoding('gzip, br') == 'gzip'
+    assert accepted_encoding('identity') is None
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'sample.orcsc'
+    shutil.copy(SAMPLE_ORCSC, path)
+    return str(path)
+
+
+def variants(cache):
+    return sorted(os.listdir(cache.cache_dir))
+
+
+def test_variant_is_created_once_and_replaced_when_the_file_changes(tmp_path, source):
+    cache = CompressedFileCache(str(tmp_path / 'compressed'))
+    variant = cache.get(source, 'gzip')
+    with gzip.open(variant) as f:
+        assert f.read() == SAMPLE_ORCSC.read_bytes()
+    mtime = os.stat(variant).st_mtime_ns
+    assert cache.get(source, 'gzip') == variant
+    assert os.stat(variant).st_mtime_ns == mtime
+
+    with open(source, 'ab') as f:
+        f.write(b'\n')
+    changed = cache.get(source, 'gzip')
+    assert changed != variant
+    assert variants(cache) == [os.path.basename(changed)]
+    cache.invalidate(source)
+    assert variants(cache) == []
+
+
+def test_concurrent_requests_share_the_variant(tmp_path, source):
+    cache = CompressedFileCache(str(tmp_path / 'compressed'))
+    with ThreadPoolExecutor(8) as pool:
+        paths = list(pool.map(lambda _: cache.get(source, 'gzip'), range(32)))
+    assert len(set(paths)) == 1
+    assert variants(cache) == [os.path.basename(paths[0])]
+    with gzip.open(paths[0]) as f:
+        assert f.read() == SAMPLE_ORCSC.read_bytes()
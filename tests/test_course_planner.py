@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+import courses
+import settings
+from course_planner import allowances_at, l1_ranges
+
+GRID = np.round(np.arange(0.1, 15.0, 0.1), 1)
+
+
+def grid_scan(per_l1, target_min, target_max):
+    """L1 values of a 0.1 NM grid for which every boat finishes within the target window (minutes)."""
+    per_l1 = per_l1[per_l1 > 0]
+    minutes = GRID[:, None] * per_l1[None, :] / 60
+    return GRID[((minutes >= target_min) & (minutes <= target_max)).all(axis=1)]
+
+
+@pytest.mark.parametrize('wind_speed', [6, 9, 12.5, 20])
+@pytest.mark.parametrize('window', [(50, 70), (40, 100), (20, 120)])
+def test_l1_range_matches_grid_scan(orc_store, wind_speed, window):
+    course_set = courses.CourseSet(settings.course_types)
+    ranges = l1_ranges(orc_store, wind_speed, *window, course_set)
+    assert list(ranges) == course_set.names
+    for name, (min_l1, max_l1, fastest, slowest, per_l1) in ranges.items():
+        assert per_l1[fastest] == per_l1.min() and per_l1[slowest] == per_l1.max()
+        feasible = grid_scan(per_l1, *window)
+        inside = GRID[(GRID >= min_l1 - 1e-9) & (GRID <= max_l1 + 1e-9)]
+        np.testing.assert_array_equal(feasible, inside)
+
+
+def test_single_boat_range_is_the_target_window(orc_store):
+    store = orc_store.select(np.array([0]))
+    min_l1, max_l1, _, _, per_l1 = l1_ranges(store, 10, 60, 90, courses.CourseSet(settings.course_types))['W1']
+    assert min_l1 * per_l1[0] / 60 == pytest.approx(60)
+    assert max_l1 * per_l1[0] / 60 == pytest.approx(90)
+
+
+def test_allowances_at_interpolates_and_rejects_out_of_range_wind(orc_store):
+    beat = orc_store.legs.index('Beat')
+    np.testing.assert_allclose(allowances_at(orc_store, 12)[:, beat], orc_store.leg('Beat')[:, 3])
+    np.testing.assert_allclose(allowances_at(orc_store, 13)[:, beat],
+                               (orc_store.leg('Beat')[:, 3].astype(float) + orc_store.leg('Beat')[:, 4]) / 2)
+    with pytest.raises(ValueError):
+        allowances_at(orc_store, 25)
+    with pytest.raises(ValueError):
+        allowances_at(orc_store, 4)
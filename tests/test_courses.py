@@ -0,0 +1,52 @@
+import json
+
+import numpy as np
+import pytest
+
+import settings
+from courses import CourseSet, SavedCourses, leg_weights, load_courses, save_courses
+
+
+def test_twa_legs_interpolate_between_fixed_angles():
+    assert leg_weights('Beat') == {'Beat': 1.0}
+    assert leg_weights('TWA90') == {'R90': 1.0}
+    assert leg_weights('twa100') == {'R90': 0.5, 'R110': 0.5}
+    assert leg_weights('TWA55') == pytest.approx({'R52': 0.625, 'R60': 0.375})
+    for leg in ('TWA40', 'TWA160', 'TWAx', 'BeatAngle', 'Nope'):
+        with pytest.raises(ValueError):
+            leg_weights(leg)
+
+
+def test_course_matrix_and_seconds_per_l1():
+    course_set = CourseSet({'WL': {'Beat': 2, 'Run': 2}, 'Reach': {'TWA100': 1}}, legs=['Beat', 'Run', 'R90', 'R110'])
+    assert course_set.matrix.tolist() == [[2, 2, 0, 0], [0, 0, 0.5, 0.5]]
+    allowances = np.array([[[600.0], [500.0], [400.0], [300.0]], [[600.0], [np.nan], [400.0], [300.0]]])
+    per_l1 = course_set.seconds_per_l1(allowances)
+    assert per_l1.shape == (2, 2, 1)
+    assert per_l1[0, 0, 0] == 2200 and np.isnan(per_l1[0, 1, 0])
+    assert per_l1[1, :, 0].tolist() == [350, 350]
+
+
+@pytest.mark.parametrize('definitions', [{}, {'WL': {}}, {'WL': {'Beat': 0}}, {'WL': {'Beat': True}},
+                                         {'WL': {'Beat': '1'}}, {'WL': {'GybeAngle': 1}}])
+def test_invalid_definitions_are_rejected(definitions):
+    with pytest.raises(ValueError):
+        CourseSet(definitions)
+
+
+def test_saved_courses_follow_the_file(tmp_path):
+    path = str(tmp_path / 'courses.json')
+    saved = SavedCourses(path)
+    assert saved.get().definitions == load_courses(None).definitions == CourseSet(settings.course_types).definitions
+    assert saved.get() is saved.get()
+
+    saved.save(CourseSet({'WL': {'Beat': 1, 'Run': 1}}))
+    assert saved.get().names == ['WL']
+    # Saved by another worker process
+    save_courses(CourseSet({'Reach': {'TWA100': 2}}), path)
+    assert saved.get().definitions == {'Reach': {'TWA100': 2.0}}
+    # A broken file keeps the last definitions
+    with open(path, 'w') as f:
+        json.dump({'Bad': {'Beat': -1}}, f)
+    assert saved.get().names == ['Reach']
+    assert [name for name in tmp_path.iterdir() if name.suffix == '.tmp'] == []
@@ -0,0 +1,73 @@
+import os
+import shutil
+import threading
+
+import pytest
+
+from orcsc.file_catalog import FileCatalog, summarize_orcsc_file
+from tests.conftest import SAMPLE_ORCSC, TEMPLATE_ORCSC
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    shutil.copy(SAMPLE_ORCSC, tmp_path / 'a.orcsc')
+    shutil.copy(TEMPLATE_ORCSC, tmp_path / 'b.orcsc')
+    (tmp_path / 'notes.txt').write_text('not a file of the catalog')
+    catalog = FileCatalog(str(tmp_path))
+    catalog.refresh()
+    return catalog
+
+
+def test_summary_counts_rows():
+    summary = summarize_orcsc_file(str(SAMPLE_ORCSC))
+    assert summary['event_title'] == 'Dakar Memorial Regatta 2024'
+    assert (summary['classes'], summary['races'], summary['boats'], summary['valid']) == (6, 7, 39, True)
+
+
+def test_list_sorts_and_filters(catalog):
+    assert [f['name'] for f in catalog.list()] == ['a.orcsc', 'b.orcsc']
+    assert [f['name'] for f in catalog.list(sort='boats', descending=True)] == ['a.orcsc', 'b.orcsc']
+    assert [f['name'] for f in catalog.list(q='DAKAR')] == ['a.orcsc']
+    with pytest.raises(ValueError):
+        catalog.list(sort='path')
+
+
+def test_refresh_rereads_only_changed_files(catalog, tmp_path):
+    assert catalog.refresh() == ([], [])
+    with open(tmp_path / 'a.orcsc', 'ab') as f:
+        f.write(b'\n')
+    (tmp_path / 'c.orcsc').write_bytes(b'<ROOT><Event>')
+    os.remove(tmp_path / 'b.orcsc')
+    changed, removed = catalog.refresh()
+    assert sorted(changed) == ['a.orcsc', 'c.orcsc'] and removed == ['b.orcsc']
+    assert catalog.get('b.orcsc') is None
+    assert catalog.get('c.orcsc')['valid'] is False
+
+
+def test_update_a_single_file(catalog, tmp_path):
+    shutil.copy(SAMPLE_ORCSC, tmp_path / 'b.orcsc')
+    assert catalog.update(str(tmp_path / 'b.orcsc'))['boats'] == 39
+    os.remove(tmp_path / 'b.orcsc')
+    assert catalog.update(str(tmp_path / 'b.orcsc')) is None
+    assert [f['name'] for f in catalog.list()] == ['a.orcsc']
+    # Already up to date: the watcher does not report it again
+    assert catalog.refresh() == ([], [])
+
+
+def test_watcher_reports_changes(catalog, tmp_path):
+    seen = []
+    changed = threading.Event()
+
+    def on_change(path):
+        seen.append(path)
+        changed.set()
+    catalog.on_change = on_change
+    catalog.start_watcher(0.01)
+    try:
+        shutil.copy(SAMPLE_ORCSC, tmp_path / 'd.tmp')
+        os.replace(tmp_path / 'd.tmp', tmp_path / 'd.orcsc')
+        assert changed.wait(5)
+    finally:
+        catalog.stop_watcher()
+    assert seen == [str(tmp_path / 'd.orcsc')]
+    assert catalog.get('d.orcsc')['boats'] == 39
@@ -0,0 +1,41 @@
+import re
+import shutil
+
+from orcsc.file_diff import diff_files, is_empty, snapshot_rows
+from tests.conftest import SAMPLE_ORCSC
+
+
+def test_unchanged_file_has_an_empty_diff():
+    assert is_empty(diff_files(SAMPLE_ORCSC, SAMPLE_ORCSC))
+    snapshot = snapshot_rows(str(SAMPLE_ORCSC))
+    assert (len(snapshot['Cls']), len(snapshot['Race']), len(snapshot['Fleet'])) == (6, 7, 39)
+
+
+def test_rows_are_diffed_by_key(tmp_path):
+    path = tmp_path / 'changed.orcsc'
+    content = SAMPLE_ORCSC.read_text(encoding='utf-8')
+    content = content.replace('<ClassName>ORC1</ClassName>', '<ClassName>ORC 1</ClassName>')
+    content = content.replace('<YachtName>Lovely</YachtName>', '<YachtName>Wendy</YachtName>')
+    # Remove race 2 and boat 1, add race 9
+    race = re.search(r'<ROW>\s*<RaceId>2</RaceId>.*?</ROW>\s*', content, re.S).group()
+    content = content.replace(race, race.replace('<RaceId>2</RaceId>', '<RaceId>9</RaceId>'))
+    content = re.sub(r'<ROW>(?:(?!</ROW>).)*<YID>1</YID>.*?</ROW>\s*', '', content, count=1, flags=re.S)
+    path.write_text(content, encoding='utf-8')
+
+    changes = diff_files(SAMPLE_ORCSC, path)
+    assert [(row['ClassId'], row['ClassName']) for row in changes['classes']['updated']] == [('O1', 'ORC 1')]
+    assert changes['classes']['added'] == changes['classes']['removed'] == []
+    assert [row['RaceId'] for row in changes['races']['added']] == [9]
+    assert changes['races']['removed'] == [2] and changes['races']['updated'] == []
+    assert changes['fleet']['removed'] == [1]
+    assert [boat['YachtName'] for boat in changes['fleet']['updated']] == ['Wendy']
+
+    # Reversed diff
+    changes = diff_files(path, SAMPLE_ORCSC)
+    assert changes['races']['removed'] == [9] and [row['RaceId'] for row in changes['races']['added']] == [2]
+    assert [boat['YID'] for boat in changes['fleet']['added']] == [1]
+
+
+def test_diff_of_a_copy_is_empty(tmp_path):
+    shutil.copy(SAMPLE_ORCSC, tmp_path / 'copy.orcsc')
+    assert is_empty(diff_files(SAMPLE_ORCSC, tmp_path / 'copy.orcsc'))
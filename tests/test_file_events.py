@@ -0,0 +1,102 @@
+import asyncio
+import os
+import shutil
+
+import pytest
+
+from orcsc import file_events
+from orcsc.file_events import FileEvents
+from orcsc.file_versions import file_version
+from tests.conftest import SAMPLE_ORCSC
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / 'a.orcsc'
+    shutil.copy(SAMPLE_ORCSC, path)
+    return str(path)
+
+
+def rename_boat(path, old, new):
+    with open(path, 'rb') as f:
+        content = f.read()
+    with open(path, 'wb') as f:
+        f.write(content.replace(f'<YachtName>{old}</YachtName>'.encode(), f'<YachtName>{new}</YachtName>'.encode()))
+
+
+def test_file_subscribers_get_row_diffs(path):
+    async def run():
+        events = FileEvents()
+        queue = events.subscribe(path)
+        everything = events.subscribe()
+        assert events.version(path) == file_version(path)
+
+        rename_boat(path, 'Peter pan', 'Wendy')
+        events.publish(path)
+        event = await asyncio.wait_for(queue.get(), 1)
+        assert event['file'] == 'a.orcsc' and event['version'] == file_version(path) == events.version(path)
+        assert event['deleted'] is False
+        fleet = event['changes']['fleet']
+        assert [boat['YachtName'] for boat in fleet['updated']] == ['Wendy']
+        assert fleet['added'] == fleet['removed'] == []
+        assert event['changes']['classes'] == event['changes']['races'] == {'added': [], 'removed': [], 'updated': []}
+        # Directory subscribers only get the version
+        assert await asyncio.wait_for(everything.get(), 1) == {**event, 'changes': None}
+
+        # Unchanged content is not published again
+        events.publish(path)
+        await asyncio.sleep(0.01)
+        assert queue.empty() and everything.empty()
+
+        os.remove(path)
+        events.publish(path)
+        event = await asyncio.wait_for(queue.get(), 1)
+        assert event['deleted'] is True and event['version'] is None
+        assert len(event['changes']['fleet']['removed']) == 39
+    asyncio.run(run())
+
+
+def test_snapshot_is_dropped_with_the_last_subscriber(path):
+    async def run():
+        events = FileEvents()
+        first, second = events.subscribe(path), events.subscribe(path)
+        events.unsubscribe(first)
+        rename_boat(path, 'Peter pan', 'Wendy')
+        events.publish(path)
+        assert (await asyncio.wait_for(second.get(), 1))['changes'] is not None
+        events.unsubscribe(second)
+        assert events._snapshots == {}
+        # A new subscriber diffs from the content it subscribed to
+        queue = events.subscribe(path)
+        rename_boat(path, 'Lovely', 'Tink')
+        events.publish(path)
+        updated = (await asyncio.wait_for(queue.get(), 1))['changes']['fleet']['updated']
+        assert [boat['YachtName'] for boat in updated] == ['Tink']
+    asyncio.run(run())
+
+
+def test_slow_subscriber_is_asked_to_resync(path, monkeypatch):
+    monkeypatch.setattr(file_events, 'QUEUE_SIZE', 2)
+
+    async def run():
+        events = FileEvents()
+        queue = events.subscribe(path)
+        for i in range(3):
+            rename_boat(path, 'Peter pan' if i == 0 else f'Wendy {i - 1}', f'Wendy {i}')
+            events.publish(path)
+        await asyncio.sleep(0.01)
+        assert queue.qsize() == 1
+        event = queue.get_nowait()
+        assert event['resync'] is True and event['changes'] is None
+        assert event['version'] == file_version(path)
+    asyncio.run(run())
+
+
+def test_publish_from_another_thread(path):
+    async def run():
+        events = FileEvents()
+        queue = events.subscribe()
+        rename_boat(path, 'Peter pan', 'Wendy')
+        await asyncio.get_running_loop().run_in_executor(None, events.publish, path)
+        assert (await asyncio.wait_for(queue.get(), 1))['version'] == file_version(path)
+    asyncio.run(run())
@@ -0,0 +1,89 @@
+import os
+import shutil
+import tracemalloc
+from xml.etree import ElementTree
+
+import pytest
+
+from orcsc import file_reader
+from orcsc.file_reader import DEFAULT_FLEET_FIELDS, fleet_page, project_fleet_row, read_orcsc_file
+from tests.conftest import SAMPLE_ORCSC
+
+
+@pytest.fixture(scope='module')
+def sample():
+    return file_reader.parse_orcsc_file(SAMPLE_ORCSC)
+
+
+def test_fleet_rows_are_typed_as_in_fleet_row():
+    row = project_fleet_row({'YID': '7', 'GPH': '612.5', 'CDL': '', 'YachtName': None, 'SailNo': 'ISR 1'},
+                            ['YID', 'GPH', 'CDL', 'YachtName', 'SailNo'])
+    assert row == {'YID': 7, 'GPH': 612.5, 'CDL': None, 'YachtName': '', 'SailNo': 'ISR 1'}
+    assert project_fleet_row({'YID': 'x', 'GPH': 'n/a'}, ['YID', 'GPH']) == {'YID': 0, 'GPH': None}
+
+
+def test_fleet_page(sample):
+    total, page = fleet_page(sample['fleet'])
+    assert total == len(page) == 39
+    assert list(page[0]) == DEFAULT_FLEET_FIELDS
+    total, page = fleet_page(sample['fleet'], offset=2, limit=2, fields=['YID'], class_id='O1')
+    assert total == 4
+    assert page == [{'YID': int(boat['YID'])} for boat in sample['fleet'] if boat['ClassId'] == 'O1'][2:4]
+    assert fleet_page(sample['fleet'], offset=100) == (39, [])
+
+
+def test_read_orcsc_file_is_cached_until_the_file_changes(tmp_path):
+    path = str(tmp_path / 'sample.orcsc')
+    shutil.copy(SAMPLE_ORCSC, path)
+    first = read_orcsc_file(path)
+    assert read_orcsc_file(path) is first
+    with open(path, 'r+b') as f:
+        content = f.read().replace(b'Dakar Memorial', b'Dakar Memorial!')
+        f.seek(0)
+        f.write(content)
+    changed = read_orcsc_file(path)
+    assert changed is not first
+    assert changed['event']['EventTitle'] == 'Dakar Memorial! Regatta 2024'
+    file_reader.invalidate(path)
+    assert read_orcsc_file(path) is not changed
+
+
+def test_invalid_files_are_rejected(tmp_path):
+    path = tmp_path / 'bad.orcsc'
+    path.write_bytes(b'<ROOT><Event>')
+    with pytest.raises(file_reader.InvalidOrcscFile):
+        read_orcsc_file(str(path))
+    path.write_bytes(b'<ROOT><Fleet></Fleet></ROOT>')
+    with pytest.raises(file_reader.InvalidOrcscFile):
+        read_orcsc_file(str(path))
+
+
+def test_iter_orcsc_rows_matches_a_full_parse():
+    root = ElementTree.parse(SAMPLE_ORCSC).getroot()
+    sections = ('Fleet', 'Race', 'Rslt')
+    expected = [(section.tag, {child.tag: child.text for child in row})
+                for section in root if section.tag in sections for row in section.findall('ROW')]
+    assert list(file_reader.iter_orcsc_rows(SAMPLE_ORCSC, sections)) == expected
+    assert {section for section, _ in file_reader.iter_orcsc_rows(SAMPLE_ORCSC)} == {'Event', 'Cls', 'Race', 'Fleet'}
+
+
+def test_iter_orcsc_rows_memory_is_bounded(tmp_path):
+    # 2000 boats and ~4 MB of tracks: only the current row is held while parsing
+    path = tmp_path / 'big.orcsc'
+    with open(path, 'w') as f:
+        f.write('<ROOT><Event><ROW><EventTitle>Big</EventTitle></ROW></Event><Fleet>')
+        for yid in range(2000):
+            f.write(f'<ROW><YID>{yid}</YID><YachtName>Boat {yid}</YachtName>{"<X>1</X>" * 50}</ROW>')
+        f.write('</Fleet><tracks>')
+        for _ in range(50000):
+            f.write('<trkpt lat="32.8" lon="35.0"><time>2024-05-31T12:00:00Z</time></trkpt>')
+        f.write('</tracks></ROOT>')
+    tracemalloc.start()
+    try:
+        count = sum(1 for _ in file_reader.iter_orcsc_rows(str(path)))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert count == 2001
+    assert os.path.getsize(path) > 4_000_000
+    assert peak < 1_000_000
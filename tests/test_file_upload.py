@@ -0,0 +1,27 @@
+import io
+import os
+
+import pytest
+
+from orcsc.file_upload import InvalidUpload, UploadTooLarge, stage_upload
+from tests.conftest import SAMPLE_ORCSC, TEMPLATE_ORCSC
+
+
+@pytest.mark.parametrize('path', [SAMPLE_ORCSC, TEMPLATE_ORCSC])
+def test_valid_file_is_staged_unchanged(tmp_path, path):
+    data = path.read_bytes()
+    staged = stage_upload(io.BytesIO(data), tmp_path, max_size=len(data), chunk_size=4096)
+    assert open(staged, 'rb').read() == data
+
+
+@pytest.mark.parametrize('data, error', [
+    (b'<ROOT><Event></ROOT>', InvalidUpload),
+    (b'not xml at all', InvalidUpload),
+    (b'<?xml version="1.0"?><!DOCTYPE r [<!ENTITY e "x">]><r>&e;</r>', InvalidUpload),
+    (b'<?xml version="1.0"?><!DOCTYPE r [<!ENTITY e SYSTEM "file:///etc/passwd">]><r>&e;</r>', InvalidUpload),
+    (b'<r>' + b'x' * 1000 + b'</r>', UploadTooLarge),
+])
+def test_rejected_upload_leaves_nothing(tmp_path, data, error):
+    with pytest.raises(error):
+        stage_upload(io.BytesIO(data), tmp_path, max_size=500, chunk_size=64)
+    assert os.listdir(tmp_path) == []
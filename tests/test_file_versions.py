@@ -0,0 +1,55 @@
+import subprocess
+import sys
+import threading
+import time
+
+from orcsc.file_versions import FileLocks, content_version, file_version
+
+
+def test_file_version_is_the_content_hash(tmp_path):
+    path = tmp_path / 'a.orcsc'
+    assert file_version(str(path)) is None
+    path.write_bytes(b'<ROOT/>')
+    assert file_version(str(path)) == content_version(b'<ROOT/>')
+    path.write_bytes(b'<ROOT></ROOT>')
+    assert file_version(str(path)) != content_version(b'<ROOT/>')
+
+
+def test_lock_serializes_threads(tmp_path):
+    locks = FileLocks(str(tmp_path / 'locks'))
+    inside = []
+
+    def write(i):
+        handle = locks.acquire(str(tmp_path / 'a.orcsc'))
+        try:
+            inside.append(i)
+            time.sleep(0.02)
+            assert inside == [i]
+            inside.remove(i)
+        finally:
+            locks.release(handle)
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert inside == []
+
+
+def test_lock_serializes_processes(tmp_path):
+    locks = FileLocks(str(tmp_path / 'locks'))
+    child = subprocess.Popen([sys.executable, '-c', (
+        'import sys, time\n'
+        'from orcsc.file_versions import FileLocks\n'
+        f'handle = FileLocks({str(tmp_path / "locks")!r}).acquire("a.orcsc")\n'
+        'print("locked", flush=True)\n'
+        'time.sleep(0.5)\n'
+    )], stdout=subprocess.PIPE, text=True)
+    try:
+        assert child.stdout.readline().strip() == 'locked'
+        start = time.monotonic()
+        handle = locks.acquire(str(tmp_path / 'a.orcsc'))
+        assert time.monotonic() - start > 0.2
+        locks.release(handle)
+    finally:
+        child.wait()
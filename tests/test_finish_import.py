@@ -0,0 +1,49 @@
+import pytest
+
+from orcsc.finish_import import FinishResolver, InvalidFinishes, read_finish_records
+from tests.conftest import SAMPLE_ORCSC
+
+
+@pytest.fixture(scope='module')
+def race2():
+    # Class O1, started 2024-05-31T11:05 event time (UTC+3)
+    return FinishResolver(SAMPLE_ORCSC, 2)
+
+
+def test_records_are_read_from_csv_and_json():
+    assert read_finish_records(b'\xef\xbb\xbfYID, FinishTime\n24 , 13:00:00\n', 'csv') == [
+        {'YID': '24', 'FinishTime': '13:00:00'}]
+    assert read_finish_records(b'[{"SailNo": "ISR 40"}]', 'json') == [{'SailNo': 'ISR 40'}]
+    with pytest.raises(InvalidFinishes):
+        read_finish_records(b'{"SailNo": "ISR 40"}', 'json')
+
+
+def test_finish_times_are_normalized_to_the_race_clock(race2):
+    assert race2.resolve({'SailNo': 'isr40', 'FinishTime': '13:00:00'}).FinishTime == '2024-05-31T13:00:00.000Z'
+    assert race2.resolve({'YID': 25, 'FinishTime': '2024-05-31T10:00:00+00:00'}).FinishTime == \
+        '2024-05-31T13:00:00.000Z'
+    # A time of day before the start is on the next day
+    assert race2.resolve({'YID': 25, 'FinishTime': '01:30:00.5'}).FinishTime == '2024-06-01T01:30:00.500Z'
+    with pytest.raises(ValueError, match='not after the start'):
+        race2.resolve({'YID': 25, 'FinishTime': '2024-05-31T11:00:00'})
+
+
+def test_codes_penalties_and_cleared_fields(race2):
+    row = race2.resolve({'YID': '26', 'Finish': 'dnf'})
+    assert (row.Finish, row.FinishTime) == ('DNF', None)
+    row = race2.resolve({'YID': '26', 'FinishTime': '13:00:00', 'Penalty_ET': '60'})
+    assert (row.Finish, row.Penalty_ET) == ('', '60.0')
+    row = race2.resolve({'YID': '26', 'Clear': 'all'})
+    assert (row.Finish, row.FinishTime, row.Penalty_ET) == ('', '', '')
+
+
+def test_invalid_records_reject_the_whole_import(race2):
+    with pytest.raises(InvalidFinishes) as e:
+        race2.resolve_all([{'YID': '24', 'FinishTime': '13:00:00'}, {'YID': '1', 'FinishTime': '13:00:00'},
+                           {'SailNo': 'ISR 1'}, {'YID': '24', 'Finish': 'XYZ'},
+                           {'YID': '24', 'FinishTime': '13:00', 'Clear': 'FinishTime'}])
+    assert [number for number, _ in e.value.errors] == [2, 3, 4, 5]
+    rows = race2.resolve_all([{'YID': '24', 'FinishTime': '13:00:00'}, {'YID': '24', 'FinishTime': '13:05:00'}])
+    assert [row.FinishTime for row in rows] == ['2024-05-31T13:05:00.000Z']
+    with pytest.raises(KeyError):
+        FinishResolver(SAMPLE_ORCSC, 99)
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+import orc
+from tests.conftest import NS_JSON, ORC_JSON
+
+
+@pytest.mark.parametrize('path', [ORC_JSON, NS_JSON])
+def test_stream_matches_json_load(path):
+    with open(path, encoding='utf-8-sig') as f:
+        expected = json.load(f)['rms']
+    assert list(orc.iter_json_files([path])) == expected
+
+
+def test_fields_projection():
+    certs = list(orc.iter_json_files([ORC_JSON], fields=('RefNo', 'Allowances', 'Missing')))
+    assert all(set(cert) == {'RefNo', 'Allowances'} for cert in certs)
+
+
+def test_top_level_list_and_long_values(tmp_path):
+    certs = [{'RefNo': 'A', 'Note': 'x' * (orc.CHUNK_SIZE * 3 + 17)}, {'RefNo': 'B', 'List': list(range(50000))}]
+    path = tmp_path / 'list.json'
+    path.write_text(json.dumps(certs), encoding='utf-8')
+    assert list(orc.iter_json_files([path])) == certs
+
+
+def test_empty_file_yields_nothing(tmp_path):
+    path = tmp_path / 'empty.json'
+    path.write_bytes(b'')
+    assert list(orc.iter_json_files([path])) == []
+
+
+def test_object_without_rms_is_rejected(tmp_path):
+    path = tmp_path / 'other.json'
+    path.write_text(json.dumps({'Countries': []}), encoding='utf-8')
+    with pytest.raises(ValueError):
+        list(orc.iter_json_files([path]))
@@ -0,0 +1,122 @@
+import asyncio
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import aiohttp
+import pytest
+
+import orcdb_cache
+from orcdb_cache import OrcDbCache
+
+COUNTRIES_XML = b"""<ROOT><DATA>
+<ROW><CountryId>ISR</CountryId><CountryName>Israel</CountryName></ROW>
+<ROW><CountryId>GRE</CountryId><CountryName>Greece</CountryName></ROW>
+<ROW><CountryId>ISR</CountryId><CountryName>Israel</CountryName></ROW>
+</DATA></ROOT>"""
+
+
+class OrcServer(ThreadingHTTPServer):
+    """Local stand-in of the ORC data server, counting the requests per country."""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), OrcHandler)
+        self.hits = {}
+        self.delay = 0
+        self.gph = 600.0
+        self.status = 200
+        self.body = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/public/WPub.dll'
+
+
+class OrcHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        country = parse_qs(urlparse(self.path).query).get('CountryId', [''])[0]
+        server.hits[country] = server.hits.get(country, 0) + 1
+        time.sleep(server.delay)
+        if server.body is not None:
+            body = server.body
+        elif country:
+            body = b'\xef\xbb\xbf' + json.dumps({'rms': [{'RefNo': f'{country}1', 'GPH': server.gph}]}).encode()
+        else:
+            body = COUNTRIES_XML
+        self.send_response(server.status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = OrcServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(orcdb_cache, 'ORC_DATA_URL', server.url)
+    monkeypatch.setattr(orcdb_cache, 'URL', f'{server.url}?action=DownRMS&ext=json&CountryId=')
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def rms(data):
+    return json.loads(gzip.decompress(data))['rms']
+
+
+def test_countries_are_parsed_and_cached(server, tmp_path):
+    cache = OrcDbCache(str(tmp_path))
+    expected = [{'id': 'ISR', 'name': 'Israel'}, {'id': 'GRE', 'name': 'Greece'}]
+    assert json.loads(gzip.decompress(asyncio.run(cache.countries()))) == expected
+    assert json.loads(gzip.decompress(asyncio.run(cache.countries()))) == expected
+    assert server.hits == {'': 1}
+
+
+def test_cache_is_shared_on_disk(server, tmp_path):
+    asyncio.run(OrcDbCache(str(tmp_path)).certificates('ISR', 'ORC'))
+    # Another worker with the same directory serves the entry without fetching it again
+    assert rms(asyncio.run(OrcDbCache(str(tmp_path)).certificates('ISR', 'ORC'))) == [{'RefNo': 'ISR1', 'GPH': 600.0}]
+    assert server.hits == {'ISR': 1}
+
+
+def test_concurrent_misses_share_one_fetch(server, tmp_path):
+    server.delay = 0.2
+    cache = OrcDbCache(str(tmp_path))
+
+    async def fetch_all():
+        return await asyncio.gather(*(cache.certificates('ISR', 'ORC') for _ in range(5)))
+    assert len(set(asyncio.run(fetch_all()))) == 1
+    assert server.hits == {'ISR': 1}
+
+
+def test_stale_entry_is_served_while_revalidating(server, tmp_path):
+    cache = OrcDbCache(str(tmp_path), max_age=0)
+
+    async def stale_then_fresh():
+        await cache.certificates('GRE', 'DH')
+        server.gph = 610.0
+        stale = await cache.certificates('GRE', 'DH')
+        await asyncio.gather(*cache._inflight.values())
+        return stale, await cache.certificates('GRE', 'DH')
+    stale, fresh = asyncio.run(stale_then_fresh())
+    assert rms(stale)[0]['GPH'] == 600.0
+    assert rms(fresh)[0]['GPH'] == 610.0
+    assert server.hits['GRE'] >= 2
+
+
+@pytest.mark.parametrize('status, body, error', [(200, b'<html>Server busy</html>', ValueError),
+                                                 (500, b'error', aiohttp.ClientResponseError)])
+def test_upstream_errors_are_not_cached(server, tmp_path, status, body, error):
+    server.status, server.body = status, body
+    cache = OrcDbCache(str(tmp_path))
+    with pytest.raises(error):
+        asyncio.run(cache.certificates('ISR', 'NS'))
+    assert list(tmp_path.iterdir()) == []
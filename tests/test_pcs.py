@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from pcs import allowance_at, course_allowances, course_weights, implied_wind, monotone_allowances, \
+    score_pcs, score_tod
+
+COURSE = {'Beat': 0.5, 'Run': 0.5}
+
+
+@pytest.fixture(scope='module')
+def allowances(orc_store):
+    return course_allowances(orc_store, COURSE)
+
+
+def test_monotone_allowances_never_increase():
+    curves = monotone_allowances(np.array([[800.0, 700.0, 650.0, 660.0, 600.0]]))
+    assert curves.tolist() == [[800.0, 700.0, 650.0, 650.0, 600.0]]
+
+
+def test_implied_wind_round_trips_inside_and_outside_the_range(orc_store, allowances):
+    wind_speeds = orc_store.wind_speeds
+    curve = monotone_allowances(allowances[:1])[0]
+    times = np.linspace(curve[0] * 1.3, curve[-1] * 0.8, 25)
+    wind = implied_wind(np.repeat(allowances[:1], len(times), axis=0), wind_speeds, times)
+    assert wind[0] < wind_speeds[0] and wind[-1] > wind_speeds[-1]
+    # Faster times map to stronger winds, without ties at the range limits
+    assert (np.diff(wind) > 0).all()
+    np.testing.assert_allclose(allowance_at(curve, wind_speeds, wind), times)
+
+
+def test_implied_wind_is_nan_without_time_or_certificate(orc_store, allowances):
+    rows = allowances[:3].copy()
+    rows[2, 4] = np.nan
+    wind = implied_wind(rows, orc_store.wind_speeds, [np.nan, 600.0, 600.0])
+    assert np.isnan(wind[0]) and np.isfinite(wind[1]) and np.isnan(wind[2])
+
+
+def test_course_weights_reject_angles_and_unknown_legs(orc_store):
+    assert course_weights(orc_store, COURSE).sum() == pytest.approx(1)
+    for course in ({'BeatAngle': 1}, {'Nope': 1}, {'Beat': 0}):
+        with pytest.raises(ValueError):
+            course_weights(orc_store, course)
+
+
+def test_score_pcs_ranks_on_implied_wind(orc_store, allowances):
+    distance = 10.0
+    # Every boat sails exactly its 12 kn allowance, the last one is slower than its 6 kn allowance
+    elapsed = allowances[:, 3] * distance
+    elapsed[-1] = allowances[-1, 0] * distance * 1.5
+    scored = score_pcs(orc_store, elapsed, distance, COURSE)
+    np.testing.assert_allclose(scored["implied_wind"][:-1], 12, atol=1e-6)
+    assert scored["implied_wind"][-1] < 6
+    assert scored["position"][-1] == len(elapsed)
+    assert (scored["position"][:-1] == 1).all()
+
+
+def test_score_tod_keeps_the_scratch_boat_elapsed_time(orc_store, allowances):
+    distance = 8.0
+    elapsed = np.full(len(orc_store), 5000.0)
+    scored = score_tod(orc_store, elapsed, distance, COURSE, 11)
+    scratch = scored["scratch"]
+    assert scored["corrected"][scratch] == 5000.0
+    np.testing.assert_allclose(scored["allowance"], (allowances[:, 2] + allowances[:, 3]) / 2)
+    # Same elapsed time: the boat with the highest allowance (slowest) wins
+    assert scored["position"][int(scored["allowance"].argmax())] == 1
+    with pytest.raises(ValueError):
+        score_tod(orc_store, elapsed, distance, COURSE, 22)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from orcsc.scoring import read_scoring_rows
+from rating_matrix import SCORING_OPTIONS, allowance_matrices, allowance_matrix, ratings_from_fleet, \
+    ratings_from_store
+from tests.conftest import SAMPLE_ORCSC
+
+
+@pytest.fixture(scope='module')
+def store_ratings(orc_store):
+    return ratings_from_store(orc_store)
+
+
+def test_time_on_distance_matrix_is_antisymmetric(store_ratings):
+    _, ratings = store_ratings
+    for option in ('APHT', 'TN_Offshore_Low', 'TN_Inshore_High'):
+        matrix = allowance_matrix(ratings, option, 'mile')
+        assert np.isfinite(matrix).all()
+        np.testing.assert_allclose(matrix, -matrix.T)
+        np.testing.assert_array_equal(np.diag(matrix), 0)
+
+
+def test_time_on_time_matrix_is_reciprocal(store_ratings):
+    _, ratings = store_ratings
+    matrix = allowance_matrix(ratings, 'APHT', 'hour')
+    # Row boat gives the column boat a factor, the column boat gives the inverse factor back
+    np.testing.assert_allclose((1 + matrix / 3600) * (1 + matrix.T / 3600), 1)
+    np.testing.assert_allclose(np.diag(matrix), 0, atol=1e-9)
+    tot = ratings['APHT']
+    i, j = int(tot.argmax()), int(tot.argmin())
+    assert matrix[i, j] > 0 > matrix[j, i]
+
+
+def test_missing_ratings_are_nan():
+    _, _, fleet, _ = read_scoring_rows(SAMPLE_ORCSC)
+    boats, ratings = ratings_from_fleet(fleet)
+    assert boats[0]['YID'] == 1
+    matrix = allowance_matrix(ratings, 'TMF_Offshore', 'hour')
+    rated = ratings['TMF_Offshore'] > 0
+    assert 1 < rated.sum() < len(fleet)
+    assert np.isnan(matrix[~rated]).all() and np.isnan(matrix[:, ~rated]).all()
+    assert np.isfinite(matrix[np.ix_(rated, rated)]).all()
+
+
+def test_allowance_matrices_skip_options_without_time_on_distance(store_ratings):
+    _, ratings = store_ratings
+    assert SCORING_OPTIONS['TMF_Offshore'][1] is None
+    matrices = allowance_matrices(ratings, ['TMF_Offshore', 'APHT'])
+    assert set(matrices) == {('TMF_Offshore', 'hour'), ('APHT', 'hour'), ('APHT', 'mile')}
+    with pytest.raises(ValueError):
+        allowance_matrices(ratings, ['NOPE'])
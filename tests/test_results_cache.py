@@ -0,0 +1,78 @@
+import shutil
+
+import pytest
+
+from orcsc import results_cache
+from orcsc.model.rslt_row import RsltRow
+from orcsc.orcsc_file_editor import set_finishes
+from orcsc.results_cache import ResultsCache
+from tests.conftest import SAMPLE_ORCSC
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / 'a.orcsc')
+    shutil.copy(SAMPLE_ORCSC, path)
+    finish(path, 8, {1: '2024-05-31T13:00:00', 2: '2024-05-31T12:30:00'})
+    finish(path, 2, {24: '2024-05-31T13:00:00'})
+    return path
+
+
+def finish(path, race_id, times):
+    set_finishes(path, path, [RsltRow('ROW', RaceId=race_id, YID=yid, FinishTime=time) for yid, time in times.items()])
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    # Counts of file reads and race scorings done by the cache
+    calls = {'read': 0, 'score': []}
+
+    def read_scoring_rows(path):
+        calls['read'] += 1
+        return read(path)
+
+    def score_race(race, *args):
+        calls['score'].append(race['RaceId'])
+        return score(race, *args)
+    read, score = results_cache.read_scoring_rows, results_cache.score_race
+    monkeypatch.setattr(results_cache, 'read_scoring_rows', read_scoring_rows)
+    monkeypatch.setattr(results_cache, 'score_race', score_race)
+    return calls
+
+
+def test_unchanged_file_is_not_read_again(path, calls):
+    cache = ResultsCache()
+    race = cache.race(path, 8)
+    assert cache.race(path, 8) is race
+    assert cache.series(path, 'Z')['standings'][0]['YID'] == 2
+    assert calls == {'read': 1, 'score': ['8']}
+    with pytest.raises(KeyError):
+        cache.race(path, 99)
+    with pytest.raises(KeyError):
+        cache.series(path, 'nope')
+
+
+def test_only_changed_races_are_rescored(path, calls):
+    cache = ResultsCache()
+    cache.series(path, 'Z')
+    cache.series(path, 'O1')
+    assert calls['score'] == ['8', '2']
+
+    finish(path, 8, {3: '2024-05-31T12:00:00'})
+    standings = cache.series(path, 'Z')['standings']
+    assert [row['YID'] for row in standings[:3]] == [3, 2, 1]
+    cache.series(path, 'O1')
+    # Race 2 is unchanged: only race 8 was scored again
+    assert calls == {'read': 2, 'score': ['8', '2', '8']}
+
+
+def test_invalidate_and_size_bound(path, tmp_path, calls):
+    cache = ResultsCache(size=1)
+    cache.race(path, 8)
+    cache.invalidate(path)
+    cache.race(path, 8)
+    assert calls['read'] == 2
+    other = str(tmp_path / 'b.orcsc')
+    shutil.copy(path, other)
+    cache.race(other, 8)
+    assert list(cache._files) == [other]
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from orcsc.scoring import rank, rating_field, read_scoring_rows, score_class, score_race
+from tests.conftest import SAMPLE_ORCSC
+
+START = '2024-05-31T11:05:00.000Z'
+
+
+def test_rank_shares_tied_places():
+    position, points = rank(np.array([300.0, 100.0, 100.0, np.nan, 200.0]), 5)
+    assert position.tolist() == [4, 1, 1, 0, 3]
+    assert points.tolist() == [4.0, 1.5, 1.5, 6.0, 3.0]
+
+
+def test_score_class_time_on_time_ties():
+    # Same corrected time from different elapsed times and ratings
+    scored = score_class(START, ['2024-05-31T11:21:40.000Z', '2024-05-31T11:38:20.000Z',
+                                 '2024-05-31T11:23:20.000Z', None, '2024-05-31T11:20:00.000Z'],
+                         ['1.0', '0.5', '1.0', '1.0', '1.2'], codes=[None, None, None, None, 'DNF'])
+    assert scored["elapsed"][:3].tolist() == [1000.0, 2000.0, 1100.0]
+    assert scored["corrected"][:3].tolist() == [1000.0, 1000.0, 1100.0]
+    assert np.isnan(scored["corrected"][3:]).all()
+    assert scored["position"].tolist() == [1, 1, 3, 0, 0]
+    assert scored["points"].tolist() == [1.5, 1.5, 3.0, 6.0, 6.0]
+
+
+def test_score_class_rounds_corrected_time_and_adds_penalties():
+    scored = score_class(START, ['2024-05-31T12:05:00.000Z'], ['0.9876'], penalties=['60'])
+    assert scored["elapsed"][0] == 3660.0
+    assert scored["corrected"][0] == np.rint(3660 * 0.9876)
+
+
+def test_rating_field():
+    assert rating_field('CTOT') == 'CTOT'
+    assert rating_field('TN_Inshore', 8) == 'TN_Inshore_Low'
+    assert rating_field('TN_Offshore', 14) == 'TN_Offshore_High'
+    with pytest.raises(ValueError):
+        rating_field('TN_Inshore')
+    with pytest.raises(ValueError):
+        rating_field('NOPE')
+
+
+def test_score_sample_race_with_ties():
+    classes, races, fleet, results = read_scoring_rows(SAMPLE_ORCSC)
+    race = next(race for race in races if race['RaceId'] == '8')
+    finishes = {'1': '2024-05-31T13:00:00.000Z', '2': '2024-05-31T13:00:00.000Z', '3': '2024-05-31T12:30:00.000Z',
+                '4': '2024-05-31T13:30:00.000Z'}
+    rows = [dict(row, FinishTime=finishes.get(row['YID'])) for row in results['8']]
+    rows[4]['Finish'] = 'DNF'
+
+    scored = score_race(race, fleet, rows)
+    entries = sum(1 for boat in fleet if boat['ClassId'] == 'Z')
+    by_yid = {row["YID"]: row for row in scored["results"]}
+    assert scored["RatingField"] == 'CTOT'
+    assert len(scored["results"]) == entries
+    assert by_yid[3]["PosCls"] == 1
+    assert by_yid[1]["PosCls"] == by_yid[2]["PosCls"] == 2
+    assert by_yid[1]["PtsCls"] == by_yid[2]["PtsCls"] == 2.5
+    assert by_yid[4]["PosCls"] == 4
+    assert by_yid[1]["CorrectedSeconds"] == 6900.0
+    # Non finishers score entries + 1 and are listed last
+    assert by_yid[5]["Finish"] == 'DNF' and by_yid[5]["PtsCls"] == entries + 1
+    assert [row["PosCls"] for row in scored["results"][:4]] == [1, 2, 2, 4]
+    assert all(row["PosCls"] is None for row in scored["results"][4:])
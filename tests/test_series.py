@@ -0,0 +1,65 @@
+import numpy as np
+
+from orcsc.series import SeriesStandings, read_series
+from tests.conftest import SAMPLE_ORCSC
+
+
+def standings(points, discards=0, coefficients=None):
+    series = SeriesStandings(range(1, len(points) + 1), range(1, len(points[0]) + 1), discards, coefficients)
+    for j in range(len(points[0])):
+        series.set_race(j + 1, {i + 1: row[j] for i, row in enumerate(points) if row[j] is not None})
+    return {row["YID"]: row for row in series.standings()}
+
+
+def test_discards_exclude_the_worst_scores():
+    rows = standings([[1, 2, 3], [3, 3, 1], [2, 1, 2]], discards=1)
+    assert [rows[yid]["net"] for yid in (1, 2, 3)] == [3.0, 4.0, 3.0]
+    assert [rows[yid]["total"] for yid in (1, 2, 3)] == [6.0, 7.0, 5.0]
+    assert [race["discarded"] for race in rows[1]["races"]] == [False, False, True]
+    assert sum(race["discarded"] for race in rows[2]["races"]) == 1
+
+
+def test_a8_1_more_better_scores_breaks_the_tie():
+    # Tied on 5 net points; 1 counts 1, 1, 3 against 1, 2, 2 although 2 won the last race
+    rows = standings([[1, 1, 4, 3], [2, 5, 2, 1]], discards=1)
+    assert rows[1]["net"] == rows[2]["net"] == 5.0
+    assert (rows[1]["position"], rows[2]["position"]) == (1, 2)
+
+
+def test_a8_2_last_race_breaks_the_tie():
+    # Same counted scores (1, 1, 2), so the last race decides
+    rows = standings([[1, 2, 1, 3], [2, 1, 3, 1]], discards=1)
+    assert rows[1]["net"] == rows[2]["net"] == 4.0
+    assert (rows[1]["position"], rows[2]["position"]) == (2, 1)
+
+
+def test_unbreakable_tie_shares_the_position():
+    rows = standings([[1, 2], [2, 1], [3, 3]])
+    assert rows[2]["position"] == 1 and rows[1]["position"] == 2
+    rows = standings([[1, 1], [1, 1], [3, 3]])
+    assert rows[1]["position"] == rows[2]["position"] == 1
+    assert rows[3]["position"] == 3
+
+
+def test_missing_score_counts_as_entries_plus_one_and_coefficients_apply():
+    rows = standings([[1, 2], [2, None], [3, 1]], coefficients=[1.0, 2.0])
+    assert rows[2]["races"][1]["points"] is None
+    assert rows[2]["total"] == 2.0 + 2 * 4
+    assert rows[1]["total"] == 1.0 + 2 * 2
+
+
+def test_races_without_results_are_not_counted_or_discarded():
+    series = SeriesStandings([1, 2], [1, 2, 3], discards=1)
+    series.set_race(1, {1: 1, 2: 2})
+    series.set_race(2, {1: 2, 2: 1})
+    _, _, total, net, discarded = series.compute()
+    assert total.tolist() == [3.0, 3.0]
+    assert not discarded[:, 2].any()
+    series.clear_race(2)
+    assert np.isnan(series.points[:, 1]).all()
+
+
+def test_read_series_of_sample_file_without_finishes():
+    series, boats = read_series(SAMPLE_ORCSC, 'O1')
+    assert sorted(boats) == [24, 25, 26, 27]
+    assert all(row["total"] == 0 for row in series.standings(boats))
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from orcsc.time_limits import InvalidFormula, class_time_limits, compile_formula, evaluate_formula
+
+
+def test_formula_broadcasts_races_against_boats():
+    tree, names = compile_formula("max(GPH * Distance * 1.5, 3600)")
+    assert names == {'GPH', 'Distance'}
+    seconds = evaluate_formula(tree, {'GPH': np.array([[600.0, 700.0]]), 'Distance': np.array([[2.0], [10.0]])})
+    assert seconds.tolist() == [[3600.0, 3600.0], [9000.0, 10500.0]]
+
+
+@pytest.mark.parametrize('formula', [
+    "min", "min + GPH", "GPH(2)", "__import__('os')", "GPH.real", "GPH if Distance else 1", "'a'",
+    "True * GPH", "GPH // 2", "Unknown * 2", "max(GPH, key=1)", "GPH *",
+])
+def test_invalid_formulas_are_rejected_at_compile_time(formula):
+    with pytest.raises(InvalidFormula):
+        compile_formula(formula)
+
+
+@pytest.mark.parametrize('formula', ["min()", "round(GPH, GPH)", "1" + "0" * 400 + " * GPH"])
+def test_evaluation_errors_are_invalid_formulas(formula):
+    tree, names = compile_formula(formula)
+    with pytest.raises(InvalidFormula):
+        evaluate_formula(tree, {name: np.array([600.0]) for name in names})
+
+
+def test_class_time_limits_deadlines():
+    races = [{'RaceId': '1', 'StartTime': '2024-05-31T11:00:00.000Z', 'Distance': '2'}]
+    boats = [{'YID': '1', 'GPH': '600'}, {'YID': '2', 'GPH': ''}]
+    row, = class_time_limits({'ClassId': 'O1'}, races, boats, "GPH * Distance * 2")
+    assert [boat["Seconds"] for boat in row["boats"]] == [2400, None]
+    assert row["boats"][0]["Deadline"] == "2024-05-31T11:40:00.000Z"
+    assert row["Deadline"] == "2024-05-31T11:40:00.000Z"
+
+
+def test_overflowing_limits_have_no_deadline():
+    races = [{'RaceId': '1', 'StartTime': '2024-05-31T11:00:00.000Z', 'Distance': '2'}]
+    boats = [{'YID': '1', 'GPH': '600'}]
+    for formula in ("10 ** 400 * 1.0", "GPH / 0", "GPH * 1e300"):
+        row, = class_time_limits({'ClassId': 'O1'}, races, boats, formula)
+        assert row["Deadline"] is None and row["boats"][0]["Deadline"] is None
+        assert row["boats"][0]["Seconds"] is None